@@ -0,0 +1,30 @@
+"""Add product scheduler lease columns
+
+Revision ID: 0a4d6e8b3c57
+Revises: f7c3a9e2d415
+Create Date: 2026-10-17 17:35:09.442815
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0a4d6e8b3c57'
+down_revision: Union[str, Sequence[str], None] = 'f7c3a9e2d415'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('lease_owner', sa.String(length=100), nullable=True))
+    op.add_column('products', sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'lease_expires_at')
+    op.drop_column('products', 'lease_owner')
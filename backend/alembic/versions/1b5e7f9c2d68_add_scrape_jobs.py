@@ -0,0 +1,49 @@
+"""Add scrape_jobs queue table
+
+Revision ID: 1b5e7f9c2d68
+Revises: 0a4d6e8b3c57
+Create Date: 2026-10-17 18:21:44.905127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b5e7f9c2d68'
+down_revision: Union[str, Sequence[str], None] = '0a4d6e8b3c57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scrape_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('max_attempts', sa.Integer(), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('lease_owner', sa.String(length=100), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_error', sa.String(length=500), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('completed_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('uq_scrape_jobs_active_product', 'scrape_jobs', ['product_id'], unique=True,
+                    postgresql_where=sa.text("status IN ('pending', 'running')"),
+                    sqlite_where=sa.text("status IN ('pending', 'running')"))
+    op.create_index('ix_scrape_jobs_claim', 'scrape_jobs', ['status', 'priority', 'available_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scrape_jobs_claim', table_name='scrape_jobs')
+    op.drop_index('uq_scrape_jobs_active_product', table_name='scrape_jobs')
+    op.drop_table('scrape_jobs')
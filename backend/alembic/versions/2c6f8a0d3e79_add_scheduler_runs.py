@@ -0,0 +1,46 @@
+"""Add scheduler_runs ledger table
+
+Revision ID: 2c6f8a0d3e79
+Revises: 1b5e7f9c2d68
+Create Date: 2026-10-17 19:02:13.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c6f8a0d3e79'
+down_revision: Union[str, Sequence[str], None] = '1b5e7f9c2d68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('scheduler_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('due_only', sa.Boolean(), nullable=False),
+    sa.Column('due_before', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('cursor', sa.Integer(), nullable=False),
+    sa.Column('succeeded', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('deleted', sa.Integer(), nullable=False),
+    sa.Column('resumed', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_scheduler_runs_status_started_at', 'scheduler_runs', ['status', 'started_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_scheduler_runs_status_started_at', table_name='scheduler_runs')
+    op.drop_table('scheduler_runs')
@@ -0,0 +1,30 @@
+"""Add stop_reason and carried_over to scheduler_runs
+
+Revision ID: 3d7a9b1e4f80
+Revises: 2c6f8a0d3e79
+Create Date: 2026-10-17 19:40:52.276914
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d7a9b1e4f80'
+down_revision: Union[str, Sequence[str], None] = '2c6f8a0d3e79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('scheduler_runs', sa.Column('stop_reason', sa.String(length=20), nullable=True))
+    op.add_column('scheduler_runs', sa.Column('carried_over', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('scheduler_runs', 'carried_over')
+    op.drop_column('scheduler_runs', 'stop_reason')
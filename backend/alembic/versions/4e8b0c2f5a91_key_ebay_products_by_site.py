@@ -0,0 +1,69 @@
+"""Key eBay products by site as well as item id
+
+Revision ID: 4e8b0c2f5a91
+Revises: 3d7a9b1e4f80
+Create Date: 2026-10-17 21:15:37.604218
+
+"""
+import re
+from typing import Sequence, Union
+from urllib.parse import urlsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b0c2f5a91'
+down_revision: Union[str, Sequence[str], None] = '3d7a9b1e4f80'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copies of the eBay parts of app.scraper.canonical as of this revision
+_EBAY_ITEM_PATTERN = re.compile(r'/itm/(?:[^/]+/)?(\d{9,})')
+# Keys written before this revision: "ebay:<item id>"
+_OLD_KEY_PATTERN = re.compile(r'^ebay:(\d+)$')
+
+
+def _host(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Products of different eBay sites that 8c3e4f7a1b20 already merged stay merged: their price
+    # history can't be split back apart. This only stops new ones being merged from now on.
+    bind = op.get_bind()
+    products = bind.execute(sa.text(
+        "SELECT id, url, canonical_key FROM products WHERE canonical_key LIKE 'ebay:%'"
+    )).mappings().all()
+    for product in products:
+        if not _OLD_KEY_PATTERN.match(product['canonical_key']):
+            continue
+        match = _EBAY_ITEM_PATTERN.search(urlsplit(product['url']).path)
+        if match:
+            bind.execute(
+                sa.text("UPDATE products SET canonical_key = :key WHERE id = :id"),
+                {'key': f"ebay:{_host(product['url'])}:{match.group(1)}", 'id': product['id']},
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Where the same item is tracked on several eBay sites, only the oldest product gets the
+    # old key back (it is unique); the others keep their per-site key.
+    bind = op.get_bind()
+    products = bind.execute(sa.text(
+        "SELECT id, canonical_key FROM products WHERE canonical_key LIKE 'ebay:%:%' ORDER BY id"
+    )).mappings().all()
+    taken = set()
+    for product in products:
+        old_key = f"ebay:{product['canonical_key'].rsplit(':', 1)[1]}"
+        if old_key in taken:
+            continue
+        taken.add(old_key)
+        bind.execute(
+            sa.text("UPDATE products SET canonical_key = :key WHERE id = :id"),
+            {'key': old_key, 'id': product['id']},
+        )
@@ -0,0 +1,32 @@
+"""Add product scrape validators
+
+Revision ID: 5b1f0c2a9d41
+Revises: 02d16dd6e340
+Create Date: 2026-10-17 09:12:31.402118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1f0c2a9d41'
+down_revision: Union[str, Sequence[str], None] = '02d16dd6e340'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('etag', sa.String(length=255), nullable=True))
+    op.add_column('products', sa.Column('last_modified', sa.String(length=64), nullable=True))
+    op.add_column('products', sa.Column('content_digest', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('products', 'content_digest')
+    op.drop_column('products', 'last_modified')
+    op.drop_column('products', 'etag')
@@ -0,0 +1,31 @@
+"""Add owner and heartbeat_at to scheduler_runs
+
+Revision ID: 5d9c3f1a7e26
+Revises: 4e8b0c2f5a91
+Create Date: 2026-10-17 22:04:48.183605
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9c3f1a7e26'
+down_revision: Union[str, Sequence[str], None] = '4e8b0c2f5a91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Runs recorded before this revision have no heartbeat: their last checkpoint stands in for it
+    op.add_column('scheduler_runs', sa.Column('owner', sa.String(length=100), nullable=True))
+    op.add_column('scheduler_runs', sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('scheduler_runs', 'heartbeat_at')
+    op.drop_column('scheduler_runs', 'owner')
@@ -0,0 +1,146 @@
+"""Add product canonical key and merge duplicate products
+
+Revision ID: 8c3e4f7a1b20
+Revises: 5b1f0c2a9d41
+Create Date: 2026-10-17 11:40:05.518273
+
+"""
+import hashlib
+import re
+from collections import defaultdict
+from typing import Optional, Sequence, Union
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c3e4f7a1b20'
+down_revision: Union[str, Sequence[str], None] = '5b1f0c2a9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# A frozen copy of app.scraper.canonical.canonical_key as of this revision, so later changes to it
+# don't change what this migration merges. eBay listings were keyed by item id alone here;
+# 4e8b0c2f5a91 re-keys them by site.
+
+_TRACKING_PARAMS = {
+    "_trkparms", "_trksid", "_from", "amdata", "ref", "ref_", "qid", "sr", "crid", "sprefix",
+    "gclid", "fbclid", "msclkid", "mkcid", "mkrid", "mkevt", "campid", "customid", "toolid",
+}
+_TRACKING_PREFIXES = ("utm_", "_trk", "pf_rd_", "pd_rd_")
+_EBAY_ITEM_PATTERN = re.compile(r'/itm/(?:[^/]+/)?(\d{9,})')
+_AMAZON_ASIN_PATTERN = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/asin)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+
+
+def _host(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _strip_tracking(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (name.lower() in _TRACKING_PARAMS or name.lower().startswith(_TRACKING_PREFIXES))
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def canonical_key(url: str, source: Optional[str] = None) -> str:
+    host = _host(url)
+    path = urlsplit(url).path
+    if source == "eBay" or host.startswith('ebay.') or '.ebay.' in host:
+        match = _EBAY_ITEM_PATTERN.search(path)
+        if match:
+            return f"ebay:{match.group(1)}"
+    elif source == "Amazon" or host.startswith('amazon.') or '.amazon.' in host:
+        match = _AMAZON_ASIN_PATTERN.search(path)
+        if match:
+            return f"amazon:{host}:{match.group(1).upper()}"
+    return "url:" + hashlib.sha1(_strip_tracking(url).encode('utf-8')).hexdigest()
+
+
+def _merge_duplicates(bind, keeper: dict, duplicates: list) -> None:
+    """Moves everything that belongs to the duplicate products onto the keeper, then deletes them."""
+    duplicate_ids = [product['id'] for product in duplicates]
+    params = {'keeper': keeper['id'], 'duplicates': duplicate_ids}
+    expanding = sa.bindparam('duplicates', expanding=True)
+
+    bind.execute(
+        sa.text("UPDATE price_histories SET product_id = :keeper WHERE product_id IN :duplicates").bindparams(expanding),
+        params,
+    )
+    bind.execute(
+        sa.text("UPDATE alerts SET product_id = :keeper WHERE product_id IN :duplicates").bindparams(expanding),
+        params,
+    )
+    # A user tracking several copies of the product keeps a single association (the keeper's, or the oldest one)
+    bind.execute(
+        sa.text(
+            "DELETE FROM user_products WHERE product_id IN :duplicates AND ("
+            " user_id IN (SELECT user_id FROM user_products WHERE product_id = :keeper)"
+            " OR id NOT IN (SELECT MIN(id) FROM user_products WHERE product_id IN :duplicates GROUP BY user_id))"
+        ).bindparams(expanding),
+        params,
+    )
+    bind.execute(
+        sa.text("UPDATE user_products SET product_id = :keeper WHERE product_id IN :duplicates").bindparams(expanding),
+        params,
+    )
+
+    # The merged product takes the most recently checked price and the overall price range
+    group = [keeper, *duplicates]
+    latest = max(group, key=lambda product: product['last_checked'])
+    lowest = [product['lowest_price'] for product in group if product['lowest_price'] is not None]
+    highest = [product['highest_price'] for product in group if product['highest_price'] is not None]
+    bind.execute(
+        sa.text(
+            "UPDATE products SET current_price = :current_price, last_checked = :last_checked,"
+            " lowest_price = :lowest_price, highest_price = :highest_price WHERE id = :keeper"
+        ),
+        {
+            'keeper': keeper['id'],
+            'current_price': latest['current_price'],
+            'last_checked': latest['last_checked'],
+            'lowest_price': min(lowest) if lowest else None,
+            'highest_price': max(highest) if highest else None,
+        },
+    )
+    bind.execute(sa.text("DELETE FROM products WHERE id IN :duplicates").bindparams(expanding), params)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('products', sa.Column('canonical_key', sa.String(length=255), nullable=True))
+
+    bind = op.get_bind()
+    products = bind.execute(sa.text(
+        "SELECT id, url, source, current_price, lowest_price, highest_price, last_checked FROM products ORDER BY id"
+    )).mappings().all()
+
+    groups = defaultdict(list)
+    for product in products:
+        groups[canonical_key(product['url'], product['source'])].append(dict(product))
+
+    for key, group in groups.items():
+        keeper, duplicates = group[0], group[1:]
+        if duplicates:
+            _merge_duplicates(bind, keeper, duplicates)
+        bind.execute(
+            sa.text("UPDATE products SET canonical_key = :key WHERE id = :id"),
+            {'key': key, 'id': keeper['id']},
+        )
+
+    op.create_index(op.f('ix_products_canonical_key'), 'products', ['canonical_key'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Merged duplicates are not restored
+    op.drop_index(op.f('ix_products_canonical_key'), table_name='products')
+    op.drop_column('products', 'canonical_key')
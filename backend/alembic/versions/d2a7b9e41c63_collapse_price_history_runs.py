@@ -0,0 +1,63 @@
+"""Add price history last_seen_at and collapse runs of unchanged prices
+
+Revision ID: d2a7b9e41c63
+Revises: 8c3e4f7a1b20
+Create Date: 2026-10-17 15:12:40.204918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a7b9e41c63'
+down_revision: Union[str, Sequence[str], None] = '8c3e4f7a1b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('price_histories', sa.Column('last_seen_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index('ix_price_histories_product_id_id', 'price_histories', ['product_id', 'id'], unique=False)
+
+    bind = op.get_bind()
+    # Number each product's runs of consecutive rows with the same price. A row starts a new run
+    # when its price differs from the previous row's.
+    bind.execute(sa.text(
+        "CREATE TEMPORARY TABLE price_history_runs AS"
+        " SELECT id, product_id, timestamp, is_start,"
+        " SUM(is_start) OVER (PARTITION BY product_id ORDER BY timestamp, id) AS run"
+        " FROM (SELECT id, product_id, timestamp,"
+        " CASE WHEN LAG(price) OVER (PARTITION BY product_id ORDER BY timestamp, id) = price THEN 0 ELSE 1 END AS is_start"
+        " FROM price_histories) AS ordered"
+    ))
+    bind.execute(sa.text(
+        "CREATE TEMPORARY TABLE price_history_run_ends AS"
+        " SELECT product_id, run, MAX(timestamp) AS last_seen_at FROM price_history_runs"
+        " GROUP BY product_id, run HAVING COUNT(*) > 1"
+    ))
+
+    # The first row of each run covers the whole run, the rest are deleted
+    bind.execute(sa.text(
+        "UPDATE price_histories SET last_seen_at = ("
+        " SELECT e.last_seen_at FROM price_history_runs r"
+        " JOIN price_history_run_ends e ON e.product_id = r.product_id AND e.run = r.run"
+        " WHERE r.id = price_histories.id)"
+        " WHERE id IN (SELECT r.id FROM price_history_runs r"
+        " JOIN price_history_run_ends e ON e.product_id = r.product_id AND e.run = r.run"
+        " WHERE r.is_start = 1)"
+    ))
+    bind.execute(sa.text("DELETE FROM price_histories WHERE id IN (SELECT id FROM price_history_runs WHERE is_start = 0)"))
+
+    bind.execute(sa.text("DROP TABLE price_history_run_ends"))
+    bind.execute(sa.text("DROP TABLE price_history_runs"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Collapsed rows are not restored; each run keeps its first row
+    op.drop_index('ix_price_histories_product_id_id', table_name='price_histories')
+    op.drop_column('price_histories', 'last_seen_at')
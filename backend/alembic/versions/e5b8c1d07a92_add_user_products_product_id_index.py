@@ -0,0 +1,27 @@
+"""Add user_products product_id index for threshold alerts
+
+Revision ID: e5b8c1d07a92
+Revises: d2a7b9e41c63
+Create Date: 2026-10-17 16:03:27.811340
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b8c1d07a92'
+down_revision: Union[str, Sequence[str], None] = 'd2a7b9e41c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_user_products_product_id', 'user_products', ['product_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_user_products_product_id', table_name='user_products')
@@ -0,0 +1,31 @@
+"""Add product next_check_at for adaptive check cadence
+
+Revision ID: f7c3a9e2d415
+Revises: e5b8c1d07a92
+Create Date: 2026-10-17 16:48:52.130674
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7c3a9e2d415'
+down_revision: Union[str, Sequence[str], None] = 'e5b8c1d07a92'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing products start out due (NULL) and get their cadence on their next check
+    op.add_column('products', sa.Column('next_check_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_products_next_check_at'), 'products', ['next_check_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_products_next_check_at'), table_name='products')
+    op.drop_column('products', 'next_check_at')
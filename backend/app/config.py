@@ -15,6 +15,130 @@ ALLOWED_CORS_ORIGINS_STR = os.getenv(
 IPROYAL_PROXY_USERNAME = os.getenv("IPROYAL_PROXY_USERNAME")
 IPROYAL_PROXY_PASSWORD = os.getenv("IPROYAL_PROXY_PASSWORD")
 
+# Scraper HTTP client settings
+SCRAPER_MAX_CONNECTIONS = int(os.getenv("SCRAPER_MAX_CONNECTIONS", "100"))
+SCRAPER_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("SCRAPER_MAX_KEEPALIVE_CONNECTIONS", "50"))
+SCRAPER_MAX_CONNECTIONS_PER_HOST = int(os.getenv("SCRAPER_MAX_CONNECTIONS_PER_HOST", "10"))
+SCRAPER_KEEPALIVE_EXPIRY = float(os.getenv("SCRAPER_KEEPALIVE_EXPIRY", "30"))
+SCRAPER_HTTP2 = os.getenv("SCRAPER_HTTP2", "false").lower() == "true"
+
+# Parse product pages while they download and stop reading once the needed elements are found
+# (routes and scheduler alike, unless pages are parsed in an executor)
+SCRAPER_STREAMING = os.getenv("SCRAPER_STREAMING", "false").lower() == "true"
+# Product page bodies are never read past this size
+SCRAPER_MAX_BODY_BYTES = int(os.getenv("SCRAPER_MAX_BODY_BYTES", str(3 * 1024 * 1024)))
+
+# Where product pages are parsed: "none" (inline on the event loop), "thread" or "process"
+SCRAPER_PARSE_EXECUTOR = os.getenv("SCRAPER_PARSE_EXECUTOR", "none").lower()
+# Parse worker count. 0 means one per CPU core.
+SCRAPER_PARSE_WORKERS = int(os.getenv("SCRAPER_PARSE_WORKERS", "0"))
+
+# Successful scrape results, the scheduler's included, are reused for this long by callers asking for the same URL
+SCRAPER_RESULT_CACHE_SECONDS = float(os.getenv("SCRAPER_RESULT_CACHE_SECONDS", "60"))
+SCRAPER_RESULT_CACHE_SIZE = int(os.getenv("SCRAPER_RESULT_CACHE_SIZE", "1024"))
+
+# Per-source scrape limits, keyed by the scraper's source names.
+# Format: "Source:requests_per_second:max_in_flight", comma separated.
+SCRAPER_RATE_LIMITS_STR = os.getenv("SCRAPER_RATE_LIMITS", "Amazon:2:16,eBay:4:32")
+SCRAPER_RATE_LIMITS = {
+    source.strip(): (float(rate), int(in_flight))
+    for source, rate, in_flight in (
+        entry.split(':') for entry in SCRAPER_RATE_LIMITS_STR.split(',') if entry.strip()
+    )
+}
+SCRAPER_DEFAULT_RATE_LIMIT = (
+    float(os.getenv("SCRAPER_DEFAULT_RATE", "1")),
+    int(os.getenv("SCRAPER_DEFAULT_MAX_IN_FLIGHT", "8")),
+)
+
+# Per-source circuit breaker. The circuit opens when this fraction of the last
+# SCRAPER_CIRCUIT_WINDOW attempts failed (CAPTCHA, throttling, 5xx, network errors).
+SCRAPER_CIRCUIT_FAILURE_RATE = float(os.getenv("SCRAPER_CIRCUIT_FAILURE_RATE", "0.5"))
+SCRAPER_CIRCUIT_WINDOW = int(os.getenv("SCRAPER_CIRCUIT_WINDOW", "20"))
+SCRAPER_CIRCUIT_MIN_CALLS = int(os.getenv("SCRAPER_CIRCUIT_MIN_CALLS", "10"))
+SCRAPER_CIRCUIT_OPEN_SECONDS = float(os.getenv("SCRAPER_CIRCUIT_OPEN_SECONDS", "60"))
+SCRAPER_CIRCUIT_MAX_OPEN_SECONDS = float(os.getenv("SCRAPER_CIRCUIT_MAX_OPEN_SECONDS", "900"))
+SCRAPER_CIRCUIT_HALF_OPEN_CALLS = int(os.getenv("SCRAPER_CIRCUIT_HALF_OPEN_CALLS", "3"))
+
+# Hedged requests: a request still waiting for headers after the host's SCRAPER_HEDGE_PERCENTILE
+# latency is raced against a second one. SCRAPER_HEDGE_BUDGET caps hedges as a fraction of requests.
+SCRAPER_HEDGE = os.getenv("SCRAPER_HEDGE", "false").lower() == "true"
+SCRAPER_HEDGE_PERCENTILE = float(os.getenv("SCRAPER_HEDGE_PERCENTILE", "95"))
+SCRAPER_HEDGE_BUDGET = float(os.getenv("SCRAPER_HEDGE_BUDGET", "0.05"))
+SCRAPER_HEDGE_MIN_SAMPLES = int(os.getenv("SCRAPER_HEDGE_MIN_SAMPLES", "20"))
+SCRAPER_HEDGE_MIN_DELAY = float(os.getenv("SCRAPER_HEDGE_MIN_DELAY", "0.5"))
+
+# Proxy pool. Comma separated proxy URLs; when empty the single IPRoyal gateway is used.
+SCRAPER_PROXY_URLS_STR = os.getenv("SCRAPER_PROXY_URLS", "")
+SCRAPER_PROXY_URLS = [url.strip() for url in SCRAPER_PROXY_URLS_STR.split(',') if url.strip()]
+# Weight of the newest sample in each proxy's latency/success/block moving averages
+SCRAPER_PROXY_EWMA_ALPHA = float(os.getenv("SCRAPER_PROXY_EWMA_ALPHA", "0.2"))
+SCRAPER_PROXY_QUARANTINE_SECONDS = float(os.getenv("SCRAPER_PROXY_QUARANTINE_SECONDS", "300"))
+SCRAPER_PROXY_MAX_CONSECUTIVE_FAILURES = int(os.getenv("SCRAPER_PROXY_MAX_CONSECUTIVE_FAILURES", "3"))
+SCRAPER_PROXY_MIN_SUCCESS_RATE = float(os.getenv("SCRAPER_PROXY_MIN_SUCCESS_RATE", "0.5"))
+SCRAPER_PROXY_MAX_BLOCK_RATE = float(os.getenv("SCRAPER_PROXY_MAX_BLOCK_RATE", "0.5"))
+SCRAPER_PROXY_MIN_SAMPLES = int(os.getenv("SCRAPER_PROXY_MIN_SAMPLES", "10"))
+
+# Scheduler run: concurrent scraping workers, products per write transaction, products per read page
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "32"))
+SCHEDULER_COMMIT_BATCH_SIZE = int(os.getenv("SCHEDULER_COMMIT_BATCH_SIZE", "100"))
+SCHEDULER_READ_BATCH_SIZE = int(os.getenv("SCHEDULER_READ_BATCH_SIZE", "500"))
+# Scrape pipeline stages: SCHEDULER_WORKERS fetch tasks feed SCHEDULER_PARSE_STAGE_WORKERS parse tasks
+# (0 = one per parse executor worker, 1 when parsing inline). Each stage's input queue holds
+# SCHEDULER_STAGE_QUEUE_SIZE pages (0 = twice the stage's width).
+SCHEDULER_PARSE_STAGE_WORKERS = int(os.getenv("SCHEDULER_PARSE_STAGE_WORKERS", "0"))
+SCHEDULER_STAGE_QUEUE_SIZE = int(os.getenv("SCHEDULER_STAGE_QUEUE_SIZE", "0"))
+# Price history batches at least this large are written with COPY on Postgres (0 disables COPY)
+SCHEDULER_COPY_THRESHOLD = int(os.getenv("SCHEDULER_COPY_THRESHOLD", "500"))
+
+# Adaptive check cadence, in minutes: products are checked every SCHEDULER_BASE_INTERVAL_MINUTES, sooner
+# when their price moves often, many users watch them or a watcher's threshold is within
+# SCHEDULER_NEAR_THRESHOLD (fraction of the price), later when nobody watches them
+SCHEDULER_BASE_INTERVAL_MINUTES = float(os.getenv("SCHEDULER_BASE_INTERVAL_MINUTES", "360"))
+SCHEDULER_MIN_INTERVAL_MINUTES = float(os.getenv("SCHEDULER_MIN_INTERVAL_MINUTES", "30"))
+SCHEDULER_MAX_INTERVAL_MINUTES = float(os.getenv("SCHEDULER_MAX_INTERVAL_MINUTES", "2880"))
+SCHEDULER_VOLATILITY_WINDOW_DAYS = float(os.getenv("SCHEDULER_VOLATILITY_WINDOW_DAYS", "7"))
+SCHEDULER_NEAR_THRESHOLD = float(os.getenv("SCHEDULER_NEAR_THRESHOLD", "0.05"))
+# Random spread (+/- fraction) added to every interval so checks don't bunch up
+SCHEDULER_CHECK_JITTER = float(os.getenv("SCHEDULER_CHECK_JITTER", "0.1"))
+
+# Rolling scheduler: checks per second (0 = catalog size / base interval), products claimed per
+# slice, minutes before a claimed product that wasn't written is retried, seconds between commits
+# and between progress reports
+SCHEDULER_ROLLING_RATE = float(os.getenv("SCHEDULER_ROLLING_RATE", "0"))
+SCHEDULER_ROLLING_SLICE_SIZE = int(os.getenv("SCHEDULER_ROLLING_SLICE_SIZE", "50"))
+SCHEDULER_RETRY_MINUTES = float(os.getenv("SCHEDULER_RETRY_MINUTES", "15"))
+SCHEDULER_FLUSH_SECONDS = float(os.getenv("SCHEDULER_FLUSH_SECONDS", "10"))
+SCHEDULER_REPORT_SECONDS = float(os.getenv("SCHEDULER_REPORT_SECONDS", "60"))
+# How long a worker's claim on a product lasts. Running workers renew their claims every third of it,
+# so only the claims of crashed workers run out and are released.
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "600"))
+
+# One-shot runs record a heartbeat every SCHEDULER_RUN_HEARTBEAT_SECONDS. A run still marked running
+# is only resumed by --resume once its heartbeat is SCHEDULER_RUN_STALE_SECONDS old (its process died)
+SCHEDULER_RUN_HEARTBEAT_SECONDS = float(os.getenv("SCHEDULER_RUN_HEARTBEAT_SECONDS", "30"))
+SCHEDULER_RUN_STALE_SECONDS = float(os.getenv("SCHEDULER_RUN_STALE_SECONDS", "300"))
+
+# Scrape job queue: attempts before a job is dead-lettered, retry backoff (doubles per attempt, in
+# seconds), claim lease and jobs claimed at a time by a worker
+SCRAPE_JOB_MAX_ATTEMPTS = int(os.getenv("SCRAPE_JOB_MAX_ATTEMPTS", "5"))
+SCRAPE_JOB_BACKOFF_SECONDS = float(os.getenv("SCRAPE_JOB_BACKOFF_SECONDS", "60"))
+SCRAPE_JOB_MAX_BACKOFF_SECONDS = float(os.getenv("SCRAPE_JOB_MAX_BACKOFF_SECONDS", "3600"))
+SCRAPE_JOB_LEASE_SECONDS = float(os.getenv("SCRAPE_JOB_LEASE_SECONDS", "300"))
+SCRAPE_JOB_CLAIM_SIZE = int(os.getenv("SCRAPE_JOB_CLAIM_SIZE", "20"))
+
+# One-shot run budget (0 = no limit): wall-clock seconds (e.g. the cron job's time limit), scrape
+# requests and proxy bytes received. The run stops dispatching once SCHEDULER_BUDGET_RESERVE (fraction)
+# of a limit is left, checks the most urgent products first and leaves the rest due for the next run.
+SCHEDULER_RUN_DEADLINE_SECONDS = float(os.getenv("SCHEDULER_RUN_DEADLINE_SECONDS", "0"))
+SCHEDULER_RUN_MAX_REQUESTS = int(os.getenv("SCHEDULER_RUN_MAX_REQUESTS", "0"))
+SCHEDULER_RUN_MAX_PROXY_BYTES = int(os.getenv("SCHEDULER_RUN_MAX_PROXY_BYTES", "0"))
+SCHEDULER_BUDGET_RESERVE = float(os.getenv("SCHEDULER_BUDGET_RESERVE", "0.1"))
+
+# Price history: "change_only" writes a row only when the price changes and extends the latest
+# row's last_seen_at otherwise, "every_check" writes a row for every successful check
+PRICE_HISTORY_MODE = os.getenv("PRICE_HISTORY_MODE", "change_only")
+
 ALLOWED_CORS_ORIGINS = [
     origin.strip() for origin in ALLOWED_CORS_ORIGINS_STR.split(',') if origin.strip()
 ]
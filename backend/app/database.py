@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, event, MetaData
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
@@ -12,6 +12,18 @@ Base = declarative_base()
 _engine = None
 _SessionLocal = None
 
+def enable_sqlite_wal(engine):
+    """
+    Lets several scheduler processes share a SQLite file: WAL keeps readers from blocking the writer,
+    and the busy timeout makes writers wait for each other instead of failing.
+    """
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=30000")
+        cursor.close()
+
 def get_engine():
     global _engine
     if _engine is None:
@@ -22,6 +34,8 @@ def get_engine():
         if not database_url:
             raise ValueError("DATABASE_URL environment variable is not set.")
         _engine = create_engine(database_url, pool_pre_ping=True)
+        if database_url.startswith("sqlite") and ":memory:" not in database_url:
+            enable_sqlite_wal(_engine)
     return _engine
 
 def get_session_local():
@@ -12,6 +12,8 @@ from app.config import ALLOWED_CORS_ORIGINS
 #from app.scheduler.products import update_product_prices_job
 
 from app.database import Base, get_db, get_engine, get_session_local
+from app.scraper.client import close_scraper_client
+from app.scraper.parse_executor import shutdown_parse_executor
 
 from app import models
 from app.routes import user, product, price_history, notification
@@ -46,6 +48,9 @@ async def lifespan(app: FastAPI):
     # Shutdown Events
     print("Shutting down background scheduler...")
     # scheduler.shutdown()
+    print("Closing scraper connection pool...")
+    await close_scraper_client()
+    shutdown_parse_executor()
     print("Application shutdown complete.")
 
 # Pass the lifespan context manager to the FastAPI app
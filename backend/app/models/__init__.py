@@ -3,4 +3,6 @@ from .price_history import PriceHistory
 from .products import Product
 from .user_products import UserProduct
 from .users import User
-from .notifications import Notification
\ No newline at end of file
+from .notifications import Notification
+from .scrape_jobs import ScrapeJob, ScrapeJobStatus
+from .scheduler_runs import SchedulerRun, SchedulerRunStatus
@@ -6,8 +6,8 @@ from typing import Union
 import enum
 
 class AlertType(enum.Enum):
-    DROP = "price_drop",
-    INCREASE= "price_increase"
+    DROP = "price_drop"
+    INCREASE = "price_increase"
 
 class Alert(Base):
     __tablename__ = "alerts"
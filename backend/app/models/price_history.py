@@ -1,10 +1,15 @@
 from app.database import Base
-from sqlalchemy import ForeignKey, DateTime, Float, func
+from sqlalchemy import ForeignKey, DateTime, Float, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
+from typing import Optional
 
 class PriceHistory(Base):
     __tablename__ = "price_histories"
+    __table_args__ = (
+        # Finding a product's latest row is the hot path of change-only recording
+        Index("ix_price_histories_product_id_id", "product_id", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
@@ -14,6 +19,9 @@ class PriceHistory(Base):
         nullable=False,
         insert_default=func.now()
     )
+    # With change-only recording a row covers every check from timestamp to last_seen_at that saw
+    # the same price. None means the price was only seen once.
+    last_seen_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     product = relationship("Product", back_populates="price_history")
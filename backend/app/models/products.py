@@ -1,9 +1,11 @@
 from app.database import Base
-from sqlalchemy import DateTime, String, Float, func
+from sqlalchemy import DateTime, String, Float, func, event
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from enum import Enum
 
+from app.scraper.canonical import canonical_key
+
 class EbayFailStatus(Enum):
     SOLD_OUT = "ITEM SOLD OUT"
     LISTING_ENDED = "LISTING ENDED"
@@ -14,6 +16,8 @@ class Product(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True) 
     url: Mapped[str] = mapped_column(String(2048), nullable=False, unique=True, index=True) 
+    # Shared by every URL of the same listing (e.g. eBay links with different tracking parameters)
+    canonical_key: Mapped[str | None] = mapped_column(String(255), nullable=True, unique=True, index=True)
     current_price: Mapped[float] = mapped_column(Float, nullable=False)
     lowest_price: Mapped[float | None] = mapped_column(Float, nullable=True)
     highest_price: Mapped[float | None] = mapped_column(Float, nullable=True)
@@ -30,6 +34,18 @@ class Product(Base):
         insert_default=func.now()
     )
 
+    # When the scheduler should check the product next (see app.scheduler.cadence). None means now.
+    # New products get a first check spread over one base interval (CadencePolicy.first_interval).
+    next_check_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+    # Scheduler worker currently checking the product, and when its claim runs out if it never reports back
+    lease_owner: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # HTTP validators and body digest from the last successful scrape, used for conditional re-scrapes
+    etag: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    last_modified: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    content_digest: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
     # Relationships
     # When a product is deleted, delete all of the price history related to that product.
     price_history = relationship(
@@ -55,5 +71,21 @@ class Product(Base):
         passive_deletes=True
     )
 
+    # When a product is deleted, delete its queued scrape jobs.
+    scrape_jobs = relationship(
+        "ScrapeJob",
+        back_populates="product",
+        cascade="all, delete, delete-orphan",
+        passive_deletes=True
+    )
+
     def __repr__(self):
-        return f"<Product(id={self.id}, name='{self.name}', url='{self.url}')>"
\ No newline at end of file
+        return f"<Product(id={self.id}, name='{self.name}', url='{self.url}')>"
+
+
+# Keep the canonical key in step with the URL and source however the product is written
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _set_canonical_key(mapper, connection, target: Product):
+    if target.url:
+        target.canonical_key = canonical_key(target.url, target.source)
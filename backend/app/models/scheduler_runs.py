@@ -0,0 +1,59 @@
+from app.database import Base
+from sqlalchemy import Boolean, DateTime, Index, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from datetime import datetime
+from enum import Enum
+
+class SchedulerRunStatus(str, Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    # Stopped by an error; can be resumed, as can a run that crashed while "running" once its
+    # heartbeat has gone stale
+    FAILED = "failed"
+    # Stopped by a signal (Ctrl-C, a deploy's SIGTERM); can be resumed
+    INTERRUPTED = "interrupted"
+
+class SchedulerRun(Base):
+    """
+    The ledger of one-shot scheduler runs. Each committed batch moves the run's cursor and counts
+    forward in the same transaction, so after a crash `--resume` picks up right after the last
+    committed batch instead of starting over.
+    """
+    __tablename__ = "scheduler_runs"
+    __table_args__ = (
+        Index("ix_scheduler_runs_status_started_at", "status", "started_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # The lease_owner the run claims products under; a resumed run keeps it to take back its own claims
+    worker_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    # The process running the run right now, which keeps heartbeat_at fresh while it is alive. A
+    # running run is only taken over by --resume once its heartbeat is stale.
+    owner: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    heartbeat_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default=SchedulerRunStatus.RUNNING.value)
+    due_only: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
+    # Products due before this time are part of the run (null for --all runs)
+    due_before: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Every product with an id up to the cursor has been handled and committed
+    cursor: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    succeeded: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    skipped: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    deleted: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    resumed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Set when a budget limit ("deadline", "max_requests", "max_bytes") stopped the run early
+    stop_reason: Mapped[str | None] = mapped_column(String(20), nullable=True)
+    # Due products the run left for the next one, including those it released for a later retry
+    carried_over: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    started_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        insert_default=func.now()
+    )
+    # Last checkpoint
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<SchedulerRun(id={self.id}, status={self.status}, cursor={self.cursor})>"
@@ -0,0 +1,51 @@
+from app.database import Base
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, func, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from datetime import datetime
+from enum import Enum
+
+class ScrapeJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    # Gave up after max_attempts; kept for inspection
+    DEAD = "dead"
+
+# Jobs that still have work to do. At most one per product (see uq_scrape_jobs_active_product).
+ACTIVE_STATUSES = (ScrapeJobStatus.PENDING.value, ScrapeJobStatus.RUNNING.value)
+_ACTIVE = text("status IN ('pending', 'running')")
+
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        # Deduplicates pending work: enqueueing a product that already has an active job reuses it
+        Index("uq_scrape_jobs_active_product", "product_id", unique=True,
+              postgresql_where=_ACTIVE, sqlite_where=_ACTIVE),
+        # Claim order: lowest priority lane first, then oldest
+        Index("ix_scrape_jobs_claim", "status", "priority", "available_at"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    # Lower runs first, see app.scheduler.jobs for the lanes
+    priority: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default=ScrapeJobStatus.PENDING.value)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    max_attempts: Mapped[int] = mapped_column(Integer, nullable=False)
+    # Not claimed before this time (retry backoff)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, insert_default=func.now())
+    lease_owner: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    lease_expires_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_error: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        insert_default=func.now()
+    )
+    completed_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    product = relationship("Product", back_populates="scrape_jobs")
+
+    def __repr__(self):
+        return f"<ScrapeJob(id={self.id}, product_id={self.product_id}, status={self.status}, priority={self.priority})>"
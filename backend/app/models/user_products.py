@@ -1,10 +1,14 @@
 from app.database import Base
-from sqlalchemy import DateTime, ForeignKey, func, String
+from sqlalchemy import DateTime, ForeignKey, Index, func, String
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 
 class UserProduct(Base):
     __tablename__ = "user_products"
+    __table_args__ = (
+        # Threshold alerts look up every user tracking a product whose price changed
+        Index("ix_user_products_product_id", "product_id"),
+    )
     id: Mapped[int] = mapped_column(primary_key=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
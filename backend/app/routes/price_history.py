@@ -4,7 +4,21 @@ from app.database import get_db
 from app.models import PriceHistory, Product, User, UserProduct
 from app.auth import get_current_user
 from app.schemas.price_history import ReturnSearchHistoryModel, NotificationFilter
-from typing import Optional
+from typing import Optional, Iterable, Any
+
+def expand_price_runs(rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Turns price history rows into chart points, newest first. A row covering several checks at the
+    same price (see PRICE_HISTORY_MODE) gives a point when the price was first seen and one when it
+    was last seen, so charts draw a flat line across the run.
+    """
+    points = []
+    for row in rows:
+        points.append(row)
+        if row["last_seen_at"] is not None and row["last_seen_at"] > row["timestamp"]:
+            points.append({**row, "timestamp": row["last_seen_at"]})
+    points.sort(key=lambda point: point["timestamp"], reverse=True)
+    return points
 
 router = APIRouter(
     prefix="/price-history",
@@ -16,10 +30,12 @@ def get_product_price_history(product_id: Optional[int | str],
                               name: Optional[str] = None,
                               notifications: Optional[NotificationFilter] = None,
                               user_filter: Optional[int] = None,
+                              expand: bool = True,
                               db: Session = Depends(get_db), 
                               current_user: User = Depends(get_current_user)):
     """
     Retrieve the price history of a product by the search parameters.
+    With expand (the default), rows covering several checks are expanded into their first and last check.
     """
     if product_id == '':
         product_id = None
@@ -31,6 +47,7 @@ def get_product_price_history(product_id: Optional[int | str],
                      Product.id.label('product_id'), 
                      PriceHistory.price, 
                      PriceHistory.timestamp, 
+                     PriceHistory.last_seen_at,
                      Product.source, 
                      UserProduct.notify.label('notifications')).\
     join(Product, PriceHistory.product_id == Product.id).\
@@ -52,21 +69,28 @@ def get_product_price_history(product_id: Optional[int | str],
         query = query.filter(UserProduct.notify == (True if notifications == NotificationFilter.enabled else False))
     query = query.order_by(PriceHistory.timestamp.desc())  # Order by timestamp descending
 
-    price_history = query.all()
-    return price_history
+    price_history = [dict(row._mapping) for row in query.all()]
+    return expand_price_runs(price_history) if expand else price_history
 
 @router.get('/', response_model=list[ReturnSearchHistoryModel])
-def get_all_price_histories(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_all_price_histories(expand: bool = True, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
-    Retrieve all price histories for products associated with the current user.
+    Retrieve all price histories for products associated with the current user, expanded like /search-price-history.
     """
     user_products = db.query(UserProduct).filter(UserProduct.user_id == current_user.id).all()
     if not user_products:
         return []
 
     product_ids = [up.product_id for up in user_products]
-    all_price_histories = db.query(PriceHistory).filter(PriceHistory.product_id.in_(product_ids)).all()
+    query = db.query(PriceHistory.id,
+                     PriceHistory.product_id,
+                     PriceHistory.price,
+                     PriceHistory.timestamp,
+                     PriceHistory.last_seen_at).filter(PriceHistory.product_id.in_(product_ids))
+    all_price_histories = [dict(row._mapping) for row in query.all()]
+    if expand:
+        return expand_price_runs(all_price_histories)
 
-    all_price_histories.sort(key = lambda x: x.timestamp, reverse=True)  # Sort by timestamp descending
+    all_price_histories.sort(key = lambda x: x["timestamp"], reverse=True)  # Sort by timestamp descending
 
     return all_price_histories
\ No newline at end of file
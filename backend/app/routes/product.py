@@ -1,9 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import Product, PriceHistory, UserProduct, User
+from app.models import Product, PriceHistory, UserProduct, User, ScrapeJob
 from app.schemas.product import ProductCreate, UserCreateProduct, ProductOut
+from app.schemas.scrape_job import ScrapeJobOut
 from app.scraper.product_scraper import scrape_product_data
+from app.scraper.canonical import canonical_key
+from app.scraper.circuit_breaker import CircuitOpenError
+from app.scheduler.alerts import alert_row, evaluate_price_alerts
+from app.scheduler.bulk import record_price_histories
+from app.scheduler.cadence import CadencePolicy
+from app.scheduler.queue import enqueue_job, PRIORITY_USER
 from app.auth import get_current_user
 from datetime import datetime, timezone
 from enum import Enum
@@ -13,12 +21,32 @@ class ProductStatus(str, Enum):
     PRODUCT_EXISTS = "Product already exists"
     PRODUCT_SCRAPER_FAILED = "Failed to scrape product data"
 
+def _source_unavailable(error: CircuitOpenError) -> HTTPException:
+    """503 returned while the product's source is being skipped by the scraper's circuit breaker."""
+    return HTTPException(
+        status_code=503,
+        detail=f"{error.source} is temporarily unavailable. Please try again later.",
+        headers={"Retry-After": str(max(1, round(error.retry_after)))},
+    )
+
 # Create a router for product-related endpoints
 router = APIRouter(
     prefix="/products",
     tags=["products"],
 )
 
+# Helper function to find a product by any of its URLs
+def _find_existing_product(db: Session, url: str, source: str | None) -> Product | None:
+    """
+    Looks a product up by its canonical key, so URLs of the same listing that only differ in
+    tracking parameters find the same product. Falls back to the exact URL for rows without a key.
+    """
+    key = canonical_key(url, source)
+    product = db.query(Product).filter(Product.canonical_key == key).first()
+    if product is None:
+        product = db.query(Product).filter(Product.url == url).first()
+    return product
+
 # Helper function to create a product
 async def _create_product_internal(product_data: ProductCreate, db: Session) -> Product | tuple[ProductStatus, Product] | ProductStatus:
     """
@@ -29,18 +57,24 @@ async def _create_product_internal(product_data: ProductCreate, db: Session) ->
         - (ProductStatus.PRODUCT_EXISTS, existing_product) if product exists
         - ProductStatus.PRODUCT_SCRAPER_FAILED if scraping fails
     """
-    # Check if product with the same URL already exists
-    existing_product = db.query(Product).filter(Product.url == str(product_data.url)).first()
+    # Check if the same product already exists, possibly under a different URL
+    existing_product = _find_existing_product(db, str(product_data.url), product_data.source)
 
     # If the product already exists, return the enum type exists and the product itself
     if existing_product:
         return (ProductStatus.PRODUCT_EXISTS, existing_product)
 
-    # Call the web scraping function to get the product details
+    # Call the web scraping function to get the product details.
+    # Concurrent requests for the same URL share a single scrape.
     scraped_data = await scrape_product_data(str(product_data.url), str(product_data.source))
     if not scraped_data:
         return ProductStatus.PRODUCT_SCRAPER_FAILED
 
+    # Another request may have created the product while we were scraping
+    existing_product = _find_existing_product(db, str(product_data.url), product_data.source)
+    if existing_product:
+        return (ProductStatus.PRODUCT_EXISTS, existing_product)
+
     # Create new product
     now = datetime.now(timezone.utc)
     new_product = Product(
@@ -52,11 +86,23 @@ async def _create_product_internal(product_data: ProductCreate, db: Session) ->
         source=product_data.source,
         image_url=scraped_data["image_url"],
         created_at=now,
-        last_checked=now
+        last_checked=now,
+        next_check_at=now + CadencePolicy().first_interval(),
+        etag=scraped_data.get("etag"),
+        last_modified=scraped_data.get("last_modified"),
+        content_digest=scraped_data.get("content_digest"),
     )
 
-    db.add(new_product)
-    db.flush() # Use flush to get the new_product.id before committing
+    # Use a savepoint so losing the race on the unique URL or canonical key only undoes this insert
+    try:
+        with db.begin_nested():
+            db.add(new_product)
+            db.flush() # Use flush to get the new_product.id before committing
+    except IntegrityError:
+        existing_product = _find_existing_product(db, str(product_data.url), product_data.source)
+        if existing_product:
+            return (ProductStatus.PRODUCT_EXISTS, existing_product)
+        raise
 
     # Add the new product's price history
     price_history = PriceHistory(
@@ -241,6 +287,9 @@ async def create_product(user_product_data: UserCreateProduct, db: Session = Dep
         # Re-raise HTTPExceptions from previous checks
         db.rollback() # Rollback if an HTTPException occurred before commit
         raise
+    except CircuitOpenError as e:
+        db.rollback()
+        raise _source_unavailable(e)
     except Exception as e:
         # Catch any other unexpected errors and rollback
         db.rollback()
@@ -257,14 +306,23 @@ async def update_product(product_id: int, product: ProductCreate, db: Session =
     existing_product = db.query(Product).filter(Product.id == product_id).first()
     if not existing_product:
         raise HTTPException(status_code=404, detail="Product not found")
+
+    # The new URL must not point at a listing another product already tracks
+    duplicate = _find_existing_product(db, str(product.url), str(product.source))
+    if duplicate is not None and duplicate.id != existing_product.id:
+        raise HTTPException(status_code=409, detail="Another product already tracks this URL")
     existing_product.url = str(product.url)
 
     # Call the web scraping function to update the product details
-    scraped_data = await scrape_product_data(str(product.url), str(product.source))
+    try:
+        scraped_data = await scrape_product_data(str(product.url), str(product.source))
+    except CircuitOpenError as e:
+        raise _source_unavailable(e)
     if not scraped_data:
         raise HTTPException(status_code=400, detail="Failed to retrieve updated product details")
     
     # Update the product attributes
+    previous_price = existing_product.current_price
     existing_product.name = scraped_data["name"]
     existing_product.source = str(product.source)
     existing_product.current_price = scraped_data["current_price"]
@@ -274,20 +332,59 @@ async def update_product(product_id: int, product: ProductCreate, db: Session =
         existing_product.highest_price = scraped_data["current_price"]
     existing_product.image_url = scraped_data["image_url"]
     existing_product.last_checked = datetime.now(timezone.utc)
-
-    # Create a new entry in the price history
-    price_history = PriceHistory(
-        product_id=existing_product.id,
-        price=scraped_data["current_price"],
-        timestamp=datetime.now(timezone.utc),
-    )
-
-    db.add(price_history)
+    existing_product.etag = scraped_data.get("etag")
+    existing_product.last_modified = scraped_data.get("last_modified")
+    existing_product.content_digest = scraped_data.get("content_digest")
+
+    # Record the price in the history (a new row only if it changed, depending on PRICE_HISTORY_MODE)
+    record_price_histories(db, [{
+        "product_id": existing_product.id,
+        "price": scraped_data["current_price"],
+        "timestamp": existing_product.last_checked,
+    }])
+    # Alert the users whose thresholds the new price crossed, the same way the scheduler does
+    evaluate_price_alerts(db, [alert_row(existing_product.id, existing_product.name, previous_price,
+                                         existing_product.current_price)], existing_product.last_checked)
     db.merge(existing_product)
     db.commit()
     db.refresh(existing_product)
     return existing_product
 
+def _get_tracked_product(db: Session, product_id: int, current_user: User) -> Product:
+    """The product, if it exists and the user tracks it (admins can see every product)."""
+    product = db.query(Product).filter(Product.id == product_id).first()
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if not getattr(current_user, "admin", False):
+        tracked = db.query(UserProduct).filter(UserProduct.product_id == product_id,
+                                               UserProduct.user_id == current_user.id).first()
+        if not tracked:
+            raise HTTPException(status_code=404, detail="Product not found")
+    return product
+
+@router.post('/{product_id}/refresh', status_code=status.HTTP_202_ACCEPTED, response_model=ScrapeJobOut)
+def refresh_product(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Queue a re-check of the product's price, ahead of the routine background checks.
+    Returns the scrape job; if one is already queued for the product, that job is returned.
+    """
+    product = _get_tracked_product(db, product_id, current_user)
+    job = enqueue_job(db, product.id, datetime.now(timezone.utc), PRIORITY_USER)
+    db.commit()
+    db.refresh(job)
+    return job
+
+@router.get('/{product_id}/refresh', response_model=ScrapeJobOut)
+def get_refresh_status(product_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Retrieve the product's most recent scrape job.
+    """
+    product = _get_tracked_product(db, product_id, current_user)
+    job = db.query(ScrapeJob).filter(ScrapeJob.product_id == product.id).order_by(ScrapeJob.id.desc()).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="No refresh requested for this product")
+    return job
+
 @router.delete('/{product_id}', response_model=dict)
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     """
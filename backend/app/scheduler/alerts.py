@@ -0,0 +1,106 @@
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, Sequence
+
+from sqlalchemy import DateTime, Float, Integer, String, and_, case, column, insert, literal, or_, select, values
+from sqlalchemy.orm import Session
+
+from app.models import Alert, AlertType, Notification, UserProduct
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_user_products = UserProduct.__table__
+_alerts = Alert.__table__
+_notifications = Notification.__table__
+
+# Rows per statement. Each row is 5 bind parameters, well below Postgres' limit of 65535.
+_MAX_ROWS = 5000
+
+
+def _message(text: str) -> str:
+    # notifications.message is a VARCHAR(255)
+    return text if len(text) <= 255 else text[:252] + "..."
+
+
+def alert_row(product_id: int, name: str, previous_price: Optional[float], price: float) -> Dict[str, Any]:
+    return {
+        "product_id": product_id,
+        "previous_price": previous_price,
+        "price": price,
+        "drop_message": _message(f"Price drop: '{name}' is now ${price:.2f}, at or below your alert price."),
+        "increase_message": _message(f"Price increase: '{name}' is now ${price:.2f}, at or above your alert price."),
+    }
+
+
+def _insert_statements(rows: Sequence[Dict[str, Any]], created_at: datetime):
+    """
+    An INSERT ... SELECT for alerts and one for notifications. The batch's prices are bound once,
+    as a VALUES list, and joined to user_products through its product_id index, so every tracking
+    user is handled in SQL.
+    """
+    batch = values(
+        column("product_id", Integer), column("previous_price", Float), column("price", Float),
+        column("drop_message", String), column("increase_message", String),
+        name="batch",
+    ).data([
+        (row["product_id"], row["previous_price"], row["price"], row["drop_message"], row["increase_message"])
+        for row in rows
+    ]).cte("batch")
+
+    # A threshold is crossed when the previous price was on one side of it and the new price
+    # reached it, so a price that stays below the lower threshold alerts once, not on every run.
+    crossed_lower = and_(
+        _user_products.c.lower_threshold.isnot(None),
+        batch.c.previous_price > _user_products.c.lower_threshold,
+        batch.c.price <= _user_products.c.lower_threshold,
+    )
+    crossed_upper = and_(
+        _user_products.c.upper_threshold.isnot(None),
+        batch.c.previous_price < _user_products.c.upper_threshold,
+        batch.c.price >= _user_products.c.upper_threshold,
+    )
+
+    def crossings(*columns):
+        return (
+            select(*columns)
+            .select_from(batch.join(_user_products, _user_products.c.product_id == batch.c.product_id))
+            .where(_user_products.c.notify.is_(True), or_(crossed_lower, crossed_upper))
+        )
+
+    created = literal(created_at, DateTime(timezone=True))
+    insert_alerts = insert(_alerts).from_select(
+        ["product_id", "user_id", "target_price", "alert_type", "created_at"],
+        crossings(
+            _user_products.c.product_id,
+            _user_products.c.user_id,
+            case((crossed_lower, _user_products.c.lower_threshold), else_=_user_products.c.upper_threshold),
+            case(
+                (crossed_lower, literal(AlertType.DROP, _alerts.c.alert_type.type)),
+                else_=literal(AlertType.INCREASE, _alerts.c.alert_type.type),
+            ),
+            created,
+        ),
+    )
+    insert_notifications = insert(_notifications).from_select(
+        ["user_id", "message", "is_read", "created_at"],
+        crossings(
+            _user_products.c.user_id,
+            case((crossed_lower, batch.c.drop_message), else_=batch.c.increase_message),
+            literal(False),
+            created,
+        ),
+    )
+    return insert_alerts, insert_notifications
+
+
+def evaluate_price_alerts(db: Session, rows: Sequence[Dict[str, Any]], created_at: datetime) -> None:
+    """
+    Creates an Alert and a Notification for every user whose lower or upper threshold was crossed
+    by a batch of price changes (see alert_row). Products without a previous price, or whose price
+    didn't move, can't cross anything and are left out. Does not commit.
+    """
+    rows = [row for row in rows if row["previous_price"] is not None and row["previous_price"] != row["price"]]
+    for offset in range(0, len(rows), _MAX_ROWS):
+        for statement in _insert_statements(rows[offset:offset + _MAX_ROWS], created_at):
+            db.execute(statement)
@@ -0,0 +1,90 @@
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+from app.config import (
+    SCHEDULER_RUN_DEADLINE_SECONDS,
+    SCHEDULER_RUN_MAX_REQUESTS,
+    SCHEDULER_RUN_MAX_PROXY_BYTES,
+    SCHEDULER_BUDGET_RESERVE,
+)
+from app.scraper.client import ScraperClient
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RunBudget:
+    """
+    Limits for one scheduler run; None means no limit. The run stops dispatching products once
+    `reserve` (a fraction) of any limit is left, so the products already in flight can finish and
+    be committed within it.
+    """
+    deadline_seconds: Optional[float] = None
+    max_requests: Optional[int] = None
+    max_bytes: Optional[int] = None
+    reserve: float = SCHEDULER_BUDGET_RESERVE
+
+    @classmethod
+    def from_config(cls) -> "RunBudget":
+        return cls(
+            deadline_seconds=SCHEDULER_RUN_DEADLINE_SECONDS or None,
+            max_requests=SCHEDULER_RUN_MAX_REQUESTS or None,
+            max_bytes=SCHEDULER_RUN_MAX_PROXY_BYTES or None,
+        )
+
+    @property
+    def limited(self) -> bool:
+        return any(limit is not None for limit in (self.deadline_seconds, self.max_requests, self.max_bytes))
+
+
+class BudgetMeter:
+    """
+    Measures a run against its budget: time since the meter was created, and requests and bytes
+    the client sent and received since then (the client may be shared with other work).
+    """
+
+    def __init__(self, budget: RunBudget, client: ScraperClient):
+        self.budget = budget
+        self.client = client
+        self.started = time.monotonic()
+        self._requests_at_start = client.requests_sent
+        self._bytes_at_start = client.bytes_received
+        # Each dispatched product costs at least one request, counted before it is sent
+        self.dispatched = 0
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def requests(self) -> int:
+        return max(self.client.requests_sent - self._requests_at_start, self.dispatched)
+
+    def bytes(self) -> int:
+        return self.client.bytes_received - self._bytes_at_start
+
+    def exhausted(self) -> Optional[str]:
+        """Which limit is nearly used up ("deadline", "max_requests" or "max_bytes"), or None."""
+        budget = self.budget
+        usable = 1 - budget.reserve
+        if budget.deadline_seconds is not None and self.elapsed() >= budget.deadline_seconds * usable:
+            return "deadline"
+        if budget.max_requests is not None and self.requests() >= budget.max_requests * usable:
+            return "max_requests"
+        if budget.max_bytes is not None and self.bytes() >= budget.max_bytes * usable:
+            return "max_bytes"
+        return None
+
+    def seconds_left(self) -> Optional[float]:
+        """
+        Time until products still in flight are abandoned so the run can commit before its deadline:
+        halfway through the reserve. None without a deadline.
+        """
+        if self.budget.deadline_seconds is None:
+            return None
+        cutoff = self.budget.deadline_seconds * (1 - self.budget.reserve / 2)
+        return max(0.0, cutoff - self.elapsed())
+
+    def usage(self) -> Dict[str, Any]:
+        return {"elapsed_seconds": round(self.elapsed(), 1), "requests": self.requests(), "bytes": self.bytes()}
@@ -0,0 +1,223 @@
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Sequence
+
+from sqlalchemy import Float, bindparam, func, insert, select, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+
+from app.config import SCHEDULER_COPY_THRESHOLD, PRICE_HISTORY_MODE
+from app.models import Product, PriceHistory
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# --- LEAST/GREATEST ---
+# Postgres spells these LEAST/GREATEST, SQLite uses multi-argument MIN/MAX.
+class least(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+class greatest(FunctionElement):
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(least)
+def _compile_least(element, compiler, **kw):
+    return f"LEAST({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest)
+def _compile_greatest(element, compiler, **kw):
+    return f"GREATEST({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(least, "sqlite")
+def _compile_least_sqlite(element, compiler, **kw):
+    return f"MIN({compiler.process(element.clauses, **kw)})"
+
+
+@compiles(greatest, "sqlite")
+def _compile_greatest_sqlite(element, compiler, **kw):
+    return f"MAX({compiler.process(element.clauses, **kw)})"
+
+
+_products = Product.__table__
+_price_histories = PriceHistory.__table__
+
+# One statement for the whole batch, run with executemany. The price range is updated in SQL,
+# so the current lowest/highest prices never have to be loaded.
+_UPDATE_PRICES = (
+    update(_products)
+    .where(_products.c.id == bindparam("b_id"))
+    .values(
+        name=bindparam("b_name"),
+        current_price=bindparam("b_price"),
+        lowest_price=least(func.coalesce(_products.c.lowest_price, bindparam("b_price")), bindparam("b_price")),
+        highest_price=greatest(func.coalesce(_products.c.highest_price, bindparam("b_price")), bindparam("b_price")),
+        last_checked=bindparam("b_checked"),
+        etag=bindparam("b_etag"),
+        last_modified=bindparam("b_last_modified"),
+        content_digest=bindparam("b_content_digest"),
+        # Writing the result releases the scheduler's claim on the product
+        lease_owner=None,
+        lease_expires_at=None,
+    )
+)
+
+_UPDATE_VALIDATORS = (
+    update(_products)
+    .where(_products.c.id == bindparam("b_id"))
+    .values(
+        last_checked=bindparam("b_checked"),
+        etag=bindparam("b_etag"),
+        last_modified=bindparam("b_last_modified"),
+        content_digest=bindparam("b_content_digest"),
+        # Writing the result releases the scheduler's claim on the product
+        lease_owner=None,
+        lease_expires_at=None,
+    )
+)
+
+# Extends a price history row to cover a later check that saw the same price
+_EXTEND_PRICE_HISTORIES = (
+    update(_price_histories)
+    .where(_price_histories.c.id == bindparam("b_history_id"))
+    .values(last_seen_at=bindparam("b_seen"))
+)
+
+
+def price_update_row(product_id: int, scraped_data: Dict[str, Any], checked_at: datetime) -> Dict[str, Any]:
+    return {
+        "b_id": product_id,
+        "b_name": scraped_data["name"],
+        "b_price": scraped_data["current_price"],
+        "b_checked": checked_at,
+        "b_etag": scraped_data.get("etag"),
+        "b_last_modified": scraped_data.get("last_modified"),
+        "b_content_digest": scraped_data.get("content_digest"),
+    }
+
+
+def validator_update_row(product_id: int, scraped_data: Dict[str, Any], checked_at: datetime) -> Dict[str, Any]:
+    return {
+        "b_id": product_id,
+        "b_checked": checked_at,
+        "b_etag": scraped_data.get("etag"),
+        "b_last_modified": scraped_data.get("last_modified"),
+        "b_content_digest": scraped_data.get("content_digest"),
+    }
+
+
+def _fenced(statement, worker_id: Optional[str]):
+    # Only touches products worker_id still holds, so a worker whose lease ran out and was taken
+    # over can't overwrite (or release) the new holder's claim
+    return statement if worker_id is None else statement.where(_products.c.lease_owner == worker_id)
+
+
+def update_prices(db: Session, rows: Sequence[Dict[str, Any]], worker_id: Optional[str] = None) -> None:
+    """
+    Applies new prices (see price_update_row) with a single executemany UPDATE, only to products
+    worker_id still holds if given.
+    """
+    if rows:
+        db.execute(_fenced(_UPDATE_PRICES, worker_id), list(rows))
+
+
+def update_validators(db: Session, rows: Sequence[Dict[str, Any]], worker_id: Optional[str] = None) -> None:
+    """
+    Records unchanged pages (see validator_update_row) with a single executemany UPDATE, only for
+    products worker_id still holds if given.
+    """
+    if rows:
+        db.execute(_fenced(_UPDATE_VALIDATORS, worker_id), list(rows))
+
+
+def _copy_price_histories(db: Session, rows: Sequence[Dict[str, Any]]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow((row["product_id"], row["price"], row["timestamp"].isoformat()))
+    buffer.seek(0)
+
+    # Runs on the session's own connection, so the rows are part of the batch's transaction
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert("COPY price_histories (product_id, price, timestamp) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_price_histories(db: Session, rows: List[Dict[str, Any]],
+                           copy_threshold: Optional[int] = SCHEDULER_COPY_THRESHOLD) -> None:
+    """
+    Inserts price history rows (product_id, price, timestamp) in one go: a multi-row INSERT,
+    or COPY on Postgres (psycopg2) for batches of at least copy_threshold rows.
+    """
+    if not rows:
+        return
+    bind = db.get_bind()
+    if (copy_threshold and len(rows) >= copy_threshold
+            and bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2"):
+        _copy_price_histories(db, rows)
+    else:
+        db.execute(insert(_price_histories), rows)
+
+
+def latest_price_histories(db: Session, product_ids: Sequence[int]) -> Dict[int, Any]:
+    """Each product's most recent price history row (id, product_id, price), keyed by product id."""
+    if not product_ids:
+        return {}
+    latest_ids = (
+        select(func.max(_price_histories.c.id))
+        .where(_price_histories.c.product_id.in_(product_ids))
+        .group_by(_price_histories.c.product_id)
+    )
+    rows = db.execute(
+        select(_price_histories.c.id, _price_histories.c.product_id, _price_histories.c.price)
+        .where(_price_histories.c.id.in_(latest_ids))
+    )
+    return {row.product_id: row for row in rows}
+
+
+def record_price_histories(db: Session, rows: List[Dict[str, Any]], mode: str = PRICE_HISTORY_MODE,
+                           copy_threshold: Optional[int] = SCHEDULER_COPY_THRESHOLD) -> None:
+    """
+    Records checked prices (product_id, price, timestamp). In "change_only" mode a price equal to
+    the product's latest row only moves that row's last_seen_at forward, so a product whose price
+    never changes keeps a single row. In "every_check" mode every price gets its own row.
+    """
+    if not rows:
+        return
+    if mode == "change_only":
+        latest = latest_price_histories(db, [row["product_id"] for row in rows])
+        extended, changed = [], []
+        for row in rows:
+            last = latest.get(row["product_id"])
+            if last is not None and last.price == row["price"]:
+                extended.append({"b_history_id": last.id, "b_seen": row["timestamp"]})
+            else:
+                changed.append(row)
+        if extended:
+            db.execute(_EXTEND_PRICE_HISTORIES, extended)
+        rows = changed
+    insert_price_histories(db, rows, copy_threshold)
+
+
+def extend_price_histories(db: Session, product_ids: Sequence[int], seen_at: datetime,
+                           mode: str = PRICE_HISTORY_MODE) -> None:
+    """
+    Marks the products' latest prices as seen again at seen_at, for pages that haven't changed
+    since the last check. Only applies in "change_only" mode.
+    """
+    if mode != "change_only" or not product_ids:
+        return
+    latest = latest_price_histories(db, product_ids)
+    if latest:
+        db.execute(_EXTEND_PRICE_HISTORIES, [{"b_history_id": row.id, "b_seen": seen_at} for row in latest.values()])
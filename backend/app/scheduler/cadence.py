@@ -0,0 +1,178 @@
+import logging
+import math
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, bindparam, case, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import (
+    SCHEDULER_BASE_INTERVAL_MINUTES,
+    SCHEDULER_MIN_INTERVAL_MINUTES,
+    SCHEDULER_MAX_INTERVAL_MINUTES,
+    SCHEDULER_VOLATILITY_WINDOW_DAYS,
+    SCHEDULER_NEAR_THRESHOLD,
+    SCHEDULER_CHECK_JITTER,
+    PRICE_HISTORY_MODE,
+)
+from app.models import Product, PriceHistory, UserProduct
+from app.scheduler.leases import as_utc
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CadencePolicy:
+    base_minutes: float = SCHEDULER_BASE_INTERVAL_MINUTES
+    min_minutes: float = SCHEDULER_MIN_INTERVAL_MINUTES
+    max_minutes: float = SCHEDULER_MAX_INTERVAL_MINUTES
+    # Price changes are counted over this many days
+    volatility_window_days: float = SCHEDULER_VOLATILITY_WINDOW_DAYS
+    # A threshold within this fraction of the current price counts as close to alerting
+    near_threshold: float = SCHEDULER_NEAR_THRESHOLD
+    jitter: float = SCHEDULER_CHECK_JITTER
+
+    def interval(self, changes: int, watchers: int, near_threshold: bool) -> timedelta:
+        """
+        How long until the next check. Starts from base_minutes and is
+        - divided by 1 + price changes per day, so a price that moves daily is checked twice as often,
+        - divided by 1 + log2(watchers), so popular products are checked more often; doubled when nobody watches,
+        - quartered when a watcher's threshold is close to the current price,
+        then clamped to [min_minutes, max_minutes] with +/- jitter.
+        """
+        minutes = self.base_minutes / (1 + changes / self.volatility_window_days)
+        minutes = minutes / (1 + math.log2(watchers)) if watchers else minutes * 2
+        if near_threshold:
+            minutes /= 4
+        minutes = min(self.max_minutes, max(self.min_minutes, minutes))
+        if self.jitter:
+            minutes *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return timedelta(minutes=minutes)
+
+    def first_interval(self) -> timedelta:
+        """
+        How long until a new product's first scheduled check (it was just scraped when it was added):
+        anywhere within one base interval, so products added together don't all come due together.
+        """
+        return timedelta(minutes=random.uniform(0, self.base_minutes))
+
+    def priority(self, overdue_minutes: float, watchers: int, near_threshold: bool) -> float:
+        """
+        How urgent a due check is, for runs that can't check everything (see RunBudget). Grows with
+        how overdue the product is (in base intervals) and, like interval(), with its watchers and
+        a watcher's threshold being close to the price.
+        """
+        score = 1 + max(0.0, overdue_minutes) / self.base_minutes
+        score *= 1 + math.log2(watchers) if watchers else 0.5
+        if near_threshold:
+            score *= 4
+        return score
+
+
+_UPDATE_NEXT_CHECK = (
+    update(Product.__table__)
+    .where(Product.__table__.c.id == bindparam("b_id"))
+    .values(next_check_at=bindparam("b_next"))
+)
+
+
+def _price_changes(db: Session, product_ids: Sequence[int], since: datetime,
+                   mode: str = PRICE_HISTORY_MODE) -> Dict[int, int]:
+    if mode == "change_only":
+        # Each row is a price change
+        rows = db.execute(
+            select(PriceHistory.product_id, func.count())
+            .where(PriceHistory.product_id.in_(product_ids), PriceHistory.timestamp >= since)
+            .group_by(PriceHistory.product_id)
+        )
+        return dict(rows.all())
+
+    # Every check has a row, so count the rows whose price differs from the row before. The first
+    # row in the window has nothing to compare with and isn't counted.
+    previous = func.lag(PriceHistory.price).over(
+        partition_by=PriceHistory.product_id, order_by=(PriceHistory.timestamp, PriceHistory.id)
+    )
+    window = (
+        select(PriceHistory.product_id, PriceHistory.price, previous.label("previous_price"))
+        .where(PriceHistory.product_id.in_(product_ids), PriceHistory.timestamp >= since)
+        .subquery()
+    )
+    rows = db.execute(
+        select(window.c.product_id, func.count())
+        .where(window.c.previous_price.isnot(None), window.c.price != window.c.previous_price)
+        .group_by(window.c.product_id)
+    )
+    return dict(rows.all())
+
+
+def _watcher_columns(near: float) -> tuple:
+    """Watchers, and 1 if a notified watcher's threshold is within near of the price, grouped by product."""
+    margin = Product.current_price * near
+    close = and_(
+        UserProduct.notify.is_(True),
+        or_(
+            func.abs(Product.current_price - UserProduct.lower_threshold) <= margin,
+            func.abs(Product.current_price - UserProduct.upper_threshold) <= margin,
+        ),
+    )
+    return func.count().label("watchers"), func.max(case((close, 1), else_=0)).label("near_threshold")
+
+
+def _watchers(db: Session, product_ids: Sequence[int], near: float) -> Dict[int, tuple]:
+    """(watchers, whether a notified watcher's threshold is within near of the price) per product."""
+    rows = db.execute(
+        select(UserProduct.product_id, *_watcher_columns(near))
+        .join(Product, Product.id == UserProduct.product_id)
+        .where(UserProduct.product_id.in_(product_ids))
+        .group_by(UserProduct.product_id)
+    )
+    return {product_id: (watchers, bool(near_threshold)) for product_id, watchers, near_threshold in rows}
+
+
+def schedule_next_checks(db: Session, product_ids: Sequence[int], checked_at: datetime,
+                         policy: CadencePolicy = CadencePolicy(), mode: str = PRICE_HISTORY_MODE) -> None:
+    """
+    Sets next_check_at for products that were just checked, from their recent price changes and
+    watchers. Two grouped queries and one executemany UPDATE per batch. Does not commit.
+    """
+    if not product_ids:
+        return
+    changes = _price_changes(db, product_ids, checked_at - timedelta(days=policy.volatility_window_days), mode)
+    watchers = _watchers(db, product_ids, policy.near_threshold)
+    rows = []
+    for product_id in product_ids:
+        watcher_count, near_threshold = watchers.get(product_id, (0, False))
+        interval = policy.interval(changes.get(product_id, 0), watcher_count, near_threshold)
+        rows.append({"b_id": product_id, "b_next": checked_at + interval})
+    db.execute(_UPDATE_NEXT_CHECK, rows)
+
+
+def prioritize_products(db: Session, now: datetime, due_before: Optional[datetime] = None,
+                        policy: CadencePolicy = CadencePolicy()) -> List[int]:
+    """
+    Ids of the products that are due (every product without due_before), most urgent first
+    (see CadencePolicy.priority). One grouped query; only ids are kept in memory.
+    """
+    watchers = (
+        select(UserProduct.product_id, *_watcher_columns(policy.near_threshold))
+        .join(Product, Product.id == UserProduct.product_id)
+        .group_by(UserProduct.product_id)
+        .subquery()
+    )
+    statement = (
+        select(Product.id, Product.next_check_at, Product.last_checked, watchers.c.watchers, watchers.c.near_threshold)
+        .outerjoin(watchers, watchers.c.product_id == Product.id)
+    )
+    if due_before is not None:
+        statement = statement.where(or_(Product.next_check_at.is_(None), Product.next_check_at <= due_before))
+
+    ranked = []
+    for product_id, next_check_at, last_checked, watcher_count, near_threshold in db.execute(statement):
+        due_at = next_check_at or last_checked
+        overdue = (now - as_utc(due_at)).total_seconds() / 60 if due_at else 0.0
+        ranked.append((-policy.priority(overdue, watcher_count or 0, bool(near_threshold)), product_id))
+    ranked.sort()
+    return [product_id for _, product_id in ranked]
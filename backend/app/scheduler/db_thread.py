@@ -0,0 +1,34 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any, TypeVar
+
+T = TypeVar("T")
+
+
+class DatabaseThread:
+    """
+    Runs a scheduler's blocking database work (claims, batch writes, lease renewals, heartbeats) off
+    the event loop, so fetches keep going while a batch commits.
+
+    Everything goes through one dedicated thread, so the work stays serialized the way it was on
+    the event loop: a scheduler never has two sessions busy at once (SQLite allows one writer), and
+    a batch can't be written while an earlier one is still committing.
+    """
+
+    def __init__(self, name: str = "scheduler-db"):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    async def __aenter__(self) -> "DatabaseThread":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Runs fn(*args, **kwargs) on the database thread, after the work queued before it."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
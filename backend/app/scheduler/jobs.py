@@ -0,0 +1,157 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import SCHEDULER_WORKERS, SCHEDULER_FLUSH_SECONDS, SCRAPE_JOB_LEASE_SECONDS, SCRAPE_JOB_CLAIM_SIZE
+from app.database import get_session_local
+from app.models import Product, ScrapeJob
+from app.scheduler.db_thread import DatabaseThread
+from app.scheduler.leases import claim_products, keep_leases, release_products, renew_leases, new_worker_id
+from app.scheduler.products import ProductSnapshot, ScrapeOutcome, scrape_product, write_batch
+from app.scheduler.queue import claim_jobs, complete_job, fail_job, renew_jobs
+from app.scraper.client import ScraperClient
+from app.scraper.parse_executor import ParseExecutor, create_parse_executor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _renew_claims(session_factory: sessionmaker, worker_id: str, now: datetime, lease: timedelta) -> int:
+    """Renews worker_id's jobs and the products they are checking (see keep_leases)."""
+    return renew_jobs(session_factory, worker_id, now, lease) + renew_leases(session_factory, worker_id, now, lease)
+
+
+class JobWorker:
+    """
+    Works through the scrape_jobs queue: claims a handful of jobs, scrapes their products
+    `concurrency` at a time and writes each result together with the job's new status, so a job is
+    only marked done once its price is stored. Failed scrapes are retried with backoff and
+    dead-lettered after max_attempts (see app.scheduler.queue).
+
+    A job's product is claimed like the schedulers claim theirs (see claim_products) before it is
+    scraped, so a product is never checked by a job and a scheduler at the same time. A job whose
+    product is already claimed is put back without using up an attempt. Both leases are renewed
+    while the round's scrapes run, so a slow page isn't taken over by another worker.
+    """
+
+    def __init__(self,
+                 session_factory: Optional[sessionmaker] = None,
+                 client: Optional[ScraperClient] = None,
+                 parse_executor: Optional[ParseExecutor] = None,
+                 concurrency: int = SCHEDULER_WORKERS,
+                 claim_size: int = SCRAPE_JOB_CLAIM_SIZE,
+                 lease_seconds: float = SCRAPE_JOB_LEASE_SECONDS,
+                 poll_seconds: float = SCHEDULER_FLUSH_SECONDS):
+        self.session_factory = session_factory or get_session_local()
+        self._owns_client = client is None
+        self.client = client or ScraperClient()
+        self._owns_executor = parse_executor is None
+        self.parse_executor = parse_executor or create_parse_executor()
+        self.concurrency = concurrency
+        self.claim_size = claim_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.poll_seconds = poll_seconds
+        self.worker_id = new_worker_id()
+        self.stats: Counter = Counter()
+        # Claims and writes run here instead of on the event loop, one at a time
+        self.db_thread = DatabaseThread(name="scrape-jobs-db")
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _claim_product(self, product_id: int) -> Optional[ProductSnapshot]:
+        rows = claim_products(self.session_factory, self.worker_id, 1, datetime.now(timezone.utc), self.lease,
+                              product_ids=[product_id])
+        return ProductSnapshot.from_row(rows[0]) if rows else None
+
+    def _put_back(self, job: ScrapeJob) -> None:
+        """Retries a job whose product is claimed by someone else later, if the product still exists."""
+        with self.session_factory() as db:
+            if db.scalar(select(Product.id).where(Product.id == job.product_id)) is None:
+                # The product was deleted, taking the job with it
+                return
+            status = fail_job(db, job, self.worker_id, "Product is being checked by another worker",
+                              datetime.now(timezone.utc), count_attempt=False)
+            db.commit()
+        self.stats[status] += 1
+
+    async def _process(self, job: ScrapeJob, semaphore: asyncio.Semaphore) -> None:
+        # Database work runs on the database thread, so it doesn't hold up the other jobs' fetches
+        product = await self.db_thread.run(self._claim_product, job.product_id)
+        if product is None:
+            await self.db_thread.run(self._put_back, job)
+            return
+        async with semaphore:
+            outcome = await scrape_product(product, self.client, self.parse_executor)
+        await self.db_thread.run(self._record, job, product, outcome)
+
+    def _record(self, job: ScrapeJob, product: ProductSnapshot, outcome: ScrapeOutcome) -> None:
+        """Writes the scrape's result together with the job's new status."""
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            if outcome.deferred:
+                status = fail_job(db, job, self.worker_id, f"{product.source} circuit open", now, count_attempt=False)
+                release_products(db, [product.id], self.worker_id)
+            elif outcome.scraped_data is None:
+                status = fail_job(db, job, self.worker_id, "Failed to scrape", now)
+                release_products(db, [product.id], self.worker_id)
+            else:
+                # Writing the result releases the product
+                self.stats.update(write_batch(db, [outcome], self.worker_id))
+                complete_job(db, job.id, self.worker_id, now)
+                status = "done"
+            db.commit()
+            self.stats[status] += 1
+        except Exception as e:
+            db.rollback()
+            self.stats["errors"] += 1
+            logger.error(f"Failed to record scrape job {job.id}, it is retried once its lease expires: {e}")
+        finally:
+            db.close()
+
+    async def run_once(self) -> int:
+        """Claims and processes one round of jobs. Returns how many jobs were claimed."""
+        jobs = await self.db_thread.run(claim_jobs, self.session_factory, self.worker_id, self.claim_size,
+                                        datetime.now(timezone.utc), self.lease)
+        if jobs:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            renewal = asyncio.ensure_future(keep_leases(self.session_factory, self.worker_id, self.lease,
+                                                        self.db_thread, _renew_claims))
+            try:
+                await asyncio.gather(*(self._process(job, semaphore) for job in jobs))
+            finally:
+                renewal.cancel()
+            self.stats["claimed"] += len(jobs)
+        return len(jobs)
+
+    async def run(self, drain: bool = False) -> Dict[str, int]:
+        """
+        Processes jobs until stop() is called, polling every poll_seconds when the queue is empty.
+        With drain, returns as soon as no job is available instead.
+        """
+        logger.info(f"Starting scrape job worker {self.worker_id}...")
+        try:
+            while not self._stop.is_set():
+                if await self.run_once():
+                    continue
+                if drain:
+                    break
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            logger.info(f"Scrape job worker stopped: {dict(self.stats)}")
+            self.db_thread.shutdown()
+            if self._owns_client:
+                await self.client.aclose()
+            if self._owns_executor and self.parse_executor is not None:
+                self.parse_executor.shutdown()
+        return dict(self.stats)
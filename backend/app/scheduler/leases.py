@@ -0,0 +1,136 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Optional, List, Sequence
+
+from sqlalchemy import and_, or_, select, true, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import Product
+from app.scheduler.db_thread import DatabaseThread
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# The columns a worker needs to scrape a product (see ProductSnapshot)
+SNAPSHOT_COLUMNS = (Product.id, Product.name, Product.url, Product.source,
+                    Product.etag, Product.last_modified, Product.content_digest)
+
+
+def new_worker_id() -> str:
+    """Identifies one scheduler process in lease_owner, e.g. "web-1:4242:9f3c1a"."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite hands timezone-aware columns back naive
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def claim_products(session_factory: sessionmaker, worker_id: str, limit: int, now: datetime,
+                   lease: timedelta, due_before: Optional[datetime] = None,
+                   after_id: Optional[int] = None, by_due: bool = False, reclaim: bool = False,
+                   product_ids: Optional[Sequence[int]] = None) -> List[tuple]:
+    """
+    Claims up to `limit` products for worker_id until now + lease and returns their rows
+    (snapshot columns plus due_at), in claim order.
+
+    A product can be claimed when nobody holds an unexpired lease on it and, with due_before,
+    when it is due. With reclaim, products worker_id still holds are claimed again (a resumed run
+    taking back what it held when it died). Products are taken in id order after after_id, or most
+    overdue first with by_due, optionally only among product_ids.
+    On Postgres the candidate rows are locked FOR UPDATE SKIP LOCKED, so concurrent workers pass
+    over each other's rows instead of waiting; SQLite serializes the UPDATE itself. Either way a
+    product is only ever claimed by one worker at a time.
+    """
+    products = Product.__table__
+    due_at = products.c.next_check_at
+    claimable = [products.c.lease_expires_at.is_(None), products.c.lease_expires_at <= now]
+    if reclaim:
+        claimable.append(products.c.lease_owner == worker_id)
+    conditions = [or_(*claimable)]
+    if due_before is not None:
+        conditions.append(or_(due_at.is_(None), due_at <= due_before))
+    if after_id is not None:
+        conditions.append(products.c.id > after_id)
+    if product_ids is not None:
+        conditions.append(products.c.id.in_(product_ids))
+    order = (due_at.asc().nulls_first(), products.c.last_checked) if by_due else (products.c.id,)
+
+    candidates = (
+        select(products.c.id)
+        .where(and_(true(), *conditions))
+        .order_by(*order)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    columns = [products.c[column.key] for column in SNAPSHOT_COLUMNS]
+    with session_factory() as db:
+        rows = db.execute(
+            update(products)
+            .where(products.c.id.in_(candidates.scalar_subquery()), *conditions)
+            .values(lease_owner=worker_id, lease_expires_at=now + lease)
+            .returning(*columns, products.c.next_check_at, products.c.last_checked)
+        ).all()
+        db.commit()
+
+    # RETURNING doesn't keep the subquery's order
+    def sort_key(row):
+        if by_due:
+            return (row.next_check_at is not None, as_utc(row.next_check_at or row.last_checked), row.last_checked)
+        return row.id
+    return sorted(rows, key=sort_key)
+
+
+def release_products(db: Session, product_ids: Sequence[int], worker_id: Optional[str] = None,
+                     next_check_at: Optional[datetime] = None) -> None:
+    """
+    Drops the claims on products (only worker_id's claims if given), optionally rescheduling them,
+    e.g. to retry a failed check later. Does not commit.
+    """
+    if not product_ids:
+        return
+    statement = update(Product).where(Product.id.in_(product_ids))
+    if worker_id is not None:
+        statement = statement.where(Product.lease_owner == worker_id)
+    values = {"lease_owner": None, "lease_expires_at": None}
+    if next_check_at is not None:
+        values["next_check_at"] = next_check_at
+    db.execute(statement.values(**values))
+
+
+def release_worker(db: Session, worker_id: str) -> None:
+    """Drops every claim worker_id still holds, e.g. products claimed by a run that stopped early. Does not commit."""
+    db.execute(update(Product).where(Product.lease_owner == worker_id).values(lease_owner=None, lease_expires_at=None))
+
+
+def renew_leases(session_factory: sessionmaker, worker_id: str, now: datetime, lease: timedelta) -> int:
+    """
+    Extends every claim worker_id still holds to now + lease. Claims that ran out and were taken by
+    another worker are no longer worker_id's and stay with their new holder. Returns how many were renewed.
+    """
+    with session_factory() as db:
+        renewed = db.execute(
+            update(Product).where(Product.lease_owner == worker_id).values(lease_expires_at=now + lease)
+        ).rowcount
+        db.commit()
+    return renewed
+
+
+async def keep_leases(session_factory: sessionmaker, worker_id: str, lease: timedelta,
+                      db_thread: DatabaseThread, renew: Callable[..., int] = renew_leases) -> None:
+    """
+    Renews worker_id's claims every third of the lease until cancelled. Products can wait in a queue
+    (behind a slow rate limit, say) for longer than the lease, and without renewal their claims
+    would run out and another worker would check them a second time. renew is called like
+    renew_leases and can renew other claims along with the products (see JobWorker).
+    """
+    while True:
+        await asyncio.sleep(lease.total_seconds() / 3)
+        try:
+            await db_thread.run(renew, session_factory, worker_id, datetime.now(timezone.utc), lease)
+        except Exception as e:
+            logger.error(f"Failed to renew the leases of {worker_id}, retrying: {e}")
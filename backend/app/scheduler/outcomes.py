@@ -0,0 +1,27 @@
+from dataclasses import dataclass
+from typing import Optional, Dict, Any
+
+
+@dataclass(frozen=True)
+class ProductSnapshot:
+    """The columns a worker needs to scrape a product, so no ORM objects are held while scraping."""
+    id: int
+    name: str
+    url: str
+    source: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_digest: Optional[str]
+
+    @classmethod
+    def from_row(cls, row) -> "ProductSnapshot":
+        return cls(row.id, row.name, row.url, row.source, row.etag, row.last_modified, row.content_digest)
+
+
+@dataclass
+class ScrapeOutcome:
+    """A worker's result for one product, handed to the batch writer."""
+    product: ProductSnapshot
+    scraped_data: Optional[Dict[str, Any]]
+    # The product's source circuit was open, so it was left for the next run
+    deferred: bool = False
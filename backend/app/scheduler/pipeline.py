@@ -0,0 +1,363 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Awaitable, List, Set, Tuple
+
+import httpx
+
+from app.config import (
+    SCHEDULER_WORKERS,
+    SCHEDULER_PARSE_STAGE_WORKERS,
+    SCHEDULER_STAGE_QUEUE_SIZE,
+    SCHEDULER_REPORT_SECONDS,
+    SCRAPER_MAX_BODY_BYTES,
+    SCRAPER_STREAMING,
+)
+from app.scheduler.outcomes import ProductSnapshot, ScrapeOutcome
+from app.scraper.circuit_breaker import CircuitOpenError
+from app.scraper.client import ScraperClient
+from app.scraper.parse_executor import ParseExecutor
+from app.scraper.product_scraper import (
+    PAGE, DONE, PARSERS, FetchedPage, fetch_attempt, check_parsed_page, retry_delay, scrape_key,
+    _parse_fetched_page, _scrape_flight,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Job:
+    """A product on its way through the pipeline."""
+    product: ProductSnapshot
+    attempt: int = 0
+    page: Optional[FetchedPage] = None
+    parsed: Optional[Tuple[bool, Optional[Dict[str, Any]]]] = None
+    # When the product entered the pipeline (time.monotonic)
+    started: float = 0.0
+    # The product's entry in _scrape_flight, resolved with its outcome (see ScrapePipeline._intake)
+    flight: Optional[asyncio.Future] = None
+
+
+class LatencyHistogram:
+    """
+    Per-product latencies in log-spaced buckets 5% wide, so percentiles stay cheap and memory stays
+    bounded however many products go through (the rolling scheduler never stops).
+    """
+    GROWTH = 1.05
+
+    def __init__(self):
+        self._buckets: Counter = Counter()
+        self.count = 0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        # Bucket i holds latencies up to GROWTH ** i milliseconds
+        self._buckets[max(0, math.ceil(math.log(max(seconds * 1000, 1), self.GROWTH)))] += 1
+        self.count += 1
+        self.max_seconds = max(self.max_seconds, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the fraction-th latency, in seconds (0 when nothing was recorded)."""
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self.GROWTH ** bucket / 1000, self.max_seconds)
+        return self.max_seconds
+
+    def summary(self) -> Dict[str, float]:
+        return {"p50": round(self.percentile(0.5), 3), "p99": round(self.percentile(0.99), 3),
+                "max": round(self.max_seconds, 3)}
+
+
+class StageStats:
+    """Throughput, utilization and input queue depth of one pipeline stage."""
+
+    def __init__(self, name: str, width: int, queue: asyncio.Queue):
+        self.name = name
+        self.width = width
+        self.queue = queue
+        self.processed = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def took(self, started: float) -> None:
+        self.processed += 1
+        self.busy_seconds += time.monotonic() - started
+
+    def sample_queue(self) -> None:
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+
+    def snapshot(self, elapsed: float) -> Dict[str, Any]:
+        elapsed = max(elapsed, 1e-9)
+        return {
+            "width": self.width,
+            "processed": self.processed,
+            "per_second": round(self.processed / elapsed, 2),
+            # Share of the stage's tasks' time spent working; the stage closest to 1 is the bottleneck
+            "utilization": round(self.busy_seconds / (elapsed * self.width), 3),
+            "queue_depth": self.queue.qsize(),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+class ScrapePipeline:
+    """
+    Scrapes products in stages connected by bounded queues, so network, CPU and database work
+    overlap and each can be sized on its own:
+
+    - fetch: fetch_workers tasks, each making one download attempt at a time (see fetch_attempt),
+    - parse: parse_workers tasks handing pages to the parse executor (or parsing inline),
+    - validate: one task checking the parsed data and scheduling retries (see check_parsed_page),
+    - write: whoever drains the results queue, normally a BatchWriter (see record_write).
+
+    In streaming mode (only without a parse executor, like scrape_product_data) pages are parsed
+    while they download and the parse stage just checks the tree; otherwise they are downloaded
+    whole. Failed attempts go back to the fetch queue after their backoff, without holding a
+    fetch task while they wait.
+
+    Products share scrape_product_data's single-flight key and result cache: one whose URL is
+    being scraped elsewhere in the process (a route, another pipeline) waits for that scrape, or
+    reuses its cached result, and route callers likewise wait for or reuse the pipeline's. A full queue
+    makes the stage before it wait, so memory stays bounded. Stage stats are returned by stats()
+    and logged every report_seconds (0 = never).
+    """
+
+    def __init__(self, client: ScraperClient,
+                 parse_executor: Optional[ParseExecutor] = None,
+                 fetch_workers: int = SCHEDULER_WORKERS,
+                 parse_workers: int = SCHEDULER_PARSE_STAGE_WORKERS,
+                 queue_size: int = SCHEDULER_STAGE_QUEUE_SIZE,
+                 retries: int = 3,
+                 delay: float = 2.0,
+                 max_body_bytes: int = SCRAPER_MAX_BODY_BYTES,
+                 report_seconds: float = SCHEDULER_REPORT_SECONDS,
+                 streaming: bool = SCRAPER_STREAMING):
+        self.client = client
+        self.parse_executor = parse_executor
+        self.fetch_workers = fetch_workers
+        # Without an executor parsing blocks the event loop, so more than one parse task doesn't help
+        self.parse_workers = parse_workers or (parse_executor.max_workers if parse_executor is not None else 1)
+        self.queue_size = queue_size
+        self.retries = retries
+        self.delay = delay
+        self.max_body_bytes = max_body_bytes
+        self.report_seconds = report_seconds
+        # Incremental parsing happens on the event loop, so not with an executor
+        self.streaming = streaming and parse_executor is None
+
+        self.fetch_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or fetch_workers * 2)
+        self.parse_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or self.parse_workers * 2)
+        self.validate_queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or 2)
+        self.stages = {
+            "fetch": StageStats("fetch", fetch_workers, self.fetch_queue),
+            "parse": StageStats("parse", self.parse_workers, self.parse_queue),
+            "validate": StageStats("validate", 1, self.validate_queue),
+        }
+        self.retried = 0
+        # Products that reused another scrape of their URL (in flight or cached) instead of fetching
+        self.coalesced = 0
+        # From entering the pipeline to the outcome being handed to the writer, retries included
+        self.latency = LatencyHistogram()
+        self.started = time.monotonic()
+        self._results: Optional[asyncio.Queue] = None
+        self._in_flight = 0
+        self._intake_done = False
+        self._done = asyncio.Event()
+        self._retry_tasks: Set[asyncio.Task] = set()
+        self._follow_tasks: Set[asyncio.Task] = set()
+        self._flights: Set[asyncio.Future] = set()
+
+    def stats(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        stats = {name: stage.snapshot(elapsed) for name, stage in self.stages.items()}
+        stats["in_flight"] = self._in_flight
+        stats["retried"] = self.retried
+        stats["coalesced"] = self.coalesced
+        stats["latency_seconds"] = self.latency.summary()
+        return stats
+
+    def record_write(self, started: float) -> None:
+        """Counts one outcome handled by the write stage, which started at `started` (time.monotonic)."""
+        self.stages["write"].took(started)
+        self.stages["write"].sample_queue()
+
+    async def _emit(self, outcome: ScrapeOutcome, job: Optional[_Job] = None,
+                    error: Optional[CircuitOpenError] = None) -> None:
+        if job is not None:
+            self.latency.record(time.monotonic() - job.started)
+            if job.flight is not None:
+                # Callers waiting on the same scrape get the outcome too
+                self._flights.discard(job.flight)
+                if error is not None:
+                    job.flight.set_exception(error)
+                else:
+                    job.flight.set_result(dict(outcome.scraped_data) if outcome.scraped_data is not None else None)
+        await self._results.put(outcome)
+        self._in_flight -= 1
+        if self._intake_done and not self._in_flight:
+            self._done.set()
+
+    async def _retry(self, job: _Job, wait: Optional[float]) -> None:
+        """Sends the product back to the fetch stage after its backoff, or gives up after `retries` attempts."""
+        if job.attempt + 1 >= self.retries:
+            logger.error(f"Failed to scrape {job.product.url} after {self.retries} attempts.")
+            await self._emit(ScrapeOutcome(job.product, None), job)
+            return
+        self.retried += 1
+        job.attempt += 1
+        job.page = job.parsed = None
+        task = asyncio.ensure_future(self._requeue(job, wait if wait is not None else retry_delay(self.delay, job.attempt - 1)))
+        self._retry_tasks.add(task)
+        task.add_done_callback(self._retry_tasks.discard)
+
+    async def _requeue(self, job: _Job, wait: float) -> None:
+        await asyncio.sleep(wait)
+        await self.fetch_queue.put(job)
+
+    async def _intake(self, products: asyncio.Queue) -> None:
+        while (product := await products.get()) is not None:
+            if product.source not in PARSERS:
+                logger.error(f"No parser found for source: {product.source}")
+                self._in_flight += 1
+                await self._emit(ScrapeOutcome(product, None))
+                continue
+            self._in_flight += 1
+            job = _Job(product, started=time.monotonic())
+            key = scrape_key(product.url, product.source, product.etag, product.last_modified, product.content_digest)
+            cached = _scrape_flight.cached(key)
+            if cached is not None:
+                self.coalesced += 1
+                await self._emit(ScrapeOutcome(product, cached), job)
+                continue
+            following = _scrape_flight.follow(key)
+            if following is not None:
+                self.coalesced += 1
+                task = asyncio.ensure_future(self._follow(job, following))
+                self._follow_tasks.add(task)
+                task.add_done_callback(self._follow_tasks.discard)
+                continue
+            job.flight = _scrape_flight.lead(key)
+            self._flights.add(job.flight)
+            await self.fetch_queue.put(job)
+        self._intake_done = True
+        if not self._in_flight:
+            self._done.set()
+
+    async def _follow(self, job: _Job, following: Awaitable[Optional[Dict[str, Any]]]) -> None:
+        """Emits the outcome of the scrape of the product's URL that was already in flight."""
+        try:
+            outcome = ScrapeOutcome(job.product, await following)
+        except CircuitOpenError:
+            outcome = ScrapeOutcome(job.product, None, deferred=True)
+        except Exception as e:
+            logger.error(f"Unexpected error scraping product {job.product.name} (ID: {job.product.id}): {e}")
+            outcome = ScrapeOutcome(job.product, None)
+        await self._emit(outcome, job)
+
+    async def _fetch(self) -> None:
+        stage = self.stages["fetch"]
+        while True:
+            job = await self.fetch_queue.get()
+            stage.sample_queue()
+            started = time.monotonic()
+            product = job.product
+            try:
+                self.client.circuit_breakers.for_source(product.source).check()
+                verdict, value = await fetch_attempt(self.client, product.url, product.source, job.attempt,
+                                                     product.etag, product.last_modified, product.content_digest,
+                                                     self.streaming, self.max_body_bytes, self.delay)
+            except CircuitOpenError as e:
+                stage.took(started)
+                await self._emit(ScrapeOutcome(product, None, deferred=True), job, e)
+                continue
+            except httpx.RequestError as e:
+                self.client.circuit_breakers.for_source(product.source).record_failure()
+                logger.error(f"Request error on attempt {job.attempt + 1} for {product.url}: {e}")
+                verdict, value = None, None
+            except Exception as e:
+                logger.error(f"Unexpected error scraping product {product.name} (ID: {product.id}): {e}")
+                stage.took(started)
+                await self._emit(ScrapeOutcome(product, None), job)
+                continue
+            stage.took(started)
+
+            if verdict == PAGE:
+                job.page = value
+                await self.parse_queue.put(job)
+            elif verdict == DONE:
+                await self._emit(ScrapeOutcome(product, value), job)
+            else:
+                await self._retry(job, value)
+
+    async def _parse(self) -> None:
+        stage = self.stages["parse"]
+        while True:
+            job = await self.parse_queue.get()
+            stage.sample_queue()
+            started = time.monotonic()
+            try:
+                job.parsed = await _parse_fetched_page(job.product.source, job.page, self.parse_executor)
+            except Exception as e:
+                logger.error(f"Failed to parse the page of product {job.product.id}: {e}")
+                job.parsed = (False, None)
+            stage.took(started)
+            await self.validate_queue.put(job)
+
+    async def _validate(self) -> None:
+        stage = self.stages["validate"]
+        while True:
+            job = await self.validate_queue.get()
+            stage.sample_queue()
+            started = time.monotonic()
+            product = job.product
+            is_captcha, scraped_data = job.parsed
+            verdict, value = check_parsed_page(self.client, product.url, product.source, job.attempt, job.page,
+                                               is_captcha, scraped_data, self.delay)
+            stage.took(started)
+            if verdict == DONE:
+                await self._emit(ScrapeOutcome(product, value), job)
+            else:
+                await self._retry(job, value)
+
+    async def _report(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_seconds)
+            logger.info(f"Scrape pipeline: {self.stats()}")
+
+    async def run(self, products: asyncio.Queue, results: asyncio.Queue) -> None:
+        """
+        Scrapes the snapshots put on `products` until it yields None, putting one ScrapeOutcome per
+        product on `results`. Returns once every product's outcome is on results.
+        """
+        self._results = results
+        self.stages["write"] = StageStats("write", 1, results)
+        self.started = time.monotonic()
+        tasks: List[asyncio.Task] = [
+            *(asyncio.ensure_future(self._fetch()) for _ in range(self.fetch_workers)),
+            *(asyncio.ensure_future(self._parse()) for _ in range(self.parse_workers)),
+            asyncio.ensure_future(self._validate()),
+        ]
+        if self.report_seconds > 0:
+            tasks.append(asyncio.ensure_future(self._report()))
+        intake = asyncio.ensure_future(self._intake(products))
+        done = asyncio.ensure_future(self._done.wait())
+        try:
+            pending = {done, intake, *tasks}
+            while not done.done():
+                finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    # Stage tasks only end by raising, which would leave their products stuck
+                    task.result()
+        finally:
+            for task in (done, intake, *tasks, *self._retry_tasks, *self._follow_tasks):
+                task.cancel()
+            # Products left behind when the run is cancelled never got a result to share
+            for flight in self._flights:
+                flight.set_result(None)
+            self._flights.clear()
@@ -1,33 +1,132 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import (
+    SCHEDULER_WORKERS, SCHEDULER_COMMIT_BATCH_SIZE, SCHEDULER_READ_BATCH_SIZE,
+    SCHEDULER_PARSE_STAGE_WORKERS, SCHEDULER_STAGE_QUEUE_SIZE,
+    SCHEDULER_LEASE_SECONDS, SCHEDULER_RETRY_MINUTES,
+)
 from app.database import get_session_local
-from app.models import Product, PriceHistory
+from app.models import Product
 from app.scraper.product_scraper import scrape_product_data
-from datetime import datetime, timezone
+from app.scraper.client import ScraperClient
+from app.scraper.circuit_breaker import CircuitOpenError
+from app.scraper.parse_executor import ParseExecutor, create_parse_executor
+from app.scheduler.bulk import (
+    price_update_row, validator_update_row, update_prices, update_validators,
+    record_price_histories, extend_price_histories,
+)
+from app.scheduler.alerts import alert_row, evaluate_price_alerts
+from app.scheduler.cadence import schedule_next_checks, prioritize_products
+from app.scheduler.leases import claim_products, release_products, release_worker, new_worker_id, keep_leases
+from app.scheduler.queue import enqueue_jobs, PRIORITY_RETRY
+from app.scheduler.runs import RunLedger, start_run, resume_run, finish_run, count_carried_over, keep_alive
+from app.scheduler.budget import RunBudget, BudgetMeter
+from app.scheduler.outcomes import ProductSnapshot, ScrapeOutcome
+from app.scheduler.pipeline import ScrapePipeline
+from app.scheduler.db_thread import DatabaseThread
+from app.models.scheduler_runs import SchedulerRunStatus
+from collections import Counter
+from typing import Optional, Dict, Any, List, Iterator, Set
+from datetime import datetime, timedelta, timezone
 import logging # For debugging purposes
-from app.models.products import EbayFailStatus 
+from app.models.products import EbayFailStatus
 from app.routes.notification_utils import notify_users_and_delete_product
 import asyncio
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 EBAY_FAIL_STATUSES = [EbayFailStatus.SOLD_OUT.value, EbayFailStatus.LISTING_ENDED.value]
 
-async def process_product(db: Session, product: Product):
+def iter_product_pages(session_factory: sessionmaker, worker_id: str,
+                       page_size: int = SCHEDULER_READ_BATCH_SIZE,
+                       due_before: Optional[datetime] = None,
+                       lease: timedelta = timedelta(seconds=SCHEDULER_LEASE_SECONDS),
+                       after_id: int = 0, reclaim: bool = False) -> Iterator[List[ProductSnapshot]]:
     """
-    Handles scraping and database preparation for a single product.
+    Claims every product in id order after after_id and yields them page_size rows at a time. With
+    due_before, only products whose next_check_at is before it (or not set) are yielded.
+
+    Each page is claimed for worker_id (see claim_products) in its own short transaction, so memory
+    stays flat, no read transaction stays open while the writer commits, and several scheduler
+    processes can run side by side without checking the same product twice. Each step of the
+    iterator is blocking database work, so async callers advance it in a worker thread.
+    """
+    last_id = after_id
+    while True:
+        rows = claim_products(session_factory, worker_id, page_size, datetime.now(timezone.utc), lease,
+                              due_before=due_before, after_id=last_id, reclaim=reclaim)
+        yield [ProductSnapshot.from_row(row) for row in rows]
+        if len(rows) < page_size:
+            return
+        last_id = rows[-1].id
+
+def iter_prioritized_pages(session_factory: sessionmaker, worker_id: str,
+                           page_size: int = SCHEDULER_READ_BATCH_SIZE,
+                           due_before: Optional[datetime] = None,
+                           lease: timedelta = timedelta(seconds=SCHEDULER_LEASE_SECONDS),
+                           reclaim: bool = False) -> Iterator[List[ProductSnapshot]]:
+    """
+    Like iter_product_pages, but yields the products most urgent first (see prioritize_products),
+    for runs whose budget may not cover every due product. Products ranked when the run started
+    are claimed page by page; those another worker took in the meantime are passed over.
+    """
+    with session_factory() as db:
+        ranked = prioritize_products(db, datetime.now(timezone.utc), due_before)
+    for start in range(0, len(ranked), page_size):
+        page = ranked[start:start + page_size]
+        rows = claim_products(session_factory, worker_id, len(page), datetime.now(timezone.utc), lease,
+                              due_before=due_before, reclaim=reclaim, product_ids=page)
+        claimed = {row.id: row for row in rows}
+        yield [ProductSnapshot.from_row(claimed[product_id]) for product_id in page if product_id in claimed]
+
+async def scrape_product(product: ProductSnapshot, client: ScraperClient,
+                         parse_executor: Optional[ParseExecutor] = None) -> ScrapeOutcome:
+    """
+    Scrapes a single product. Never raises, so one bad product can't stop a worker.
     """
-    scraped_data = await scrape_product_data(product.url, product.source)
+    try:
+        scraped_data = await scrape_product_data(
+            product.url,
+            product.source,
+            client=client,
+            etag=product.etag,
+            last_modified=product.last_modified,
+            content_digest=product.content_digest,
+            parse_executor=parse_executor,
+        )
+    except CircuitOpenError:
+        return ScrapeOutcome(product, None, deferred=True)
+    except Exception as e:
+        logger.error(f"Unexpected error scraping product {product.name} (ID: {product.id}): {e}")
+        scraped_data = None
 
     if not scraped_data:
         logger.warning(f"Failed to scrape data for product: {product.name} (ID: {product.id})")
-        return
+    return ScrapeOutcome(product, scraped_data)
+
+def apply_scrape_result(db: Session, product: Product, scraped_data: Dict[str, Any]) -> str:
+    """
+    Applies a successful scrape to the product in the given session, one product at a time.
+    The scheduler writes in bulk with write_batch and only uses this for removed listings.
+    Returns what happened: "unchanged", "removed" or "updated".
+    """
+    # The page hasn't changed since the last check, so there is no new price to record
+    if scraped_data.get('not_modified'):
+        product.etag = scraped_data['etag']
+        product.last_modified = scraped_data['last_modified']
+        product.content_digest = scraped_data['content_digest']
+        product.last_checked = datetime.now(timezone.utc)
+        extend_price_histories(db, [product.id], product.last_checked)
+        logger.info(f"Product {product.name} (ID: {product.id}) is unchanged since the last check.")
+        return "unchanged"
 
     # Handle unavailable eBay products
     if product.source == "eBay" and scraped_data['name'] in EBAY_FAIL_STATUSES:
         reason = "ended" if scraped_data['name'] == EbayFailStatus.LISTING_ENDED.value else "sold out"
         notify_users_and_delete_product(db, product, reason)
-        return
+        return "removed"
 
     # --- Update Product Details in the Session ---
     product.name = scraped_data['name']
@@ -37,41 +136,367 @@ async def process_product(db: Session, product: Product):
     if product.highest_price is None or scraped_data['current_price'] > product.highest_price:
         product.highest_price = scraped_data['current_price']
     product.last_checked = datetime.now(timezone.utc)
+    product.etag = scraped_data.get('etag')
+    product.last_modified = scraped_data.get('last_modified')
+    product.content_digest = scraped_data.get('content_digest')
 
-    # Create a new PriceHistory record
-    price_history = PriceHistory(product_id=product.id, price=product.current_price)
-    db.add(price_history)
-    logger.info(f"Successfully updated price for {product.name} to ${scraped_data['current_price']}.")
+    # Record the price (a new row only if it changed, depending on PRICE_HISTORY_MODE)
+    record_price_histories(db, [{"product_id": product.id, "price": product.current_price, "timestamp": product.last_checked}])
+    logger.info(f"Successfully updated price for {product.name} to ${scraped_data['current_price']} "
+                f"(via {scraped_data.get('extraction_path', 'selectors')}).")
+    return "updated"
 
-async def update_product_prices_job():
+class BatchWriter:
     """
-    Asynchronously scrapes all products and updates their prices in the database.
+    Collects scrape outcomes and writes them in batches, each in its own session and transaction.
+    A batch that fails to commit is rolled back on its own; earlier batches stay committed. add()
+    only collects; flush() does the database work and blocks, so async callers run it on their
+    DatabaseThread once the batch is full and keep fetching while it commits.
+
+    Written products have their claim released by the write itself, and only while this worker still
+    holds it (see write_batch). Every other product is retried one way only:
+    - failed scrapes are queued as scrape jobs in the retry lane, which retries them with backoff until
+      they succeed or are dead-lettered, and keep their regular cadence (see schedule_next_checks);
+    - deferred products and the products of a batch that failed to commit (failed scrapes included,
+      as their jobs were rolled back with it) are released with next_check_at pushed back by
+      retry_after, so the schedulers retry them later rather than straight away.
+
+    With a ledger, every commit also moves the run's cursor and counts in scheduler_runs, in the same
+    transaction as the batch. A batch that fails to commit doesn't move the cursor.
+    """
+
+    def __init__(self, session_factory: sessionmaker, batch_size: int, stats: Counter,
+                 worker_id: Optional[str] = None,
+                 retry_after: timedelta = timedelta(minutes=SCHEDULER_RETRY_MINUTES),
+                 ledger: Optional[RunLedger] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.stats = stats
+        self.worker_id = worker_id
+        self.retry_after = retry_after
+        self.ledger = ledger
+        self._batch: List[ScrapeOutcome] = []
+        self._retry: List[int] = []
+        self._failed: List[int] = []
+        # Products released for a later retry, once the release committed
+        self.released: Set[int] = set()
+
+    def add(self, outcome: ScrapeOutcome) -> None:
+        if outcome.deferred:
+            self.stats["deferred"] += 1
+            self._retry.append(outcome.product.id)
+        elif outcome.scraped_data is None:
+            self.stats["failed"] += 1
+            self._failed.append(outcome.product.id)
+        else:
+            self._batch.append(outcome)
+
+    @property
+    def full(self) -> bool:
+        return len(self._batch) + len(self._retry) + len(self._failed) >= self.batch_size
+
+    def _release_for_retry(self, db: Session, product_ids: List[int]) -> None:
+        release_products(db, product_ids, self.worker_id, datetime.now(timezone.utc) + self.retry_after)
+
+    def _queue_retry_jobs(self, db: Session, product_ids: List[int]) -> None:
+        # Only products this worker still holds: another worker has taken over the others' checks.
+        # The rows stay locked until the batch commits.
+        if self.worker_id is not None and product_ids:
+            product_ids = list(db.scalars(
+                select(Product.id)
+                .where(Product.id.in_(product_ids), Product.lease_owner == self.worker_id)
+                .with_for_update()
+            ))
+        now = datetime.now(timezone.utc)
+        schedule_next_checks(db, product_ids, now)
+        release_products(db, product_ids, self.worker_id)
+        enqueue_jobs(db, product_ids, now, PRIORITY_RETRY)
+
+    def flush(self) -> None:
+        if not self._batch and not self._retry and not self._failed:
+            return
+        batch, self._batch = self._batch, []
+        retry, self._retry = self._retry, []
+        failed, self._failed = self._failed, []
+        product_ids = retry + failed + [outcome.product.id for outcome in batch]
+
+        db = self.session_factory()
+        try:
+            results = write_batch(db, batch, self.worker_id) if batch else Counter()
+            self._release_for_retry(db, retry)
+            self._queue_retry_jobs(db, failed)
+            if self.ledger is not None:
+                self.ledger.save(db, self.stats + results, cursor=self.ledger.cursor_after(product_ids))
+            db.commit()
+            self.released.update(retry)
+            # Only now: if the commit failed, a resumed run must check these products again
+            if self.ledger is not None:
+                self.ledger.handled(product_ids)
+            self.stats.update(results)
+            if batch:
+                self.stats["batches_committed"] += 1
+        except Exception as e:
+            db.rollback()
+            self.stats["batches_failed"] += 1
+            self.stats["lost"] += len(batch)
+            logger.error(f"Failed to write a batch of {len(batch)} products, rolled back: {e}")
+            try:
+                # The cursor stays where it was (see RunLedger): the counts are saved, not the products
+                self._release_for_retry(db, product_ids)
+                if self.ledger is not None:
+                    self.ledger.save(db, self.stats)
+                db.commit()
+                self.released.update(product_ids)
+            except Exception as release_error:
+                db.rollback()
+                logger.error(f"Failed to release the batch's claims, they expire on their own: {release_error}")
+        finally:
+            db.close()
+
+def write_batch(db: Session, batch: List[ScrapeOutcome], worker_id: Optional[str] = None) -> Counter:
+    """
+    Writes a batch of successful scrapes with set-based statements: one executemany UPDATE for the
+    new prices (price range computed in SQL), one for unchanged pages and one bulk INSERT (or COPY)
+    for the price history, plus one UPDATE extending the runs of prices that didn't change.
+    Threshold alerts are evaluated against the previous prices before they are overwritten, and
+    every checked product gets its next_check_at (see schedule_next_checks). Only removed eBay
+    listings go through the ORM, to notify their users.
+
+    With worker_id, only products it still holds a lease on are written; the others' leases ran out
+    and another worker may have claimed them, so their results are dropped and counted as "lost".
+    Does not commit. Returns what happened to the products.
+    """
+    results = Counter()
+    ids = [outcome.product.id for outcome in batch]
+    # Products deleted while they were being scraped are skipped. The rows stay locked until the
+    # batch commits, so a lease can't be taken over between this check and the writes.
+    existing, lost = {}, set()
+    for product_id, current_price, lease_owner in db.execute(
+            select(Product.id, Product.current_price, Product.lease_owner)
+            .where(Product.id.in_(ids)).with_for_update()):
+        existing[product_id] = current_price
+        if worker_id is not None and lease_owner != worker_id:
+            lost.add(product_id)
+
+    now = datetime.now(timezone.utc)
+    price_rows, validator_rows, history_rows, alert_rows, removed = [], [], [], [], []
+    for outcome in batch:
+        product_id, scraped_data = outcome.product.id, outcome.scraped_data
+        if product_id not in existing:
+            results["skipped"] += 1
+        elif product_id in lost:
+            logger.warning(f"Lost the lease on product {product_id} before its result was written, dropping it.")
+            results["lost"] += 1
+        elif scraped_data.get('not_modified'):
+            validator_rows.append(validator_update_row(product_id, scraped_data, now))
+            results["unchanged"] += 1
+        elif outcome.product.source == "eBay" and scraped_data['name'] in EBAY_FAIL_STATUSES:
+            removed.append(outcome)
+        else:
+            price_rows.append(price_update_row(product_id, scraped_data, now))
+            history_rows.append({"product_id": product_id, "price": scraped_data['current_price'], "timestamp": now})
+            alert_rows.append(alert_row(product_id, scraped_data['name'], existing[product_id], scraped_data['current_price']))
+            results["updated"] += 1
+
+    evaluate_price_alerts(db, alert_rows, now)
+    update_prices(db, price_rows, worker_id)
+    update_validators(db, validator_rows, worker_id)
+    record_price_histories(db, history_rows)
+    extend_price_histories(db, [row["b_id"] for row in validator_rows], now)
+    schedule_next_checks(db, [row["b_id"] for row in price_rows + validator_rows], now)
+
+    for outcome in removed:
+        product = db.get(Product, outcome.product.id)
+        results[apply_scrape_result(db, product, outcome.scraped_data)] += 1
+
+    logger.info(f"Wrote batch of {len(batch)} products: {dict(results)}")
+    return results
+
+async def _produce(session_factory: sessionmaker, queue: asyncio.Queue, page_size: int, lease: timedelta,
+                   ledger: RunLedger, db_thread: DatabaseThread, reclaim: bool = False,
+                   meter: Optional[BudgetMeter] = None) -> None:
+    try:
+        if meter is None:
+            pages = iter_product_pages(session_factory, ledger.worker_id, page_size, ledger.due_before,
+                                       lease, after_id=ledger.cursor, reclaim=reclaim)
+        else:
+            pages = iter_prioritized_pages(session_factory, ledger.worker_id, page_size, ledger.due_before,
+                                           lease, reclaim=reclaim)
+        # Pages are claimed on the database thread, so the event loop keeps fetching meanwhile
+        while (page := await db_thread.run(next, pages, None)) is not None:
+            for product in page:
+                if meter is not None:
+                    ledger.stop_reason = meter.exhausted()
+                    if ledger.stop_reason:
+                        logger.warning(f"Run budget nearly used up ({ledger.stop_reason}: {meter.usage()}), "
+                                       f"not dispatching more products.")
+                        return
+                    meter.dispatched += 1
+                ledger.dispatched(product.id)
+                await queue.put(product)
+    finally:
+        await queue.put(None)
+
+async def _write(results: asyncio.Queue, writer: BatchWriter, stats: Counter, pipeline: ScrapePipeline,
+                 db_thread: DatabaseThread) -> None:
+    while (outcome := await results.get()) is not None:
+        started = time.monotonic()
+        stats["processed"] += 1
+        writer.add(outcome)
+        if writer.full:
+            await db_thread.run(writer.flush)
+        pipeline.record_write(started)
+    await db_thread.run(writer.flush)
+
+async def update_product_prices_job(session_factory: Optional[sessionmaker] = None,
+                                    client: Optional[ScraperClient] = None,
+                                    parse_executor: Optional[ParseExecutor] = None,
+                                    workers: int = SCHEDULER_WORKERS,
+                                    parse_workers: int = SCHEDULER_PARSE_STAGE_WORKERS,
+                                    queue_size: int = SCHEDULER_STAGE_QUEUE_SIZE,
+                                    batch_size: int = SCHEDULER_COMMIT_BATCH_SIZE,
+                                    read_batch_size: int = SCHEDULER_READ_BATCH_SIZE,
+                                    lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+                                    due_only: bool = True,
+                                    resume: bool = False,
+                                    budget: Optional[RunBudget] = None) -> Dict[str, int]:
+    """
+    Asynchronously scrapes the products that are due (all products if not due_only) and updates
+    their prices in the database.
+
+    Each run is recorded in scheduler_runs with its cursor and counts, checkpointed with every
+    committed batch, and a heartbeat while it is alive. With resume, the latest run that didn't
+    complete is continued from its cursor (with its original due_before) instead of starting a new
+    one, so a crash only costs the batches that weren't committed. A run that is still alive is
+    never taken over (see resume_run).
+
+    With a budget (RunBudget.from_config() by default) that sets any limit, the most urgent due
+    products are checked first, dispatching stops when the budget is nearly used up and products
+    still in flight are abandoned shortly before the deadline, so the run always gets to commit.
+    Unchecked products stay due for the next run and are counted as carried_over, as are products
+    released for a later retry (deferred, or in a batch that failed to commit).
+
+    Products are claimed page by page (see claim_products) under a lease of lease_seconds that is
+    renewed while the run holds them (see keep_leases), so several processes can run the job
+    against the same database, and fed to a ScrapePipeline: `workers` fetch tasks, `parse_workers`
+    parse tasks and a validate stage connected by queues of `queue_size`, whose stage stats are
+    logged as it runs. Their results go to a single writer that commits every `batch_size`
+    products, so memory stays flat however large the catalog is, progress is durable as the run
+    goes, and a failed commit only loses its own batch. Returns the run's counters.
     """
     logger.info("Starting async scheduled job to update product prices...")
-    
-    # We need a new session for this async job context
-    db = get_session_local()()
-    
+
+    session_factory = session_factory or get_session_local()
+    # One pooled client for the whole run so connections are reused across products
+    owns_client = client is None
+    client = client or ScraperClient()
+    # Optional process/thread pool so parsing doesn't block downloads on the event loop
+    owns_executor = parse_executor is None
+    parse_executor = parse_executor or create_parse_executor()
+
+    stats: Counter = Counter()
+    lease = timedelta(seconds=lease_seconds)
+    pipeline = ScrapePipeline(client, parse_executor, workers, parse_workers, queue_size)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or workers * 2)
+    results: asyncio.Queue = asyncio.Queue(maxsize=queue_size or workers * 2)
+    budget = budget if budget is not None else RunBudget.from_config()
+    meter = BudgetMeter(budget, client) if budget.limited else None
+    started_at = datetime.now(timezone.utc)
+    # Budgeted runs go by priority instead of id, so their ledger keeps no cursor
+    ordered = meter is None
+    ledger = resume_run(session_factory, ordered) if resume else None
+    resumed = ledger is not None
+    if ledger is None:
+        # Products are claimed under this id, so several scheduler processes can share the catalog
+        ledger = start_run(session_factory, new_worker_id(), started_at if due_only else None, due_only, ordered)
+    stats["run_id"] = ledger.run_id
+    writer = BatchWriter(session_factory, batch_size, stats, ledger.worker_id, ledger=ledger)
+    # Stays None if the process dies, leaving the run "running" until its heartbeat goes stale
+    status = None
+    # Claims, batch writes, lease renewals and heartbeats run here instead of on the event loop
+    db_thread = DatabaseThread()
+    heartbeat_task = asyncio.ensure_future(keep_alive(session_factory, ledger, db_thread))
+
     try:
-        products_to_process = db.query(Product).all()
-        if not products_to_process:
-            logger.info("No products to update.")
-            return
+        # Outbound requests are paced by the client's per-source rate limiter, so fetch tasks queue up instead of bursting.
+        writer_task = asyncio.ensure_future(_write(results, writer, stats, pipeline, db_thread))
+        pipeline_task = asyncio.ensure_future(pipeline.run(queue, results))
+        # Claimed pages can take longer than the lease to get through the rate limiter
+        leases_task = asyncio.ensure_future(keep_leases(session_factory, ledger.worker_id, lease, db_thread))
 
-        # Create a list of concurrent tasks 
-        tasks = [process_product(db, product) for product in products_to_process]
+        async def feed() -> None:
+            # A resumed run takes back the products its previous attempt still held
+            await _produce(session_factory, queue, read_batch_size, lease, ledger, db_thread,
+                           reclaim=resumed, meter=meter)
+            await pipeline_task
 
-        # Run all scraping tasks concurrently
-        await asyncio.gather(*tasks)
+        feed_task = asyncio.ensure_future(feed())
+        try:
+            await asyncio.wait({feed_task, writer_task}, timeout=meter.seconds_left() if meter else None,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if writer_task.done():
+                # The writer died, so the pipeline would block on a full results queue: stop with its error
+                writer_task.result()
+            if feed_task.done():
+                await feed_task
+            else:
+                ledger.stop_reason = "deadline"
+                logger.warning(f"Run deadline reached, abandoning the products still in flight: {meter.usage()}")
+        finally:
+            for task in (feed_task, pipeline_task, leases_task):
+                task.cancel()
+            if not writer_task.done():
+                await results.put(None)
+            await writer_task
 
-        # Commit all the changes made in the session at once
-        db.commit()
-        logger.info("Database commit successful.")
+        if stats["deferred"]:
+            logger.warning(f"Deferred {stats['deferred']} of {stats['processed']} products to the next run: circuit open.")
+        if not stats["processed"]:
+            logger.info("No products to update.")
+        if ledger.stop_reason:
+            def release_and_count() -> int:
+                with session_factory() as db:
+                    # Claimed but never dispatched, or abandoned in flight
+                    release_worker(db, ledger.worker_id)
+                    db.commit()
+                    return count_carried_over(db, ledger, started_at, writer.released)
+            stats["carried_over"] = await db_thread.run(release_and_count)
+            logger.warning(f"Run stopped early ({ledger.stop_reason}), {stats['carried_over']} products carried over to the next run.")
+        elif writer.released:
+            # Deferred, or in a batch that failed to commit; everything else was checked
+            stats["carried_over"] = len(writer.released)
+        status = SchedulerRunStatus.COMPLETED.value
 
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        status = SchedulerRunStatus.INTERRUPTED.value
+        logger.warning(f"Scheduler run {ledger.run_id} was interrupted, it can be continued with --resume.")
+        raise
     except Exception as e:
+        status = SchedulerRunStatus.FAILED.value
         logger.error(f"An error occurred during the async job: {e}")
-        db.rollback()
     finally:
-        db.close()
+        heartbeat_task.cancel()
+        # Waits for a renewal or heartbeat still in flight, so the run is closed after it
+        db_thread.shutdown()
+        if status is not None:
+            try:
+                finish_run(session_factory, ledger, stats, status)
+            except Exception as e:
+                logger.error(f"Failed to close scheduler run {ledger.run_id}: {e}")
+        if pipeline.latency.count:
+            stats["latency_p50_ms"] = round(pipeline.latency.percentile(0.5) * 1000)
+            stats["latency_p99_ms"] = round(pipeline.latency.percentile(0.99) * 1000)
+        logger.info(f"Scheduler run stats: {dict(stats)}")
+        logger.info(f"Scrape pipeline stats: {pipeline.stats()}")
+        logger.info(f"Scraper pool stats: {client.pool_stats()}")
+        logger.info(f"Scraper rate limits: {client.rate_limiter.stats()}")
+        logger.info(f"Scraper circuit breakers: {client.circuit_breakers.stats()}")
+        if owns_client:
+            await client.aclose()
+        if parse_executor is not None:
+            logger.info(f"Parse executor stats: {parse_executor.stats()}")
+            if owns_executor:
+                parse_executor.shutdown()
 
-    logger.info("Async scheduled job completed.")
\ No newline at end of file
+    logger.info("Async scheduled job completed.")
+    return dict(stats)
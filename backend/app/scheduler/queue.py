@@ -0,0 +1,192 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional, List, Sequence
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import (
+    SCRAPE_JOB_MAX_ATTEMPTS,
+    SCRAPE_JOB_BACKOFF_SECONDS,
+    SCRAPE_JOB_MAX_BACKOFF_SECONDS,
+    SCHEDULER_READ_BATCH_SIZE,
+)
+from app.models import Product, ScrapeJob, ScrapeJobStatus
+from app.models.scrape_jobs import ACTIVE_STATUSES
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Priority lanes, lowest first: a user waiting on a refresh goes ahead of retries, which go ahead of
+# routine background checks (see enqueue_due_products)
+PRIORITY_USER = 0
+PRIORITY_RETRY = 50
+PRIORITY_BACKGROUND = 100
+
+_jobs = ScrapeJob.__table__
+
+
+def _active_job(db: Session, product_id: int) -> Optional[ScrapeJob]:
+    return db.scalar(select(ScrapeJob).where(ScrapeJob.product_id == product_id, ScrapeJob.status.in_(ACTIVE_STATUSES)))
+
+
+def enqueue_job(db: Session, product_id: int, now: datetime, priority: int = PRIORITY_BACKGROUND,
+                max_attempts: int = SCRAPE_JOB_MAX_ATTEMPTS) -> ScrapeJob:
+    """
+    Queues a scrape of the product. If the product already has a pending or running job, that job is
+    returned instead, moved up to `priority` and made available now if it was waiting to be retried.
+    Does not commit.
+    """
+    job = _active_job(db, product_id)
+    if job is None:
+        job = ScrapeJob(product_id=product_id, priority=priority, status=ScrapeJobStatus.PENDING.value,
+                        attempts=0, max_attempts=max_attempts, available_at=now, created_at=now)
+        try:
+            with db.begin_nested():
+                db.add(job)
+                db.flush()
+            return job
+        except IntegrityError:
+            # Another request queued the product at the same time
+            job = _active_job(db, product_id)
+            if job is None:
+                raise
+    if priority < job.priority:
+        job.priority = priority
+        if job.status == ScrapeJobStatus.PENDING.value:
+            job.available_at = now
+    return job
+
+
+def enqueue_jobs(db: Session, product_ids: Sequence[int], now: datetime, priority: int = PRIORITY_BACKGROUND,
+                 max_attempts: int = SCRAPE_JOB_MAX_ATTEMPTS) -> None:
+    """Queues scrapes for many products in one INSERT, skipping products that already have an active job."""
+    if not product_ids:
+        return
+    active = set(db.scalars(
+        select(ScrapeJob.product_id).where(ScrapeJob.product_id.in_(product_ids), ScrapeJob.status.in_(ACTIVE_STATUSES))
+    ))
+    rows = [
+        {"product_id": product_id, "priority": priority, "status": ScrapeJobStatus.PENDING.value, "attempts": 0,
+         "max_attempts": max_attempts, "available_at": now, "created_at": now}
+        for product_id in dict.fromkeys(product_ids) if product_id not in active
+    ]
+    if not rows:
+        return
+    try:
+        with db.begin_nested():
+            db.execute(insert(_jobs), rows)
+    except IntegrityError:
+        for row in rows:
+            enqueue_job(db, row["product_id"], now, priority, max_attempts)
+
+
+def enqueue_due_products(session_factory: sessionmaker, now: datetime, page_size: int = SCHEDULER_READ_BATCH_SIZE,
+                         priority: int = PRIORITY_BACKGROUND) -> int:
+    """
+    Queues a job in the background lane for every product that is due, a page at a time, so job
+    workers check them after user refreshes and retries. Products that already have an active job
+    keep it. Returns how many products were due.
+    """
+    due = or_(Product.next_check_at.is_(None), Product.next_check_at <= now)
+    after_id, count = 0, 0
+    while True:
+        with session_factory() as db:
+            product_ids = list(db.scalars(
+                select(Product.id).where(due, Product.id > after_id).order_by(Product.id).limit(page_size)
+            ))
+            if not product_ids:
+                return count
+            enqueue_jobs(db, product_ids, now, priority)
+            db.commit()
+        count += len(product_ids)
+        after_id = product_ids[-1]
+
+
+def claim_jobs(session_factory: sessionmaker, worker_id: str, limit: int, now: datetime,
+               lease: timedelta) -> List[ScrapeJob]:
+    """
+    Claims up to `limit` jobs for worker_id: pending jobs that are available, and running jobs whose
+    worker's lease ran out, highest priority lane first, then oldest. Each claim counts as an attempt.
+    Uses FOR UPDATE SKIP LOCKED like claim_products, so any number of workers can share the queue.
+    Running jobs that ran out of attempts while their worker was gone are dead-lettered first.
+    """
+    expired = and_(_jobs.c.status == ScrapeJobStatus.RUNNING.value, _jobs.c.lease_expires_at <= now)
+    claimable = or_(
+        and_(_jobs.c.status == ScrapeJobStatus.PENDING.value, _jobs.c.available_at <= now),
+        and_(expired, _jobs.c.attempts < _jobs.c.max_attempts),
+    )
+    candidates = (
+        select(_jobs.c.id)
+        .where(claimable)
+        .order_by(_jobs.c.priority, _jobs.c.available_at, _jobs.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    with session_factory() as db:
+        db.execute(
+            update(_jobs)
+            .where(expired, _jobs.c.attempts >= _jobs.c.max_attempts)
+            .values(status=ScrapeJobStatus.DEAD.value, last_error="Worker lease expired", completed_at=now,
+                    lease_owner=None, lease_expires_at=None)
+        )
+        rows = db.execute(
+            update(_jobs)
+            .where(_jobs.c.id.in_(candidates.scalar_subquery()), claimable)
+            .values(status=ScrapeJobStatus.RUNNING.value, attempts=_jobs.c.attempts + 1,
+                    lease_owner=worker_id, lease_expires_at=now + lease)
+            .returning(*_jobs.c)
+        ).all()
+        db.commit()
+    jobs = [ScrapeJob(**row._mapping) for row in rows]
+    # RETURNING doesn't keep the subquery's order
+    return sorted(jobs, key=lambda job: (job.priority, job.id))
+
+
+def renew_jobs(session_factory: sessionmaker, worker_id: str, now: datetime, lease: timedelta) -> int:
+    """
+    Extends the lease of every job worker_id is running to now + lease, so a slow scrape isn't taken
+    over by another worker. Returns how many were renewed.
+    """
+    with session_factory() as db:
+        renewed = db.execute(
+            update(_jobs)
+            .where(_jobs.c.lease_owner == worker_id, _jobs.c.status == ScrapeJobStatus.RUNNING.value)
+            .values(lease_expires_at=now + lease)
+        ).rowcount
+        db.commit()
+    return renewed
+
+
+def complete_job(db: Session, job_id: int, worker_id: str, now: datetime) -> None:
+    """Marks a claimed job done. Does not commit."""
+    db.execute(
+        update(_jobs)
+        .where(_jobs.c.id == job_id, _jobs.c.lease_owner == worker_id)
+        .values(status=ScrapeJobStatus.DONE.value, completed_at=now, lease_owner=None, lease_expires_at=None)
+    )
+
+
+def backoff(attempts: int, base: float = SCRAPE_JOB_BACKOFF_SECONDS,
+            maximum: float = SCRAPE_JOB_MAX_BACKOFF_SECONDS) -> timedelta:
+    """Delay before retrying a job that failed its attempts-th attempt: base, 2 * base, 4 * base..."""
+    return timedelta(seconds=min(maximum, base * 2 ** max(0, attempts - 1)))
+
+
+def fail_job(db: Session, job: ScrapeJob, worker_id: str, error: str, now: datetime,
+             count_attempt: bool = True) -> str:
+    """
+    Puts a claimed job back in the queue with exponential backoff, or dead-letters it once it has used
+    max_attempts. With count_attempt=False (e.g. the source was paused by its circuit breaker) the
+    attempt is given back. Returns the job's new status. Does not commit.
+    """
+    attempts = job.attempts if count_attempt else job.attempts - 1
+    values = {"attempts": attempts, "last_error": error[:500], "lease_owner": None, "lease_expires_at": None}
+    if attempts >= job.max_attempts:
+        values.update(status=ScrapeJobStatus.DEAD.value, completed_at=now)
+        logger.warning(f"Scrape job {job.id} for product {job.product_id} failed {attempts} times, giving up: {error}")
+    else:
+        values.update(status=ScrapeJobStatus.PENDING.value, available_at=now + backoff(max(attempts, 1)))
+    db.execute(update(_jobs).where(_jobs.c.id == job.id, _jobs.c.lease_owner == worker_id).values(**values))
+    return values["status"]
@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import sessionmaker
+
+from app.config import (
+    SCHEDULER_WORKERS,
+    SCHEDULER_COMMIT_BATCH_SIZE,
+    SCHEDULER_BASE_INTERVAL_MINUTES,
+    SCHEDULER_CHECK_JITTER,
+    SCHEDULER_ROLLING_RATE,
+    SCHEDULER_ROLLING_SLICE_SIZE,
+    SCHEDULER_RETRY_MINUTES,
+    SCHEDULER_FLUSH_SECONDS,
+    SCHEDULER_REPORT_SECONDS,
+    SCHEDULER_LEASE_SECONDS,
+)
+from app.database import get_session_local
+from app.models import Product
+from app.scheduler.products import BatchWriter, ProductSnapshot
+from app.scheduler.pipeline import ScrapePipeline
+from app.scheduler.db_thread import DatabaseThread
+from app.scheduler.leases import claim_products, release_products, new_worker_id, as_utc, keep_leases
+from app.scraper.client import ScraperClient
+from app.scraper.parse_executor import ParseExecutor, create_parse_executor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class RollingScheduler:
+    """
+    Checks products continuously at a steady rate instead of scraping the whole catalog in one burst.
+
+    A dispatcher claims the next slice of due products, most overdue first, under a lease (see
+    claim_products) that is renewed while they wait (see keep_leases), so any number of rolling
+    schedulers can share the catalog. A slice is never more than half a lease's worth of products
+    at the current rate, so a slow scheduler doesn't sit on products another one could check.
+    Products go to a ScrapePipeline with `workers` fetch tasks one at a time, `rate` per second
+    with jitter. When rate is 0 it is derived from the catalog size so every product can be checked
+    once per base interval. Results are written by the same BatchWriter as the one-shot job,
+    committed every batch_size products or flush_seconds, whichever comes first.
+
+    lag_seconds is how overdue the last dispatched product was: it stays near zero while the scheduler
+    keeps up and grows when the rate is too low for the catalog.
+    """
+
+    def __init__(self,
+                 session_factory: Optional[sessionmaker] = None,
+                 client: Optional[ScraperClient] = None,
+                 parse_executor: Optional[ParseExecutor] = None,
+                 workers: int = SCHEDULER_WORKERS,
+                 batch_size: int = SCHEDULER_COMMIT_BATCH_SIZE,
+                 rate: float = SCHEDULER_ROLLING_RATE,
+                 slice_size: int = SCHEDULER_ROLLING_SLICE_SIZE,
+                 jitter: float = SCHEDULER_CHECK_JITTER,
+                 retry_minutes: float = SCHEDULER_RETRY_MINUTES,
+                 lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+                 flush_seconds: float = SCHEDULER_FLUSH_SECONDS,
+                 report_seconds: float = SCHEDULER_REPORT_SECONDS,
+                 base_interval_minutes: float = SCHEDULER_BASE_INTERVAL_MINUTES):
+        self.session_factory = session_factory or get_session_local()
+        self._owns_client = client is None
+        self.client = client or ScraperClient()
+        self._owns_executor = parse_executor is None
+        self.parse_executor = parse_executor or create_parse_executor()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.configured_rate = rate
+        self.slice_size = slice_size
+        self.jitter = jitter
+        self.retry_after = timedelta(minutes=retry_minutes)
+        self.lease = timedelta(seconds=lease_seconds)
+        self.worker_id = new_worker_id()
+        self.flush_seconds = flush_seconds
+        self.report_seconds = report_seconds
+        self.base_interval_minutes = base_interval_minutes
+
+        self.stats: Counter = Counter()
+        self.pipeline: Optional[ScrapePipeline] = None
+        # Claims, batch writes, lease renewals and reports run here instead of on the event loop
+        self.db_thread: Optional[DatabaseThread] = None
+        self.rate = rate
+        self.lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+        self._stop = asyncio.Event()
+
+    def stop(self) -> None:
+        """Stops dispatching; products already handed to workers are finished and written."""
+        self._stop.set()
+
+    def _refresh_rate(self) -> None:
+        if self.configured_rate > 0:
+            self.rate = self.configured_rate
+            return
+        with self.session_factory() as db:
+            products = db.scalar(select(func.count()).select_from(Product)) or 0
+        self.rate = max(products / (self.base_interval_minutes * 60), 0.01)
+
+    def _due_count(self) -> int:
+        now = datetime.now(timezone.utc)
+        with self.session_factory() as db:
+            return db.scalar(
+                select(func.count()).select_from(Product)
+                .where(or_(Product.next_check_at.is_(None), Product.next_check_at <= now))
+            ) or 0
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            **self.stats,
+            "rate": round(self.rate, 3),
+            "lag_seconds": round(self.lag_seconds, 1),
+            "max_lag_seconds": round(self.max_lag_seconds, 1),
+        }
+        if self.pipeline is not None:
+            status["stages"] = self.pipeline.stats()
+        return status
+
+    async def _sleep(self, seconds: float) -> None:
+        """Sleeps for seconds, or until stop() is called."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def _slice(self) -> int:
+        return min(self.slice_size, max(1, int(self.rate * self.lease.total_seconds() / 2)))
+
+    def _pause(self) -> float:
+        pause = 1 / self.rate
+        if self.jitter:
+            pause *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        return pause
+
+    async def _dispatch(self, queue: asyncio.Queue) -> None:
+        try:
+            while not self._stop.is_set():
+                now = datetime.now(timezone.utc)
+                claimed = await self.db_thread.run(claim_products, self.session_factory, self.worker_id, self._slice(),
+                                                   now, self.lease, due_before=now, by_due=True)
+                if not claimed:
+                    self.lag_seconds = 0.0
+                    await self._sleep(min(self.flush_seconds, 1 / self.rate))
+                    continue
+                for index, row in enumerate(claimed):
+                    due_at = as_utc(row.next_check_at or row.last_checked)
+                    self.lag_seconds = max(0.0, (datetime.now(timezone.utc) - due_at).total_seconds())
+                    self.max_lag_seconds = max(self.max_lag_seconds, self.lag_seconds)
+                    self.stats["dispatched"] += 1
+                    await queue.put(ProductSnapshot.from_row(row))
+                    await self._sleep(self._pause())
+                    if self._stop.is_set():
+                        await self.db_thread.run(self._release, [row.id for row in claimed[index + 1:]])
+                        break
+        finally:
+            await queue.put(None)
+
+    def _release(self, product_ids: List[int]) -> None:
+        """Gives back products that were claimed but won't be checked, so another worker can take them now."""
+        if not product_ids:
+            return
+        with self.session_factory() as db:
+            release_products(db, product_ids, self.worker_id)
+            db.commit()
+
+    async def _write(self, results: asyncio.Queue, writer: BatchWriter) -> None:
+        last_flush = time.monotonic()
+        while True:
+            try:
+                outcome = await asyncio.wait_for(results.get(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                outcome = False
+            if outcome is None:
+                break
+            if outcome is not False:
+                started = time.monotonic()
+                self.stats["processed"] += 1
+                writer.add(outcome)
+                if writer.full:
+                    await self.db_thread.run(writer.flush)
+                    last_flush = time.monotonic()
+                self.pipeline.record_write(started)
+            if time.monotonic() - last_flush >= self.flush_seconds:
+                await self.db_thread.run(writer.flush)
+                last_flush = time.monotonic()
+        await self.db_thread.run(writer.flush)
+
+    async def _report(self) -> None:
+        while not self._stop.is_set():
+            await self._sleep(self.report_seconds)
+            await self.db_thread.run(self._refresh_rate)
+            due = await self.db_thread.run(self._due_count)
+            logger.info(f"Rolling scheduler: {due} products due, {self.status()}")
+            if self.lag_seconds > self.report_seconds:
+                logger.warning(f"Rolling scheduler is {self.lag_seconds:.0f}s behind schedule at {self.rate:.2f} checks/s.")
+
+    async def run(self) -> Dict[str, Any]:
+        """Runs until stop() is called. Returns the final status."""
+        logger.info("Starting rolling scheduler...")
+        self._refresh_rate()
+        logger.info(f"Rolling scheduler rate: {self.rate:.3f} checks/s.")
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers)
+        results: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        writer = BatchWriter(self.session_factory, self.batch_size, self.stats, self.worker_id, self.retry_after)
+        self.db_thread = DatabaseThread()
+        # Its stage stats are part of this scheduler's own reports
+        self.pipeline = ScrapePipeline(self.client, self.parse_executor, self.workers, report_seconds=0)
+        writer_task = asyncio.ensure_future(self._write(results, writer))
+        report_task = asyncio.ensure_future(self._report())
+        leases_task = asyncio.ensure_future(keep_leases(self.session_factory, self.worker_id, self.lease, self.db_thread))
+        pipeline_task = asyncio.ensure_future(self.pipeline.run(queue, results))
+        try:
+            await self._dispatch(queue)
+            await pipeline_task
+        finally:
+            self._stop.set()
+            pipeline_task.cancel()
+            await results.put(None)
+            await writer_task
+            report_task.cancel()
+            leases_task.cancel()
+            self.db_thread.shutdown()
+            logger.info(f"Rolling scheduler stopped: {self.status()}")
+            if self._owns_client:
+                await self.client.aclose()
+            if self._owns_executor and self.parse_executor is not None:
+                self.parse_executor.shutdown()
+        return self.status()
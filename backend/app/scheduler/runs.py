@@ -0,0 +1,210 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Collection, Dict, Iterable
+
+from sqlalchemy import and_, func, not_, or_, select, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.config import SCHEDULER_RUN_HEARTBEAT_SECONDS, SCHEDULER_RUN_STALE_SECONDS
+from app.models import Product, SchedulerRun, SchedulerRunStatus
+from app.scheduler.db_thread import DatabaseThread
+from app.scheduler.leases import as_utc, new_worker_id
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Ledger column -> the scheduler counters it adds up
+LEDGER_COUNTS = {
+    "succeeded": ("updated", "unchanged"),
+    "failed": ("failed", "lost"),
+    "skipped": ("skipped", "deferred"),
+    "deleted": ("removed",),
+}
+
+_runs = SchedulerRun.__table__
+
+# Product ids per IN list, well below the bind parameter limits
+_MAX_IDS = 5000
+
+
+class RunLedger:
+    """
+    Keeps one run's row in scheduler_runs up to date as its batches commit.
+
+    Products are dispatched in id order but finish out of order, so the cursor only moves past a
+    product once it and every product before it have been handled (written or released for retry)
+    and committed. A product whose batch failed to commit is never handled, so the cursor stays
+    before it for the rest of the run. Resuming from the cursor may re-check products that
+    finished early, but never skips one. Runs that dispatch by priority instead (not `ordered`)
+    keep no cursor: resuming them relies on checked products no longer being due.
+    """
+
+    def __init__(self, run_id: int, worker_id: str, cursor: int = 0,
+                 due_before: Optional[datetime] = None, due_only: bool = True,
+                 base_counts: Optional[Dict[str, int]] = None, ordered: bool = True,
+                 owner: Optional[str] = None):
+        self.run_id = run_id
+        self.worker_id = worker_id
+        # This process, as recorded in scheduler_runs.owner
+        self.owner = owner or worker_id
+        self.cursor = cursor
+        self.due_before = due_before
+        self.due_only = due_only
+        self.ordered = ordered
+        # Which budget limit stopped the run early, if any (see RunBudget)
+        self.stop_reason: Optional[str] = None
+        # Counts committed by earlier attempts of a resumed run
+        self.base_counts = Counter(base_counts or {})
+        self._outstanding: deque = deque()
+        self._handled: set = set()
+
+    def dispatched(self, product_id: int) -> None:
+        self._outstanding.append(product_id)
+
+    def cursor_after(self, product_ids: Iterable[int]) -> int:
+        """Where the cursor would be once product_ids are handled too, without moving it."""
+        handled = self._handled.union(product_ids)
+        cursor = self.cursor
+        for product_id in self._outstanding:
+            if product_id not in handled:
+                break
+            if self.ordered:
+                cursor = product_id
+        return cursor
+
+    def handled(self, product_ids: Iterable[int]) -> None:
+        """Call once the products' results have committed."""
+        self._handled.update(product_ids)
+        while self._outstanding and self._outstanding[0] in self._handled:
+            self._handled.discard(self._outstanding[0])
+            product_id = self._outstanding.popleft()
+            if self.ordered:
+                self.cursor = product_id
+
+    def counts(self, stats: Counter) -> Dict[str, int]:
+        return {
+            column: self.base_counts[column] + sum(stats[key] for key in keys)
+            for column, keys in LEDGER_COUNTS.items()
+        }
+
+    def save(self, db: Session, stats: Counter, now: Optional[datetime] = None,
+             cursor: Optional[int] = None) -> None:
+        """
+        Writes the cursor (or the one given, see cursor_after) and counts in the caller's
+        transaction, so they commit with the batch, unless another process has taken the run over.
+        Does not commit.
+        """
+        now = now or datetime.now(timezone.utc)
+        db.execute(
+            update(_runs).where(_runs.c.id == self.run_id, _runs.c.owner == self.owner)
+            .values(cursor=self.cursor if cursor is None else cursor, updated_at=now, heartbeat_at=now,
+                    **self.counts(stats))
+        )
+
+    def heartbeat(self, session_factory: sessionmaker) -> None:
+        with session_factory() as db:
+            db.execute(
+                update(_runs).where(_runs.c.id == self.run_id, _runs.c.owner == self.owner)
+                .values(heartbeat_at=datetime.now(timezone.utc))
+            )
+            db.commit()
+
+
+async def keep_alive(session_factory: sessionmaker, ledger: RunLedger, db_thread: DatabaseThread,
+                     interval: float = SCHEDULER_RUN_HEARTBEAT_SECONDS) -> None:
+    """Records the run's heartbeat every interval seconds until cancelled, so --resume leaves it alone."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await db_thread.run(ledger.heartbeat, session_factory)
+        except Exception as e:
+            logger.error(f"Failed to record the heartbeat of scheduler run {ledger.run_id}: {e}")
+
+
+def start_run(session_factory: sessionmaker, worker_id: str, due_before: Optional[datetime],
+              due_only: bool = True, ordered: bool = True) -> RunLedger:
+    """Records a new run in scheduler_runs and returns its ledger."""
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        run = SchedulerRun(worker_id=worker_id, owner=worker_id, status=SchedulerRunStatus.RUNNING.value,
+                           due_only=due_only, due_before=due_before, cursor=0, succeeded=0, failed=0, skipped=0,
+                           deleted=0, resumed=0, carried_over=0, started_at=now, heartbeat_at=now)
+        db.add(run)
+        db.commit()
+        return RunLedger(run.id, worker_id, due_before=due_before, due_only=due_only, ordered=ordered)
+
+
+def resume_run(session_factory: sessionmaker, ordered: bool = True,
+               stale_after: timedelta = timedelta(seconds=SCHEDULER_RUN_STALE_SECONDS)) -> Optional[RunLedger]:
+    """
+    Takes over the latest run if it never completed and nothing is running it any more: it failed,
+    was interrupted, or is still marked running but its heartbeat is older than stale_after (its
+    process died). Returns its ledger, positioned at its last committed cursor with the same
+    due_before and worker id, under a new owner. Returns None when the latest run completed, is
+    still alive, or there is none.
+
+    The takeover is a single conditional UPDATE, so of several processes resuming at once only one
+    gets the run.
+    """
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        run = db.scalar(select(SchedulerRun).order_by(SchedulerRun.started_at.desc(), SchedulerRun.id.desc()).limit(1))
+        if run is None or run.status == SchedulerRunStatus.COMPLETED.value:
+            return None
+        # Runs recorded before heartbeats existed fall back to their last checkpoint
+        last_seen = func.coalesce(_runs.c.heartbeat_at, _runs.c.updated_at, _runs.c.started_at)
+        owner = new_worker_id()
+        taken = db.execute(
+            update(_runs)
+            .where(_runs.c.id == run.id, or_(
+                _runs.c.status.in_([SchedulerRunStatus.FAILED.value, SchedulerRunStatus.INTERRUPTED.value]),
+                and_(_runs.c.status == SchedulerRunStatus.RUNNING.value, last_seen < now - stale_after),
+            ))
+            .values(status=SchedulerRunStatus.RUNNING.value, owner=owner, heartbeat_at=now,
+                    resumed=_runs.c.resumed + 1, finished_at=None)
+        ).rowcount
+        db.commit()
+        if not taken:
+            logger.warning(f"Scheduler run {run.id} is still running (owner {run.owner}), not taking it over.")
+            return None
+        db.refresh(run)
+        due_before = as_utc(run.due_before) if run.due_before is not None else None
+        logger.info(f"Resuming scheduler run {run.id} after product {run.cursor} "
+                    f"(attempt {run.resumed + 1}, {run.succeeded} succeeded so far).")
+        return RunLedger(run.id, run.worker_id, run.cursor, due_before, run.due_only,
+                         {column: getattr(run, column) for column in LEDGER_COUNTS}, ordered, owner)
+
+
+def count_carried_over(db: Session, ledger: RunLedger, started_at: datetime,
+                       released: Collection[int] = ()) -> int:
+    """
+    Products the run should have checked but left for the next one: those still due (for --all runs,
+    not checked since it started) and those it released for a later retry (see BatchWriter), whose
+    next check was pushed past the run.
+    """
+    if ledger.due_before is not None:
+        due = or_(Product.next_check_at.is_(None), Product.next_check_at <= ledger.due_before)
+    else:
+        due = Product.last_checked < started_at
+    count = db.scalar(select(func.count()).select_from(Product).where(due)) or 0
+    released = list(released)
+    for offset in range(0, len(released), _MAX_IDS):
+        count += db.scalar(
+            select(func.count()).select_from(Product)
+            .where(Product.id.in_(released[offset:offset + _MAX_IDS]), not_(due))
+        ) or 0
+    return count
+
+
+def finish_run(session_factory: sessionmaker, ledger: RunLedger, stats: Counter, status: str) -> None:
+    """Closes the run with its final cursor, counts, status and why it stopped early, if it did."""
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        ledger.save(db, stats, now)
+        db.execute(
+            update(_runs).where(_runs.c.id == ledger.run_id, _runs.c.owner == ledger.owner)
+            .values(status=status, finished_at=now, stop_reason=ledger.stop_reason, carried_over=stats["carried_over"])
+        )
+        db.commit()
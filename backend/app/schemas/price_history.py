@@ -12,6 +12,7 @@ class PriceHistoryOut(BaseModel):
     product_id: int
     price: float
     timestamp: datetime
+    last_seen_at: datetime | None = None
     source: str | None = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -23,6 +24,8 @@ class ReturnSearchHistoryModel(BaseModel):
     product_id: int = Field(..., alias="productId")
     price: float
     timestamp: datetime
+    # Last check that saw the same price, when the row covers several checks
+    last_seen_at: datetime | None = Field(None, alias="lastSeenAt")
     source: str | None = None
     notifications: bool | None = None
 
@@ -0,0 +1,16 @@
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime
+
+class ScrapeJobOut(BaseModel):
+    id: int
+    product_id: int = Field(..., alias="productId")
+    status: str
+    priority: int
+    attempts: int
+    max_attempts: int = Field(..., alias="maxAttempts")
+    available_at: datetime = Field(..., alias="availableAt")
+    last_error: str | None = Field(None, alias="lastError")
+    created_at: datetime = Field(..., alias="createdAt")
+    completed_at: datetime | None = Field(None, alias="completedAt")
+
+    model_config = ConfigDict(from_attributes=True, populate_by_name=True)
@@ -0,0 +1,92 @@
+import hashlib
+import re
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Query parameters that only track where a click came from and never change the page
+TRACKING_PARAMS = {
+    "_trkparms", "_trksid", "_from", "amdata", "ref", "ref_", "qid", "sr", "crid", "sprefix",
+    "gclid", "fbclid", "msclkid", "mkcid", "mkrid", "mkevt", "campid", "customid", "toolid",
+}
+TRACKING_PREFIXES = ("utm_", "_trk", "pf_rd_", "pd_rd_")
+
+_EBAY_ITEM_PATTERN = re.compile(r'/itm/(?:[^/]+/)?(\d{9,})')
+_AMAZON_ASIN_PATTERN = re.compile(r'/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/asin)/([A-Z0-9]{10})(?:[/?]|$)', re.IGNORECASE)
+
+
+def _is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def _host(url: str) -> str:
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def _detect_source(url: str, source: Optional[str]) -> Optional[str]:
+    host = _host(url)
+    if source == "eBay" or host.startswith('ebay.') or '.ebay.' in host:
+        return "eBay"
+    if source == "Amazon" or host.startswith('amazon.') or '.amazon.' in host:
+        return "Amazon"
+    return None
+
+
+def ebay_item_id(url: str) -> Optional[str]:
+    match = _EBAY_ITEM_PATTERN.search(urlsplit(url).path)
+    return match.group(1) if match else None
+
+
+def amazon_asin(url: str) -> Optional[str]:
+    match = _AMAZON_ASIN_PATTERN.search(urlsplit(url).path)
+    return match.group(1).upper() if match else None
+
+
+def strip_tracking(url: str) -> str:
+    """
+    Normalizes a URL without knowing its source: lowercases the scheme and host, drops the
+    fragment and tracking parameters, and sorts the remaining query parameters.
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not _is_tracking_param(name)
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+
+def canonical_url(url: str, source: Optional[str] = None) -> str:
+    """
+    The shortest URL that still identifies the same listing, e.g. https://www.ebay.com/itm/<item id>
+    for an eBay listing reached through any tracking link.
+    """
+    detected = _detect_source(url, source)
+    parts = urlsplit(url)
+    if detected == "eBay" and ebay_item_id(url):
+        return urlunsplit(('https', parts.netloc.lower(), f"/itm/{ebay_item_id(url)}", '', ''))
+    if detected == "Amazon" and amazon_asin(url):
+        return urlunsplit(('https', parts.netloc.lower(), f"/dp/{amazon_asin(url)}", '', ''))
+    return strip_tracking(url)
+
+
+def canonical_key(url: str, source: Optional[str] = None) -> str:
+    """
+    A short key shared by every URL of the same listing, used to find duplicate products.
+
+    eBay listings are keyed by site and item id, Amazon products by marketplace and ASIN (prices
+    are in the site's currency, and Product has no currency to tell them apart), and anything
+    else by a hash of the URL with its tracking parameters removed.
+    """
+    detected = _detect_source(url, source)
+    if detected == "eBay":
+        item_id = ebay_item_id(url)
+        if item_id:
+            return f"ebay:{_host(url)}:{item_id}"
+    elif detected == "Amazon":
+        asin = amazon_asin(url)
+        if asin:
+            return f"amazon:{_host(url)}:{asin}"
+    return "url:" + hashlib.sha1(strip_tracking(url).encode('utf-8')).hexdigest()
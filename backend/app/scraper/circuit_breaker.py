@@ -0,0 +1,192 @@
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional, Dict, Any
+
+from app.config import (
+    SCRAPER_CIRCUIT_FAILURE_RATE,
+    SCRAPER_CIRCUIT_WINDOW,
+    SCRAPER_CIRCUIT_MIN_CALLS,
+    SCRAPER_CIRCUIT_OPEN_SECONDS,
+    SCRAPER_CIRCUIT_MAX_OPEN_SECONDS,
+    SCRAPER_CIRCUIT_HALF_OPEN_CALLS,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of scraping while a source's circuit is open."""
+
+    def __init__(self, source: str, retry_after: float):
+        super().__init__(f"Circuit for {source} is open. Retry in {retry_after:.0f}s.")
+        self.source = source
+        self.retry_after = retry_after
+
+
+@dataclass(frozen=True)
+class CircuitBreakerConfig:
+    # Fraction of failed attempts in the window that opens the circuit
+    failure_rate: float = SCRAPER_CIRCUIT_FAILURE_RATE
+    # Number of most recent attempts the failure rate is computed over
+    window: int = SCRAPER_CIRCUIT_WINDOW
+    # The circuit never opens before this many attempts were recorded
+    min_calls: int = SCRAPER_CIRCUIT_MIN_CALLS
+    # How long the circuit stays open the first time. Doubles every time a probe fails.
+    open_seconds: float = SCRAPER_CIRCUIT_OPEN_SECONDS
+    max_open_seconds: float = SCRAPER_CIRCUIT_MAX_OPEN_SECONDS
+    # Probe attempts let through while half open. All of them must succeed to close the circuit.
+    half_open_calls: int = SCRAPER_CIRCUIT_HALF_OPEN_CALLS
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one source.
+
+    CLOSED: attempts go through and their outcomes are recorded. Once the failure rate over the
+    last `window` attempts reaches `failure_rate`, the circuit opens.
+    OPEN: check() raises CircuitOpenError right away, so callers stop retrying and sleeping.
+    HALF_OPEN: after the open period, a few probe attempts are let through. If they all succeed the
+    circuit closes; a failed probe reopens it for twice as long (up to max_open_seconds).
+    """
+
+    def __init__(self, source: str, config: Optional[CircuitBreakerConfig] = None):
+        self.source = source
+        self.config = config or CircuitBreakerConfig()
+        self.state = CircuitState.CLOSED
+        self._outcomes: deque = deque(maxlen=self.config.window)
+        self._open_seconds = self.config.open_seconds
+        self._opened_at = 0.0
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        # Attempts let through by check() that haven't recorded an outcome yet, and how many of
+        # them were already in flight when the circuit went half open
+        self._in_flight = 0
+        self._stale = 0
+        self.times_opened = 0
+        self.rejected = 0
+
+    def _set_state(self, state: CircuitState) -> None:
+        if state is not self.state:
+            logger.warning(f"Circuit for {self.source}: {self.state.value} -> {state.value}")
+            self.state = state
+
+    def _half_open(self) -> None:
+        # Only probes made from now on count. Successes of attempts made before the circuit
+        # opened say nothing about whether the source has recovered.
+        self._probes_started = 0
+        self._probes_succeeded = 0
+        self._stale = self._in_flight
+        self._set_state(CircuitState.HALF_OPEN)
+
+    def _open(self) -> None:
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+        self._set_state(CircuitState.OPEN)
+
+    @property
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + self._open_seconds - time.monotonic())
+
+    def check(self) -> None:
+        """Call before each attempt. Raises CircuitOpenError if the attempt must not be made."""
+        if self.state is CircuitState.OPEN:
+            if self.retry_after > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.source, self.retry_after)
+            self._half_open()
+
+        if self.state is CircuitState.HALF_OPEN:
+            if self._probes_started >= self.config.half_open_calls:
+                # Probes that never reported back (e.g. cancelled) don't keep the circuit half open
+                # forever. Neither do older attempts that never will.
+                if time.monotonic() - self._opened_at < self._open_seconds * 2:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.source, self._open_seconds)
+                self._in_flight = 0
+                self._half_open()
+            self._probes_started += 1
+        self._in_flight += 1
+
+    def raise_if_open(self) -> None:
+        """Raises CircuitOpenError while the circuit is open, without using up a half-open probe."""
+        if self.state is CircuitState.OPEN:
+            self.rejected += 1
+            raise CircuitOpenError(self.source, self.retry_after)
+
+    def record_success(self) -> None:
+        self._in_flight = max(0, self._in_flight - 1)
+        if self.state is CircuitState.HALF_OPEN:
+            # Outcomes aren't matched to attempts, so as many successes as there were older
+            # attempts still in flight are discounted. A failure always reopens the circuit.
+            if self._stale:
+                self._stale -= 1
+                return
+            self._probes_succeeded += 1
+            if self._probes_succeeded >= self.config.half_open_calls:
+                self._outcomes.clear()
+                self._open_seconds = self.config.open_seconds
+                self._set_state(CircuitState.CLOSED)
+            return
+        self._outcomes.append(False)
+
+    def record_failure(self) -> None:
+        self._in_flight = max(0, self._in_flight - 1)
+        if self.state is CircuitState.HALF_OPEN:
+            self._open_seconds = min(self._open_seconds * 2, self.config.max_open_seconds)
+            self._open()
+            return
+        if self.state is CircuitState.OPEN:
+            return
+        self._outcomes.append(True)
+        if len(self._outcomes) >= self.config.min_calls and self.failure_rate >= self.config.failure_rate:
+            self._open()
+
+    @property
+    def failure_rate(self) -> float:
+        return sum(self._outcomes) / len(self._outcomes) if self._outcomes else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "failure_rate": round(self.failure_rate, 3),
+            "retry_after": round(self.retry_after, 1) if self.state is CircuitState.OPEN else 0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class CircuitBreakers:
+    """Per-source circuit breaker registry, keyed by the same source names as the rate limiter."""
+
+    def __init__(self, config: Optional[CircuitBreakerConfig] = None,
+                 overrides: Optional[Dict[str, CircuitBreakerConfig]] = None):
+        self._config = config or CircuitBreakerConfig()
+        self._overrides = overrides or {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def for_source(self, source: str) -> CircuitBreaker:
+        breaker = self._breakers.get(source)
+        if breaker is None:
+            breaker = CircuitBreaker(source, self._overrides.get(source, self._config))
+            self._breakers[source] = breaker
+        return breaker
+
+    def record(self, source: str, failed: bool) -> None:
+        breaker = self.for_source(source)
+        if failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {source: breaker.stats() for source, breaker in self._breakers.items()}
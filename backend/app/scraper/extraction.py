@@ -0,0 +1,160 @@
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Optional, Dict, Any, Callable, Sequence, Tuple
+
+from lxml import etree
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def has_class(name: str) -> str:
+    """XPath predicate matching elements with the given CSS class (the XPath form of '.name')."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+@dataclass(frozen=True)
+class FieldSpec:
+    """
+    How to read one field from a page.
+
+    xpaths are tried in order and the first one that matches wins, like a list of fallback selectors.
+    The value is the element's text, or the first non-empty attribute in attrs when attrs is given.
+    post, when set, turns the raw string into the final value.
+    """
+    xpaths: Sequence[str]
+    attrs: Tuple[str, ...] = ()
+    post: Optional[Callable[[str], Any]] = None
+
+
+@dataclass(frozen=True)
+class StatusSpec:
+    """
+    A page state that ends parsing early (e.g. a sold out listing).
+    Matches when the first element found by xpath contains any of the lowercase markers.
+    """
+    xpath: str
+    markers: Tuple[str, ...]
+    result: Dict[str, Any]
+    message: str
+
+
+@dataclass(frozen=True)
+class SourceSpec:
+    """
+    Declarative extraction rules for one source.
+
+    build receives the extracted fields (None when a field wasn't found) and returns the
+    scraped data dict, or None if the page couldn't be parsed.
+
+    Pages are first tried against embedded structured data (JSON-LD, OpenGraph, microdata) when
+    structured_data is True. A page containing any of structured_data_blockers skips that fast
+    path, for states only the source's own rules recognise (e.g. an ended eBay listing).
+    """
+    name: str
+    fields: Dict[str, FieldSpec]
+    build: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+    statuses: Sequence[StatusSpec] = field(default_factory=tuple)
+    structured_data: bool = True
+    structured_data_blockers: Tuple[bytes, ...] = ()
+
+
+def element_text(element: etree._Element) -> str:
+    """Same result as BeautifulSoup's get_text(strip=True): each text node stripped and joined."""
+    return ''.join(text.strip() for text in element.itertext())
+
+
+class CompiledSpec:
+    """
+    A SourceSpec with every XPath compiled once up front.
+    Calling it with an lxml document returns the scraped data dict (or None).
+    """
+
+    def __init__(self, spec: SourceSpec):
+        self.spec = spec
+        self.name = spec.name
+        self._statuses = [
+            (etree.XPath(f"({status.xpath})[1]"), status) for status in spec.statuses
+        ]
+        self._fields = {
+            name: ([etree.XPath(f"({xpath})[1]") for xpath in field_spec.xpaths], field_spec)
+            for name, field_spec in spec.fields.items()
+        }
+
+    def _extract_field(self, tree: etree._Element, xpaths, field_spec: FieldSpec) -> Any:
+        for xpath in xpaths:
+            matches = xpath(tree)
+            if not matches:
+                continue
+            element = matches[0]
+            if field_spec.attrs:
+                value = next((element.get(attr) for attr in field_spec.attrs if element.get(attr)), None)
+            else:
+                value = element_text(element)
+            if value is not None and field_spec.post is not None:
+                value = field_spec.post(value)
+            return value
+        return None
+
+    def __call__(self, tree: Optional[etree._Element]) -> Optional[Dict[str, Any]]:
+        if tree is None:
+            return None
+
+        for xpath, status in self._statuses:
+            matches = xpath(tree)
+            if matches:
+                text = ''.join(matches[0].itertext()).lower()
+                if any(marker in text for marker in status.markers):
+                    logger.warning(status.message)
+                    return dict(status.result)
+
+        try:
+            values = {
+                name: self._extract_field(tree, xpaths, field_spec)
+                for name, (xpaths, field_spec) in self._fields.items()
+            }
+            return self.spec.build(values)
+        except (ValueError, TypeError) as e:
+            logger.error(f"An unexpected error occurred during {self.name} parsing: {e}")
+            return None
+
+
+def compile_spec(spec: SourceSpec) -> CompiledSpec:
+    return CompiledSpec(spec)
+
+
+# A block page either says "captcha" in its visible text or carries a CAPTCHA form. Text inside
+# <script> and <style> doesn't count: product pages' own JS can mention captcha (e.g. for a
+# sign-in widget) without the page being a block page.
+_CAPTCHA_XPATH = etree.XPath(
+    "boolean(//text()[not(ancestor::script or ancestor::style)]"
+    "[contains(translate(., 'ACHPT', 'achpt'), 'captcha')])"
+    " or boolean(//form[contains(translate(@action, 'ACHPT', 'achpt'), 'captcha')])"
+    " or boolean(//input[@id='captchacharacters'])"
+)
+
+_CAPTCHA_BYTES = re.compile(rb'captcha', re.IGNORECASE)
+
+
+def is_captcha_page(tree: Optional[etree._Element]) -> bool:
+    return tree is not None and bool(_CAPTCHA_XPATH(tree))
+
+
+def may_be_captcha_page(body: bytes) -> bool:
+    """
+    Cheap check on the raw bytes: False means the page is certainly not a CAPTCHA page, True only
+    that it mentions one somewhere (possibly in a script), which is_captcha_page then settles.
+    """
+    return _CAPTCHA_BYTES.search(body) is not None
+
+
+def parse_html(body: bytes, encoding: Optional[str] = None) -> Optional[etree._Element]:
+    """Builds an lxml document from a response body. Returns None for an empty body."""
+    if not body:
+        return None
+    try:
+        return etree.fromstring(body, etree.HTMLParser(encoding=encoding))
+    except etree.XMLSyntaxError:
+        # lxml raises this for a document with no elements
+        return None
@@ -0,0 +1,106 @@
+import logging
+import math
+from collections import deque
+from typing import Optional, Dict, Any
+
+from app.config import (
+    SCRAPER_HEDGE_PERCENTILE,
+    SCRAPER_HEDGE_BUDGET,
+    SCRAPER_HEDGE_MIN_SAMPLES,
+    SCRAPER_HEDGE_MIN_DELAY,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Keeps the most recent time-to-headers samples for one host."""
+
+    def __init__(self, max_samples: int = 200):
+        self._samples: deque = deque(maxlen=max_samples)
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(percentile / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Decides when the scraper sends a second (hedged) request for a slow page.
+
+    A request that hasn't received its response headers after the host's `percentile` latency
+    gets a hedge. Hedges are paid for out of a global budget that earns `budget` hedges per
+    request sent (e.g. 0.05 = at most about 5% extra requests), so a slow site can't double the load.
+    Hosts with fewer than min_samples observations are never hedged.
+    """
+
+    def __init__(self, percentile: float = SCRAPER_HEDGE_PERCENTILE, budget: float = SCRAPER_HEDGE_BUDGET,
+                 min_samples: int = SCRAPER_HEDGE_MIN_SAMPLES, min_delay: float = SCRAPER_HEDGE_MIN_DELAY,
+                 max_burst: float = 10.0):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_burst = max_burst
+        self._latencies: Dict[str, LatencyTracker] = {}
+        self._tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def _tracker(self, host: str) -> LatencyTracker:
+        tracker = self._latencies.get(host)
+        if tracker is None:
+            tracker = LatencyTracker()
+            self._latencies[host] = tracker
+        return tracker
+
+    def record_latency(self, host: str, seconds: float) -> None:
+        self._tracker(host).record(seconds)
+
+    def delay_for(self, host: str) -> Optional[float]:
+        """How long to wait for headers before hedging, or None if the host isn't hedged yet."""
+        tracker = self._tracker(host)
+        if not len(tracker) or len(tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, tracker.percentile(self.percentile))
+
+    def on_request(self) -> None:
+        self.requests += 1
+        self._tokens = min(self.max_burst, self._tokens + self.budget)
+
+    def try_hedge(self) -> bool:
+        """Takes one hedge from the budget. Returns False when the budget is spent."""
+        if self._tokens < 1:
+            self.denied += 1
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+    def record_win(self) -> None:
+        self.hedge_wins += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "denied": self.denied,
+            "delay_by_host": {
+                host: round(delay, 3)
+                for host in self._latencies
+                if (delay := self.delay_for(host)) is not None
+            },
+        }
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Callable, Dict, Any, TypeVar
+
+from app.config import SCRAPER_PARSE_EXECUTOR, SCRAPER_PARSE_WORKERS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class ParseExecutor:
+    """
+    Runs CPU-bound page parsing off the event loop.
+
+    kind="process" uses a process pool (one worker per core by default) so a scheduler run can use
+    every core; kind="thread" uses a thread pool, which is cheaper to start but shares the GIL.
+    At most max_pending parse jobs are queued or running; callers wait for a free slot before
+    handing over a page, so downloads can't pile up faster than they are parsed.
+    """
+
+    def __init__(self, kind: str = "process", max_workers: Optional[int] = None,
+                 max_pending: Optional[int] = None):
+        if kind not in ("process", "thread"):
+            raise ValueError(f"Unknown parse executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self._executor: Executor = (
+            ProcessPoolExecutor(max_workers=self.max_workers)
+            if kind == "process"
+            else ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="parse")
+        )
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self.pending = 0
+        self.waiting = 0
+        self.completed = 0
+
+    async def __aenter__(self) -> "ParseExecutor":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.shutdown()
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Runs fn(*args) in the pool. fn and its arguments must be picklable for a process pool."""
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "waiting": self.waiting,
+            "completed": self.completed,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_parse_executor() -> Optional[ParseExecutor]:
+    """Builds the parse executor configured by SCRAPER_PARSE_EXECUTOR, or None to parse inline."""
+    if SCRAPER_PARSE_EXECUTOR in ("", "none"):
+        return None
+    return ParseExecutor(kind=SCRAPER_PARSE_EXECUTOR, max_workers=SCRAPER_PARSE_WORKERS or None)
+
+
+# --- Shared executor for the API process ---
+# Lets route handlers that scrape (e.g. create_product) parse off the event loop too.
+_shared_executor: Optional[ParseExecutor] = None
+
+
+def get_parse_executor() -> Optional[ParseExecutor]:
+    global _shared_executor
+    if _shared_executor is None:
+        _shared_executor = create_parse_executor()
+    return _shared_executor
+
+
+def shutdown_parse_executor() -> None:
+    global _shared_executor
+    if _shared_executor is not None:
+        _shared_executor.shutdown()
+        _shared_executor = None
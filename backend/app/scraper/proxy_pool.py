@@ -0,0 +1,206 @@
+import logging
+import random
+import time
+from typing import Optional, Dict, Any, Callable, Sequence, Collection, List
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.config import (
+    SCRAPER_PROXY_EWMA_ALPHA,
+    SCRAPER_PROXY_QUARANTINE_SECONDS,
+    SCRAPER_PROXY_MAX_CONSECUTIVE_FAILURES,
+    SCRAPER_PROXY_MIN_SUCCESS_RATE,
+    SCRAPER_PROXY_MAX_BLOCK_RATE,
+    SCRAPER_PROXY_MIN_SAMPLES,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Builds the transport for one proxy URL (None means a direct connection)
+TransportFactory = Callable[[Optional[str]], httpx.AsyncBaseTransport]
+
+
+def proxy_name(proxy_url: Optional[str]) -> str:
+    """A printable name for a proxy, without its credentials."""
+    if not proxy_url:
+        return "direct"
+    parts = urlsplit(proxy_url)
+    return f"{parts.hostname}:{parts.port}" if parts.port else str(parts.hostname)
+
+
+class ProxyEndpoint:
+    """
+    One proxy with its own connection pool and health statistics.
+
+    latency, success_rate and block_rate are exponentially weighted moving averages, so the
+    proxy's score follows its recent behaviour. success_rate covers getting a response at all
+    (connect errors, timeouts); block_rate covers responses that were CAPTCHAs or throttling.
+    """
+
+    def __init__(self, url: Optional[str], transport: httpx.AsyncBaseTransport, timeout: httpx.Timeout):
+        self.url = url
+        self.name = proxy_name(url)
+        self.transport = transport
+        self.client = httpx.AsyncClient(transport=transport, timeout=timeout)
+        self.latency: Optional[float] = None
+        self.success_rate = 1.0
+        self.block_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.blocked = 0
+        self.consecutive_failures = 0
+        self.quarantined_until = 0.0
+        self.times_quarantined = 0
+
+    @property
+    def quarantined(self) -> bool:
+        return self.quarantined_until > time.monotonic()
+
+    def weight(self, default_latency: float) -> float:
+        """Selection weight: share of useful responses per second of waiting."""
+        latency = self.latency if self.latency is not None else default_latency
+        return max(self.success_rate * (1 - self.block_rate), 0.01) / max(latency, 0.05)
+
+    def reset_health(self) -> None:
+        self.success_rate = 1.0
+        self.block_rate = 0.0
+        self.consecutive_failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "blocked": self.blocked,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "success_rate": round(self.success_rate, 3),
+            "block_rate": round(self.block_rate, 3),
+            "quarantined": self.quarantined,
+            "times_quarantined": self.times_quarantined,
+        }
+
+
+class ProxyPool:
+    """
+    Picks a proxy for each request, weighted by health, and takes misbehaving proxies out of
+    rotation for quarantine_seconds.
+
+    A proxy is quarantined after max_consecutive_failures failed requests in a row, or once it has
+    min_samples requests and its success rate falls below min_success_rate or its block rate rises
+    above max_block_rate. When it comes back its statistics are reset so it gets traffic again.
+    If every proxy is quarantined, the one that comes back soonest is used.
+
+    Each proxy keeps its own httpx client and connection pool, so connections to the proxy are
+    reused. transport_factory builds the transport for a proxy URL; tests can pass one that
+    returns stand-in transports.
+    """
+
+    def __init__(
+        self,
+        proxy_urls: Sequence[Optional[str]],
+        transport_factory: TransportFactory,
+        timeout: httpx.Timeout,
+        alpha: float = SCRAPER_PROXY_EWMA_ALPHA,
+        quarantine_seconds: float = SCRAPER_PROXY_QUARANTINE_SECONDS,
+        max_consecutive_failures: int = SCRAPER_PROXY_MAX_CONSECUTIVE_FAILURES,
+        min_success_rate: float = SCRAPER_PROXY_MIN_SUCCESS_RATE,
+        max_block_rate: float = SCRAPER_PROXY_MAX_BLOCK_RATE,
+        min_samples: int = SCRAPER_PROXY_MIN_SAMPLES,
+    ):
+        if not proxy_urls:
+            proxy_urls = [None]
+        self.proxies: List[ProxyEndpoint] = [
+            ProxyEndpoint(url, transport_factory(url), timeout) for url in proxy_urls
+        ]
+        # Gateways with per-session credentials share a host, so number repeated names
+        seen: Dict[str, int] = {}
+        for proxy in self.proxies:
+            seen[proxy.name] = seen.get(proxy.name, 0) + 1
+            if seen[proxy.name] > 1:
+                proxy.name = f"{proxy.name}#{seen[proxy.name]}"
+        self.alpha = alpha
+        self.quarantine_seconds = quarantine_seconds
+        self.max_consecutive_failures = max_consecutive_failures
+        self.min_success_rate = min_success_rate
+        self.max_block_rate = max_block_rate
+        self.min_samples = min_samples
+
+    @property
+    def is_closed(self) -> bool:
+        return all(proxy.client.is_closed for proxy in self.proxies)
+
+    async def aclose(self) -> None:
+        for proxy in self.proxies:
+            if not proxy.client.is_closed:
+                await proxy.client.aclose()
+
+    def _release_quarantined(self) -> None:
+        now = time.monotonic()
+        for proxy in self.proxies:
+            if proxy.quarantined_until and proxy.quarantined_until <= now:
+                proxy.quarantined_until = 0.0
+                proxy.reset_health()
+                logger.info(f"Proxy {proxy.name} is back in rotation.")
+
+    def choose(self, exclude: Collection[ProxyEndpoint] = ()) -> ProxyEndpoint:
+        """Picks a healthy proxy, preferring ones not in exclude (e.g. the proxy a hedged request already uses)."""
+        if len(self.proxies) == 1:
+            return self.proxies[0]
+
+        self._release_quarantined()
+        healthy = [proxy for proxy in self.proxies if not proxy.quarantined]
+        candidates = [proxy for proxy in healthy if proxy not in exclude] or healthy
+        if not candidates:
+            return min(self.proxies, key=lambda proxy: proxy.quarantined_until)
+
+        latencies = [proxy.latency for proxy in candidates if proxy.latency is not None]
+        default_latency = sum(latencies) / len(latencies) if latencies else 1.0
+        weights = [proxy.weight(default_latency) for proxy in candidates]
+        return random.choices(candidates, weights=weights)[0]
+
+    def _ewma(self, current: float, sample: float) -> float:
+        return current + self.alpha * (sample - current)
+
+    def record_success(self, proxy: ProxyEndpoint, latency: float) -> None:
+        """The proxy returned response headers after latency seconds."""
+        proxy.requests += 1
+        proxy.consecutive_failures = 0
+        proxy.latency = latency if proxy.latency is None else self._ewma(proxy.latency, latency)
+        proxy.success_rate = self._ewma(proxy.success_rate, 1.0)
+        proxy.block_rate = self._ewma(proxy.block_rate, 0.0)
+
+    def record_failure(self, proxy: ProxyEndpoint) -> None:
+        """The request through the proxy failed without a response (connect error, timeout...)."""
+        proxy.requests += 1
+        proxy.failures += 1
+        proxy.consecutive_failures += 1
+        proxy.success_rate = self._ewma(proxy.success_rate, 0.0)
+        self._check_health(proxy)
+
+    def record_blocked(self, proxy: Optional[ProxyEndpoint]) -> None:
+        """The site answered a request through the proxy with a CAPTCHA or throttling response."""
+        if proxy is None:
+            return
+        proxy.blocked += 1
+        # record_success already counted the response as unblocked, so replace that sample
+        proxy.block_rate = min(1.0, proxy.block_rate + self.alpha)
+        self._check_health(proxy)
+
+    def _check_health(self, proxy: ProxyEndpoint) -> None:
+        if proxy.quarantined or len(self.proxies) == 1:
+            return
+        reason = None
+        if proxy.consecutive_failures >= self.max_consecutive_failures:
+            reason = f"{proxy.consecutive_failures} failures in a row"
+        elif proxy.requests >= self.min_samples and proxy.success_rate < self.min_success_rate:
+            reason = f"success rate {proxy.success_rate:.2f}"
+        elif proxy.requests >= self.min_samples and proxy.block_rate > self.max_block_rate:
+            reason = f"block rate {proxy.block_rate:.2f}"
+        if reason:
+            proxy.quarantined_until = time.monotonic() + self.quarantine_seconds
+            proxy.times_quarantined += 1
+            logger.warning(f"Quarantining proxy {proxy.name} for {self.quarantine_seconds:.0f}s: {reason}.")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {proxy.name: proxy.stats() for proxy in self.proxies}
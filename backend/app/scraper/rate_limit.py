@@ -0,0 +1,162 @@
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, AsyncIterator
+
+from app.config import SCRAPER_RATE_LIMITS, SCRAPER_DEFAULT_RATE_LIMIT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SourceLimitConfig:
+    """Configured limits for one scrape source (e.g. "Amazon")."""
+    requests_per_second: float
+    max_in_flight: int
+    # The rate never adapts below this fraction of the configured rate
+    min_rate_fraction: float = 0.05
+    # Multiplicative decrease applied when the site starts blocking us
+    decrease_factor: float = 0.5
+    # Fraction of the configured rate recovered per successful request
+    recovery_fraction: float = 0.02
+
+
+class TokenBucket:
+    """
+    Classic token bucket. Tokens refill continuously at `rate` per second up to `capacity`,
+    and each request takes one token.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def set_rate(self, rate: float) -> None:
+        self._refill()
+        self.rate = rate
+
+    async def acquire(self) -> None:
+        # The lock makes waiters queue up in order instead of all waking up at once.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SourceLimiter:
+    """
+    Rate and concurrency limiter for a single source.
+
+    Uses additive-increase/multiplicative-decrease on the request rate: blocked responses
+    (CAPTCHA, 429, 503) halve the rate, successes slowly bring it back to the configured limit.
+    """
+
+    def __init__(self, source: str, config: SourceLimitConfig):
+        self.source = source
+        self.config = config
+        self.max_rate = config.requests_per_second
+        self.min_rate = config.requests_per_second * config.min_rate_fraction
+        # A burst of one second's worth of requests at most
+        self.bucket = TokenBucket(rate=self.max_rate, capacity=max(1.0, self.max_rate))
+        self._semaphore = asyncio.Semaphore(config.max_in_flight)
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self.successes = 0
+        self.blocked = 0
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        async with self._semaphore:
+            await self.bucket.acquire()
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def record_success(self) -> None:
+        self.successes += 1
+        if self.rate < self.max_rate:
+            self.bucket.set_rate(min(self.max_rate, self.rate + self.max_rate * self.config.recovery_fraction))
+
+    def record_blocked(self) -> None:
+        self.blocked += 1
+        # Requests that were already in flight when the site started blocking report at about
+        # the same time; only back off once per refill interval so they don't collapse the rate.
+        now = time.monotonic()
+        if now - self._last_decrease < 1 / self.rate:
+            return
+        self._last_decrease = now
+        new_rate = max(self.min_rate, self.rate * self.config.decrease_factor)
+        if new_rate < self.rate:
+            logger.warning(f"{self.source} is blocking requests. Lowering rate to {new_rate:.2f} req/s.")
+            self.bucket.set_rate(new_rate)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": round(self.rate, 3),
+            "max_rate": self.max_rate,
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "blocked": self.blocked,
+        }
+
+
+class RateLimiter:
+    """
+    Per-source rate limiter registry, keyed by the same source names as PARSERS.
+    Sources without explicit configuration share the default limits individually.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, SourceLimitConfig]] = None,
+                 default: Optional[SourceLimitConfig] = None):
+        if limits is None:
+            limits = {
+                source: SourceLimitConfig(requests_per_second=rate, max_in_flight=in_flight)
+                for source, (rate, in_flight) in SCRAPER_RATE_LIMITS.items()
+            }
+        if default is None:
+            rate, in_flight = SCRAPER_DEFAULT_RATE_LIMIT
+            default = SourceLimitConfig(requests_per_second=rate, max_in_flight=in_flight)
+        self._configs = limits
+        self._default = default
+        self._limiters: Dict[str, SourceLimiter] = {}
+
+    def for_source(self, source: str) -> SourceLimiter:
+        limiter = self._limiters.get(source)
+        if limiter is None:
+            limiter = SourceLimiter(source, self._configs.get(source, self._default))
+            self._limiters[source] = limiter
+        return limiter
+
+    def slot(self, source: str):
+        """Async context manager that waits for both a token and a free in-flight slot."""
+        return self.for_source(source).slot()
+
+    def record(self, source: str, blocked: bool) -> None:
+        limiter = self.for_source(source)
+        if blocked:
+            limiter.record_blocked()
+        else:
+            limiter.record_success()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {source: limiter.stats() for source, limiter in self._limiters.items()}
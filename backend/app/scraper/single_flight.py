@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Awaitable, Hashable, Tuple
+
+from app.config import SCRAPER_RESULT_CACHE_SECONDS, SCRAPER_RESULT_CACHE_SIZE
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ScrapeResult = Optional[Dict[str, Any]]
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key into one in-flight call, and keeps successful
+    results for a short TTL so callers arriving right after it finished reuse them too.
+
+    Callers each get their own copy of the result dict. Failed (None) results are not cached.
+    """
+
+    def __init__(self, ttl: float = SCRAPER_RESULT_CACHE_SECONDS, max_entries: int = SCRAPER_RESULT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self._cache: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def _cached(self, key: Hashable) -> ScrapeResult:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        return result
+
+    def _store(self, key: Hashable, result: Dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        self._cache[key] = (time.monotonic() + self.ttl, result)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def cached(self, key: Hashable) -> ScrapeResult:
+        """A copy of key's cached result, or None when there is none."""
+        cached = self._cached(key)
+        if cached is None:
+            return None
+        self.cache_hits += 1
+        return dict(cached)
+
+    def follow(self, key: Hashable) -> Optional[Awaitable[ScrapeResult]]:
+        """The result of the call in flight for key, to await like do()'s, or None when there is none."""
+        future = self._in_flight.get(key)
+        if future is None:
+            return None
+        self.coalesced += 1
+        return self._wait(future)
+
+    def lead(self, key: Hashable) -> asyncio.Future:
+        """
+        Registers a call for key made outside do(), e.g. one product going through the scheduler's
+        pipeline. Concurrent calls for key wait for the returned future, which the caller must
+        resolve with the result (or an exception). A successful result is cached like do()'s.
+        """
+        self.calls += 1
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        future.add_done_callback(lambda finished: self._finish(key, finished))
+        return future
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[ScrapeResult]]) -> ScrapeResult:
+        cached = self.cached(key)
+        if cached is not None:
+            return cached
+
+        following = self.follow(key)
+        if following is not None:
+            return await following
+
+        self.calls += 1
+        # The call runs as its own task so one caller being cancelled doesn't cancel it for the others
+        task = asyncio.ensure_future(fn())
+        self._in_flight[key] = task
+        task.add_done_callback(lambda finished: self._finish(key, finished))
+        return await self._wait(task)
+
+    @staticmethod
+    async def _wait(future: asyncio.Future) -> ScrapeResult:
+        result = await asyncio.shield(future)
+        return dict(result) if result is not None else None
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self._store(key, future.result())
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "in_flight": len(self._in_flight),
+            "cached": len(self._cache),
+        }
@@ -0,0 +1,108 @@
+import logging
+import re
+from typing import Optional, Dict, Any
+
+from app.models.products import EbayFailStatus
+from app.scraper.extraction import SourceSpec, FieldSpec, StatusSpec, has_class
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Extraction rules for every supported source. Adding a source means adding a SourceSpec here;
+# PARSERS in product_scraper is compiled from this dict at import time.
+
+PRICE_PATTERN = re.compile(r'[\d,]+\.\d{2}')
+
+
+def _price_from_text(price_text: str) -> Optional[float]:
+    price_match = PRICE_PATTERN.search(price_text)
+    return float(price_match.group().replace(',', '')) if price_match else None
+
+
+def _build_amazon(values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    current_price = None
+    if values["price_whole"] and values["price_fraction"]:
+        current_price = float(f"{values['price_whole']}{values['price_fraction']}")
+
+    return {
+        "name": values["title"],
+        "current_price": current_price,
+        "image_url": values["image_url"],
+    }
+
+
+def _build_ebay(values: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not values["title"] or not values["price_text"]:
+        logger.warning("Could not find all required eBay elements (title/price).")
+        return None
+
+    current_price = _price_from_text(values["price_text"])
+    if current_price is None:
+        logger.warning(f"Could not parse price from string: '{values['price_text']}'")
+        return None
+
+    return {
+        "name": values["title"],
+        "current_price": current_price,
+        "image_url": values["image_url"],
+    }
+
+
+AMAZON_SPEC = SourceSpec(
+    name="Amazon",
+    fields={
+        "title": FieldSpec(xpaths=["//*[@id='productTitle']"]),
+        "price_whole": FieldSpec(
+            xpaths=[f"//span[{has_class('a-price-whole')}]"],
+            post=lambda text: text.replace(',', ''),
+        ),
+        "price_fraction": FieldSpec(xpaths=[f"//span[{has_class('a-price-fraction')}]"]),
+        "image_url": FieldSpec(xpaths=["//*[@id='landingImage']"], attrs=("data-old-hires", "src")),
+    },
+    build=_build_amazon,
+)
+
+EBAY_SPEC = SourceSpec(
+    name="eBay",
+    statuses=[
+        StatusSpec(
+            xpath=f"//*[{has_class('d-quantity__availability-text')}]",
+            markers=("sold", "out of stock"),
+            result={"name": EbayFailStatus.SOLD_OUT.value, "current_price": 0.0, "image_url": None},
+            message="eBay product is sold out.",
+        ),
+        StatusSpec(
+            xpath="//*[@id='ended_msg']",
+            markers=("this listing has ended",),
+            result={"name": EbayFailStatus.LISTING_ENDED.value, "current_price": 0.0, "image_url": None},
+            message="eBay listing has ended.",
+        ),
+    ],
+    fields={
+        "title": FieldSpec(xpaths=[
+            f"//*[{has_class('x-item-title__mainTitle')}]",
+            f"//h1[{has_class('d-item-title')}]",
+        ]),
+        "price_text": FieldSpec(xpaths=[
+            f"//*[@data-testid='x-price-primary']//*[{has_class('ux-textspans')}]",
+            f"//*[{has_class('x-price-primary')}]//*[{has_class('ux-textspans')}]",
+        ]),
+        "image_url": FieldSpec(
+            xpaths=[
+                f"//*[{has_class('ux-image-carousel-item')} and {has_class('active')}]//img",
+                "//*[@id='vi-img-main-img']",
+            ],
+            attrs=("data-zoom-src", "src"),
+        ),
+    },
+    build=_build_ebay,
+    # Ended listings can keep their offer in the JSON-LD block, and sold out ones can keep it with
+    # no availability or even marked InStock, so a page with either status element goes to the full
+    # parser, which checks statuses before the price
+    structured_data_blockers=(b'ended_msg', b'd-quantity__availability-text'),
+)
+
+SOURCE_SPECS = {
+    "Amazon": AMAZON_SPEC,
+    "eBay": EBAY_SPEC,
+}
@@ -0,0 +1,129 @@
+import logging
+from typing import Optional, Callable, Dict, List
+
+from lxml import etree
+
+from app.scraper.structured_data import StructuredDataCollector
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A matcher decides whether a fully parsed element is one the source's parser needs.
+Matcher = Callable[[etree._Element], bool]
+
+
+def _has_class(element: etree._Element, *names: str) -> bool:
+    classes = (element.get('class') or '').split()
+    return all(name in classes for name in names)
+
+
+def _has_ancestor(element: etree._Element, matcher: Matcher) -> bool:
+    parent = element.getparent()
+    while parent is not None:
+        if matcher(parent):
+            return True
+        parent = parent.getparent()
+    return False
+
+
+def _text(element: etree._Element) -> str:
+    return ''.join(element.itertext()).lower()
+
+
+# For each source, the elements its parser reads, in the parser's selector priority order.
+# Reading stops once the first (preferred) alternative of every target has been seen, so the
+# partial tree gives the parser exactly the elements it would have picked from the full page.
+STREAM_TARGETS: Dict[str, Dict[str, List[Matcher]]] = {
+    "Amazon": {
+        "title": [lambda el: el.get('id') == 'productTitle'],
+        "price_whole": [lambda el: el.tag == 'span' and _has_class(el, 'a-price-whole')],
+        "price_fraction": [lambda el: el.tag == 'span' and _has_class(el, 'a-price-fraction')],
+        "image": [lambda el: el.get('id') == 'landingImage'],
+    },
+    "eBay": {
+        "title": [
+            lambda el: _has_class(el, 'x-item-title__mainTitle'),
+            lambda el: el.tag == 'h1' and _has_class(el, 'd-item-title'),
+        ],
+        "price": [
+            lambda el: _has_class(el, 'ux-textspans') and _has_ancestor(el, lambda a: a.get('data-testid') == 'x-price-primary'),
+            lambda el: _has_class(el, 'ux-textspans') and _has_ancestor(el, lambda a: _has_class(a, 'x-price-primary')),
+        ],
+        "image": [
+            lambda el: el.tag == 'img' and _has_ancestor(el, lambda a: _has_class(a, 'ux-image-carousel-item', 'active')),
+            lambda el: el.get('id') == 'vi-img-main-img',
+        ],
+        # The availability text is checked before the price, so it has to be read too. Its container
+        # closes right after it in the buy box, so an in-stock listing stops there rather than at the end
+        "availability": [lambda el: _has_class(el, 'd-quantity__availability') or _has_class(el, 'd-quantity__availability-text')],
+    },
+}
+
+# Elements that settle the result on their own (e.g. an ended listing), so reading can stop right away.
+STREAM_TERMINATORS: Dict[str, List[Matcher]] = {
+    "Amazon": [],
+    "eBay": [
+        lambda el: _has_class(el, 'd-quantity__availability-text') and ('sold' in _text(el) or 'out of stock' in _text(el)),
+        lambda el: el.get('id') == 'ended_msg' and 'this listing has ended' in _text(el),
+    ],
+}
+
+
+class StreamExtractor:
+    """
+    Incrementally parses an HTML response with lxml and reports when the elements a source's
+    parser needs have all been read, so the rest of the body never has to be downloaded.
+
+    Structured data (JSON-LD scripts, meta tags) is collected along the way. When
+    structured_data_stop is set, a complete structured result also ends the stream.
+    """
+
+    def __init__(self, source: str, encoding: Optional[str] = None, structured_data_stop: bool = False):
+        self.targets = STREAM_TARGETS.get(source, {})
+        self.terminators = STREAM_TERMINATORS.get(source, [])
+        self.structured_data = StructuredDataCollector()
+        self.structured_data_stop = structured_data_stop
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=encoding)
+        self._found_preferred = set()
+        self.done = False
+        self.bytes_read = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        """Feeds the next chunk of the body. Returns True once reading can stop."""
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            if self._check(element):
+                self.done = True
+                break
+        return self.done
+
+    def _collect_structured_data(self, element: etree._Element) -> bool:
+        """Returns True if the element added structured data."""
+        if element.tag == 'script' and (element.get('type') or '').lower() == 'application/ld+json':
+            self.structured_data.add_json_ld(element.text or '')
+        elif element.tag == 'meta':
+            self.structured_data.add_meta({key.lower(): value for key, value in element.attrib.items()})
+        elif element.get('itemprop') == 'price':
+            self.structured_data.add_microdata_price(element.attrib)
+        else:
+            return False
+        return True
+
+    def _check(self, element: etree._Element) -> bool:
+        if any(matcher(element) for matcher in self.terminators):
+            return True
+        if self._collect_structured_data(element) and self.structured_data_stop and self.structured_data.result():
+            return True
+        for name, alternatives in self.targets.items():
+            if name not in self._found_preferred and alternatives[0](element):
+                self._found_preferred.add(name)
+        return bool(self.targets) and len(self._found_preferred) == len(self.targets)
+
+    def close(self) -> Optional[etree._Element]:
+        """Finishes parsing whatever was read and returns the (possibly partial) document root."""
+        try:
+            return self._parser.close()
+        except etree.XMLSyntaxError:
+            # Raised for an empty document
+            return None
@@ -0,0 +1,149 @@
+import html
+import json
+import logging
+import re
+from typing import Optional, Dict, Any, Iterator, Mapping
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Byte-level patterns, so structured data can be read without building a DOM.
+_JSON_LD_PATTERN = re.compile(
+    rb'<script[^>]*type\s*=\s*["\']?application/ld\+json["\']?[^>]*>(.*?)</script\s*>',
+    re.IGNORECASE | re.DOTALL,
+)
+_META_PATTERN = re.compile(rb'<meta\s[^>]*>', re.IGNORECASE)
+_ITEMPROP_PRICE_PATTERN = re.compile(rb'<[a-z]+\s[^>]*itemprop\s*=\s*["\']?price["\'\s>][^>]*>', re.IGNORECASE)
+_ATTRIBUTE_PATTERN = re.compile(rb'([\w:-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_PRICE_PATTERN = re.compile(r'\d[\d,]*(?:\.\d+)?')
+
+# Offer availability values that mean the listing has no buyable price
+UNAVAILABLE_MARKERS = ("outofstock", "soldout", "discontinued", "out of stock", "oos")
+
+
+def _attributes(tag: bytes) -> Dict[str, str]:
+    attributes = {}
+    for match in _ATTRIBUTE_PATTERN.finditer(tag):
+        value = match.group(2) or match.group(3) or match.group(4) or b''
+        attributes[match.group(1).decode('ascii', 'ignore').lower()] = html.unescape(value.decode('utf-8', 'replace'))
+    return attributes
+
+
+def _to_price(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    match = _PRICE_PATTERN.search(value)
+    return float(match.group().replace(',', '')) if match else None
+
+
+def _is_unavailable(value: Any) -> bool:
+    return isinstance(value, str) and any(marker in value.lower().replace('_', '') for marker in UNAVAILABLE_MARKERS)
+
+
+def _image_url(value: Any) -> Optional[str]:
+    if isinstance(value, list):
+        value = value[0] if value else None
+    if isinstance(value, dict):
+        value = value.get('url') or value.get('contentUrl')
+    return value if isinstance(value, str) else None
+
+
+def _find_products(node: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(node, list):
+        for item in node:
+            yield from _find_products(item)
+    elif isinstance(node, dict):
+        node_type = node.get('@type')
+        types = node_type if isinstance(node_type, list) else [node_type]
+        if 'Product' in types:
+            yield node
+        if '@graph' in node:
+            yield from _find_products(node['@graph'])
+
+
+class StructuredDataCollector:
+    """
+    Gathers product data from JSON-LD blocks, OpenGraph/product meta tags and microdata price tags.
+    result() returns name/current_price/image_url plus the extraction_path that supplied the price,
+    or None if no complete, in-stock product was found.
+    """
+
+    def __init__(self):
+        self._json_ld: Optional[Dict[str, Any]] = None
+        self._meta: Dict[str, str] = {}
+        self._microdata_price: Optional[float] = None
+        self.unavailable = False
+
+    def add_json_ld(self, text: str) -> None:
+        if self._json_ld is not None:
+            return
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return
+
+        for product in _find_products(data):
+            offers = product.get('offers')
+            offers = offers if isinstance(offers, list) else [offers]
+            for offer in offers:
+                if not isinstance(offer, dict):
+                    continue
+                if _is_unavailable(offer.get('availability')):
+                    self.unavailable = True
+                    continue
+                price = _to_price(offer.get('price', offer.get('lowPrice')))
+                if price is None and isinstance(offer.get('priceSpecification'), dict):
+                    price = _to_price(offer['priceSpecification'].get('price'))
+                if price is not None and isinstance(product.get('name'), str):
+                    self._json_ld = {
+                        "name": html.unescape(product['name']).strip(),
+                        "current_price": price,
+                        "image_url": _image_url(product.get('image')),
+                    }
+                    return
+
+    def add_meta(self, attributes: Mapping[str, str]) -> None:
+        key = attributes.get('property') or attributes.get('name')
+        content = attributes.get('content')
+        if key and content is not None:
+            self._meta.setdefault(key.lower(), content)
+            if key.lower() in ('og:availability', 'product:availability') and _is_unavailable(content):
+                self.unavailable = True
+
+    def add_microdata_price(self, attributes: Mapping[str, str]) -> None:
+        if self._microdata_price is None and attributes.get('content'):
+            self._microdata_price = _to_price(attributes['content'])
+
+    def result(self) -> Optional[Dict[str, Any]]:
+        if self.unavailable:
+            # Let the source's own parser decide how to report sold out or ended listings
+            return None
+        if self._json_ld is not None:
+            return {**self._json_ld, "extraction_path": "json-ld"}
+
+        name = self._meta.get('og:title')
+        image_url = self._meta.get('og:image')
+        meta_price = _to_price(self._meta.get('og:price:amount') or self._meta.get('product:price:amount'))
+        if name and meta_price is not None:
+            return {"name": name.strip(), "current_price": meta_price, "image_url": image_url, "extraction_path": "opengraph"}
+        if name and self._microdata_price is not None:
+            return {"name": name.strip(), "current_price": self._microdata_price, "image_url": image_url, "extraction_path": "microdata"}
+        return None
+
+
+def extract_structured_data(body: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Reads product data straight from the raw page bytes with regular expressions, without parsing HTML.
+    Returns None when the page has no usable structured data. Whether the page is a CAPTCHA page
+    is up to the caller (see parse_page).
+    """
+    collector = StructuredDataCollector()
+    for match in _JSON_LD_PATTERN.finditer(body):
+        collector.add_json_ld(match.group(1).decode('utf-8', 'replace'))
+    for match in _META_PATTERN.finditer(body):
+        collector.add_meta(_attributes(match.group()))
+    for match in _ITEMPROP_PRICE_PATTERN.finditer(body):
+        collector.add_microdata_price(_attributes(match.group()))
+    return collector.result()
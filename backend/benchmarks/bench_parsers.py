@@ -0,0 +1,203 @@
+"""
+Micro-benchmark for page parsing over the checked-in corpus in benchmarks/corpus/<version>/:
+anonymized Amazon and eBay pages of various sizes (normal, CAPTCHA, sold out, ended and layout
+variants), listed in the version's manifest.json with the result the scraper must extract from each.
+
+Before anything is timed, every page is run through parse_page and compared with its expected
+result, and the benchmark refuses to run on a mismatch, so a faster parser can't quietly change
+extracted prices. The same check runs in the test suite (tests/scraper_tests/test_parser_corpus.py).
+
+Each page is then measured for every stage of parsing:
+    parse_page       the whole path the scraper takes (structured data, then DOM and selectors)
+    structured_data  extract_structured_data on the raw bytes
+    parse_html       building the lxml document
+    captcha_check    is_captcha_page on the built document
+    selectors        the source's compiled spec (_parse_amazon / _parse_ebay) on the built document
+reporting the median and fastest time per call, and the peak and retained memory of one call.
+Memory comes from tracemalloc, so it covers Python allocations only: what libxml2 allocates for
+a document itself isn't included.
+
+Results are written as JSON (to stdout or --output), keyed by page and stage, so runs on two
+commits can be compared with --compare.
+
+Usage (from backend/):
+    python -m benchmarks.bench_parsers --output parsers-before.json
+    python -m benchmarks.bench_parsers --compare parsers-before.json
+    python -m benchmarks.bench_parsers --pages ebay/ --stages parse_page selectors
+
+Pages in a corpus version are never edited once results have been recorded against them, so
+results stay comparable page by page. New pages (e.g. a case a parser got wrong) can be added to
+the current version; a page whose markup has to change goes into a new version directory.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from lxml import etree
+
+from app.scraper.extraction import is_captcha_page, parse_html
+from app.scraper.product_scraper import PARSERS, parse_page
+from app.scraper.structured_data import extract_structured_data
+
+CORPUS_DIR = Path(__file__).parent / "corpus"
+CORPUS_VERSION = "v1"
+
+# Stage name -> function of (source, body, tree)
+STAGES: Dict[str, Callable[[str, bytes, Any], Any]] = {
+    "parse_page": lambda source, body, tree: parse_page(source, body),
+    "structured_data": lambda source, body, tree: extract_structured_data(body),
+    "parse_html": lambda source, body, tree: parse_html(body),
+    "captcha_check": lambda source, body, tree: is_captcha_page(tree),
+    "selectors": lambda source, body, tree: PARSERS[source](tree),
+}
+
+
+def load_corpus(version: str = CORPUS_VERSION) -> List[Dict[str, Any]]:
+    """The manifest's pages, each with its raw bytes under "body"."""
+    directory = CORPUS_DIR / version
+    manifest = json.loads((directory / "manifest.json").read_text())
+    return [{**page, "body": (directory / page["file"]).read_bytes()} for page in manifest["pages"]]
+
+
+def check_corpus(pages: List[Dict[str, Any]]) -> List[str]:
+    """Runs every page through parse_page and describes each result that differs from the manifest."""
+    mismatches = []
+    for page in pages:
+        is_captcha, scraped_data = parse_page(page["source"], page["body"])
+        result = {"is_captcha": True} if is_captcha else {"is_captcha": False, **(scraped_data or {})}
+        if result != page["expected"]:
+            mismatches.append(f"{page['file']}: expected {page['expected']}, got {result}")
+    return mismatches
+
+
+def _time_per_call(call: Callable[[], Any], repeat: int, min_seconds: float) -> List[float]:
+    """Seconds per call for each of `repeat` rounds, with enough calls per round to last min_seconds."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        if time.perf_counter() - start >= min_seconds:
+            break
+        number *= 2
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        rounds.append((time.perf_counter() - start) / number)
+    return rounds
+
+
+def _memory(call: Callable[[], Any]) -> Dict[str, int]:
+    """Peak and retained Python allocations (bytes) of one call, keeping its result alive."""
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = call()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"peak_bytes": peak - baseline, "retained_bytes": current - baseline}
+
+
+def measure(pages: List[Dict[str, Any]], stages: List[str], repeat: int = 5,
+            min_seconds: float = 0.05) -> List[Dict[str, Any]]:
+    results = []
+    for page in pages:
+        source, body = page["source"], page["body"]
+        tree = parse_html(body)
+        for stage in stages:
+            function = STAGES[stage]
+
+            def call():
+                return function(source, body, tree)
+            rounds = _time_per_call(call, repeat, min_seconds)
+            results.append({
+                "page": page["file"],
+                "source": source,
+                "kind": page["kind"],
+                "size_bytes": len(body),
+                "stage": stage,
+                "median_us": round(statistics.median(rounds) * 1e6, 1),
+                "min_us": round(min(rounds) * 1e6, 1),
+                **_memory(call),
+            })
+    return results
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _compare(baseline: Dict[str, Any], current: Dict[str, Any]) -> None:
+    if baseline["corpus"] != current["corpus"]:
+        print(f"Warning: comparing corpus {current['corpus']} against {baseline['corpus']}", file=sys.stderr)
+    before = {(result["page"], result["stage"]): result for result in baseline["results"]}
+    print(f"{'page':<28} {'stage':<16} {'before us':>10} {'after us':>10} {'time':>7} {'peak KB':>14}")
+    for result in current["results"]:
+        old = before.get((result["page"], result["stage"]))
+        if old is None:
+            continue
+        ratio = result["median_us"] / old["median_us"] if old["median_us"] else float("inf")
+        print(f"{result['page']:<28} {result['stage']:<16} {old['median_us']:>10.1f} {result['median_us']:>10.1f}"
+              f" {ratio:>6.2f}x {old['peak_bytes'] / 1024:>6.0f} -> {result['peak_bytes'] / 1024:<6.0f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", default=CORPUS_VERSION, help="Corpus version directory under benchmarks/corpus.")
+    parser.add_argument("--pages", nargs="+", help="Only pages whose path starts with one of these (e.g. ebay/).")
+    parser.add_argument("--stages", nargs="+", choices=list(STAGES), default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per page and stage; the median is reported.")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="Minimum duration of one timed round.")
+    parser.add_argument("--output", help="Write the JSON results here instead of stdout.")
+    parser.add_argument("--compare", help="Results file from an earlier run to compare this run against.")
+    args = parser.parse_args()
+
+    # The parsers log every sold out or ended listing
+    logging.disable(logging.WARNING)
+
+    pages = load_corpus(args.corpus)
+    mismatches = check_corpus(pages)
+    if mismatches:
+        sys.exit("Parser results differ from the corpus manifest:\n" + "\n".join(mismatches))
+    if args.pages:
+        pages = [page for page in pages if page["file"].startswith(tuple(args.pages))]
+
+    report = {
+        "corpus": args.corpus,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "lxml": ".".join(map(str, etree.LXML_VERSION)),
+        "results": measure(pages, args.stages, args.repeat, args.min_seconds),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    elif not args.compare:
+        print(output)
+    if args.compare:
+        _compare(json.loads(Path(args.compare).read_text()), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+End-to-end load benchmark for the one-shot scheduler run (update_product_prices_job) against the
+local page simulator in benchmarks.simulator, so it runs offline and never touches the real sites.
+
+For every catalog size, a fresh database is seeded with that many Amazon and eBay products pointing
+at the simulator, and a full run checks all of them. Reported per size: products per second,
+p50/p99 scrape latency (from the pipeline's histogram), the process's peak RSS, the number of SQL
+statements the run issued, and how the products ended up (updated, unchanged, failed, ...).
+Each size runs in its own process so peak RSS isn't carried over from the previous one. The
+simulator runs in a process of its own too, but on the same machine: on a single core, rendering
+its pages competes with the run for CPU time.
+
+Usage (from backend/):
+    python -m benchmarks.bench_scheduler_load --products 1000 10000 100000
+    python -m benchmarks.bench_scheduler_load --products 10000 --workers 200 --latency-ms 400 --captcha-rate 0.05
+    python -m benchmarks.bench_scheduler_load --products 1000 --json
+
+The simulator options (--latency-ms, --captcha-rate, --error-rate, --sold-out-rate, ...) are those of
+python -m benchmarks.simulator. The database must be empty or disposable: its tables are created
+and dropped for every run. Without --database-url a temporary SQLite file is used.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Product
+from app.scheduler.budget import RunBudget
+from app.scheduler.products import update_product_prices_job
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from benchmarks.simulator import add_config_arguments, config_from_args, free_port, serve, wait_until_listening
+
+# Counters from the run's stats shown in the table, in this order
+OUTCOMES = ("updated", "unchanged", "failed", "skipped", "deferred", "lost")
+
+
+def _seed(session_factory, count: int, base_url: str, ebay_share: float) -> None:
+    now = datetime.now(timezone.utc)
+    ebay_every = round(1 / ebay_share) if ebay_share else 0
+    rows = []
+    for i in range(count):
+        if ebay_every and i % ebay_every == 0:
+            source, url, key = "eBay", f"{base_url}/itm/{100000000000 + i}", f"ebay:127.0.0.1:{100000000000 + i}"
+        else:
+            asin = f"B{i:09d}"
+            source, url, key = "Amazon", f"{base_url}/dp/{asin}", f"amazon:127.0.0.1:{asin}"
+        rows.append({"name": f"Product {i}", "url": url, "canonical_key": key, "current_price": 100.0,
+                     "lowest_price": 90.0, "highest_price": 110.0, "source": source,
+                     "created_at": now, "last_checked": now})
+    with session_factory() as db:
+        for offset in range(0, len(rows), 5000):
+            db.execute(insert(Product.__table__), rows[offset:offset + 5000])
+        db.commit()
+
+
+def _run(database_url: str, count: int, base_url: str, options: dict) -> dict:
+    """One catalog size, in a fresh process."""
+    # Keep the scraper's per-product log lines (including the simulated errors) out of the timings
+    logging.disable(logging.ERROR)
+    engine = create_engine(database_url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    try:
+        _seed(session_factory, count, base_url, options["ebay_share"])
+
+        statements = 0
+
+        def count_statement(*args):
+            nonlocal statements
+            statements += 1
+        event.listen(engine, "before_cursor_execute", count_statement)
+
+        # The simulator has no politeness limits to respect, and every product is on one local host
+        workers = options["workers"]
+        unlimited = SourceLimitConfig(requests_per_second=1_000_000, max_in_flight=workers)
+        client = ScraperClient(proxy_url=None, proxy_urls=None, max_connections=workers,
+                               max_keepalive_connections=workers, max_connections_per_host=workers,
+                               http2=False, rate_limiter=RateLimiter(limits={}, default=unlimited))
+
+        async def run() -> dict:
+            try:
+                return await update_product_prices_job(
+                    session_factory=session_factory, client=client, workers=workers,
+                    parse_workers=options["parse_workers"], batch_size=options["batch_size"],
+                    due_only=False, budget=RunBudget(),
+                )
+            finally:
+                await client.aclose()
+
+        start = time.perf_counter()
+        stats = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+        event.remove(engine, "before_cursor_execute", count_statement)
+    finally:
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    result = {
+        "products": count,
+        "seconds": round(elapsed, 2),
+        "products_per_second": round(count / elapsed, 1),
+        "latency_p50_ms": stats.get("latency_p50_ms"),
+        "latency_p99_ms": stats.get("latency_p99_ms"),
+        "peak_rss_mb": round(peak_rss / 2 ** 20, 1),
+        "statements": statements,
+    }
+    result.update({outcome: stats.get(outcome, 0) for outcome in OUTCOMES})
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--ebay-share", type=float, default=0.3, help="Share of the catalog listed on eBay.")
+    parser.add_argument("--workers", type=int, default=100, help="Concurrent fetches.")
+    parser.add_argument("--parse-workers", type=int, default=0, help="Parse stage tasks (0 = the pipeline's default).")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--database-url")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per size instead of a table.")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    options = {"ebay_share": args.ebay_share, "workers": args.workers, "parse_workers": args.parse_workers,
+               "batch_size": args.batch_size}
+    # Spawned rather than forked, so neither the simulator nor a run inherits the others' memory
+    context = multiprocessing.get_context("spawn")
+    host, port = "127.0.0.1", free_port()
+    simulator = context.Process(target=serve, args=(config_from_args(args), host, port), daemon=True)
+    simulator.start()
+    try:
+        wait_until_listening(host, port)
+        base_url = f"http://{host}:{port}"
+        with tempfile.TemporaryDirectory() as tmp:
+            database_url = args.database_url or f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            if not args.json:
+                print(f"{'products':>10} {'seconds':>8} {'prod/s':>8} {'p50 ms':>7} {'p99 ms':>7} {'rss MB':>7}"
+                      f" {'stmts':>8}  " + " ".join(f"{outcome:>9}" for outcome in OUTCOMES))
+            for count in args.products:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    result = pool.submit(_run, database_url, count, base_url, options).result()
+                if args.json:
+                    print(json.dumps(result))
+                else:
+                    print(f"{count:>10} {result['seconds']:>8.1f} {result['products_per_second']:>8.1f}"
+                          f" {result['latency_p50_ms'] or 0:>7} {result['latency_p99_ms'] or 0:>7}"
+                          f" {result['peak_rss_mb']:>7.1f} {result['statements']:>8}  "
+                          + " ".join(f"{result[outcome]:>9}" for outcome in OUTCOMES))
+    finally:
+        simulator.terminate()
+        simulator.join()
+
+
+if __name__ == "__main__":
+    main()
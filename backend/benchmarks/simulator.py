@@ -0,0 +1,238 @@
+"""
+A local stand-in for the Amazon and eBay product pages the scraper reads, for load benchmarks that
+must not touch the real sites (see bench_scheduler_load).
+
+Amazon pages live at /dp/<asin> and eBay pages at /itm/<item id>. Every response waits for a
+latency drawn from a log-normal distribution (plus rare slow outliers), and a configurable share
+of requests get a CAPTCHA page, a server error or a throttling response. A share of eBay listings
+are sold out or ended. Pages are padded to a realistic size.
+
+Whether a listing is sold out, and its price, depend only on the seed and the path, so every run
+sees the same catalog. Whether one request hits a CAPTCHA or an error is drawn per request.
+
+Usage (from backend/):
+    python -m benchmarks.simulator --port 8900 --latency-ms 250 --captcha-rate 0.02
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import socket
+import time
+from dataclasses import dataclass, asdict
+from functools import lru_cache
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, Response
+from starlette.routing import Route
+
+
+@dataclass(frozen=True)
+class SimulatorConfig:
+    # Response latency: log-normal around latency_ms (latency_sigma 0 = always latency_ms)
+    latency_ms: float = 250.0
+    latency_sigma: float = 0.5
+    # Share of requests that take slow_ms instead, to give the latency distribution a tail
+    slow_rate: float = 0.01
+    slow_ms: float = 3000.0
+    # Per-request outcomes
+    captcha_rate: float = 0.02
+    error_rate: float = 0.01
+    throttle_rate: float = 0.0
+    # Per-listing outcomes (eBay only)
+    sold_out_rate: float = 0.02
+    ended_rate: float = 0.02
+    # Share of requests where the price moved since the last one
+    price_change_rate: float = 0.1
+    # Approximate page size; real product pages are several hundred KB
+    page_kb: int = 150
+    seed: int = 0
+
+
+def _stable_fraction(seed: int, key: str) -> float:
+    """A number in [0, 1) that only depends on seed and key."""
+    digest = hashlib.sha256(f"{seed}:{key}".encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+@lru_cache(maxsize=8)
+def _filler(kind: str, size: int) -> str:
+    """Page padding shaped like the bulk of a real product page: scripts, navigation and review blocks."""
+    blocks = [
+        "<script>window.ue_t0=window.ue_t0||+new Date();(function(d){var e=d.createElement('link');"
+        "e.rel='preconnect';e.href='https://images.example.com';d.head.appendChild(e);})(document);</script>",
+    ]
+    index = 0
+    while sum(len(block) for block in blocks) < size:
+        blocks.append(
+            f'<div class="a-section review aok-relative" id="{kind}-review-{index}"><div class="a-row">'
+            f'<span class="a-profile-name">Customer {index}</span><i class="a-icon a-icon-star a-star-{index % 5 + 1}"></i>'
+            f'</div><div class="a-row a-spacing-small review-data"><span class="a-size-base review-text">'
+            f'Works as described. Arrived on time and the packaging was fine. Item {index} of the list.</span></div>'
+            f'<ul class="a-unordered-list a-nostyle"><li><a href="/help/{index}">Helpful</a></li>'
+            f'<li><a href="/report/{index}">Report</a></li></ul></div>'
+        )
+        index += 1
+    return "\n".join(blocks)
+
+
+def _price(config: SimulatorConfig, key: str, moved: bool) -> float:
+    cents = 999 + int(_stable_fraction(config.seed, key) * 50_000)
+    if moved:
+        cents = int(cents * random.uniform(0.8, 1.2))
+    return cents / 100
+
+
+def amazon_page(asin: str, price: float, page_kb: int = 150) -> str:
+    whole, fraction = f"{price:,.2f}".split(".")
+    return f"""<!doctype html><html lang="en-us" class="a-no-js"><head><meta charset="utf-8">
+<title>Desk Lamp {asin} : Home &amp; Kitchen</title>
+</head><body>
+<div id="nav-belt"><a id="nav-logo-sprites" href="/">Home</a><div id="nav-search"><input type="text" name="field-keywords"></div></div>
+<div id="dp-container" class="a-container"><div id="centerCol" class="centerColAlign">
+<div id="titleSection" class="a-section a-spacing-none"><h1 id="title" class="a-size-large a-spacing-none">
+<span id="productTitle" class="a-size-large product-title-word-break">        Desk Lamp {asin}, LED, Dimmable       </span></h1></div>
+<div id="corePrice_feature_div" class="celwidget"><span class="a-price aok-align-center reinventPricePriceToPayMargin priceToPay">
+<span class="a-offscreen">${price:,.2f}</span><span aria-hidden="true"><span class="a-price-symbol">$</span><span class="a-price-whole">{whole}<span class="a-price-decimal">.</span></span><span class="a-price-fraction">{fraction}</span></span></span></div>
+<div id="imgTagWrapperId" class="imgTagWrapper"><img alt="Desk Lamp" src="https://images.example.com/I/{asin}._AC_SX300_.jpg" data-old-hires="https://images.example.com/I/{asin}._AC_SL1500_.jpg" id="landingImage"></div>
+</div></div>
+{_filler("amazon", page_kb * 1024)}
+</body></html>"""
+
+
+def amazon_captcha_page() -> str:
+    return """<!doctype html><html><head><title>Amazon.com</title>
+<script>var opfcaptcha = window.opfcaptcha || {}; opfcaptcha.start = +new Date();</script></head><body>
+<div class="a-container a-padding-double-large"><h4>Enter the characters you see below</h4>
+<p class="a-last">Sorry, we just need to make sure you're not a robot.</p>
+<form method="get" action="/errors/validateCaptcha"><img src="https://images.example.com/captcha/abc/Captcha_xyz.jpg">
+<input type="text" id="captchacharacters" name="field-keywords"><button type="submit">Continue shopping</button></form>
+</div></body></html>"""
+
+
+def ebay_page(item_id: str, price: float, status: str = "active", page_kb: int = 150) -> str:
+    """status is "active", "sold_out" or "ended"."""
+    structured_data = json.dumps({
+        "@context": "https://schema.org", "@type": "Product", "name": f"Vintage Desk Lamp {item_id}",
+        "image": f"https://i.example.com/images/g/{item_id}/s-l1600.jpg",
+        "offers": {"@type": "Offer", "price": f"{price:.2f}", "priceCurrency": "USD",
+                   "availability": "https://schema.org/InStock"},
+    })
+    json_ld = "" if status == "sold_out" else f'<script type="application/ld+json">{structured_data}</script>'
+    availability = ""
+    if status == "sold_out":
+        availability = ('<div class="d-quantity__availability"><span class="ux-textspans d-quantity__availability-text">'
+                        'Out of stock</span></div>')
+    ended = '<div id="ended_msg" class="vi-msg">This listing has ended.</div>' if status == "ended" else ""
+    return f"""<!doctype html><html lang="en"><head><meta charset="utf-8">
+<title>Vintage Desk Lamp {item_id} | eBay</title>{json_ld}
+</head><body>
+<div id="gh" class="gh-flex"><a id="gh-la" href="/">eBay</a><form id="gh-f"><input id="gh-ac" type="text" name="_nkw"></form></div>
+{ended}
+<div class="x-item-title" data-testid="x-item-title"><h1 class="x-item-title__mainTitle"><span class="ux-textspans ux-textspans--BOLD">Vintage Desk Lamp {item_id}</span></h1></div>
+<div class="x-price-primary" data-testid="x-price-primary"><span class="ux-textspans">US ${price:,.2f}</span></div>
+{availability}
+<div class="ux-image-carousel-item active image"><img data-zoom-src="https://i.example.com/images/g/{item_id}/s-l1600.jpg" src="https://i.example.com/images/g/{item_id}/s-l500.jpg"></div>
+{_filler("ebay", page_kb * 1024)}
+</body></html>"""
+
+
+def ebay_status(config: SimulatorConfig, item_id: str) -> str:
+    draw = _stable_fraction(config.seed, f"status:{item_id}")
+    if draw < config.sold_out_rate:
+        return "sold_out"
+    if draw < config.sold_out_rate + config.ended_rate:
+        return "ended"
+    return "active"
+
+
+def create_app(config: SimulatorConfig = SimulatorConfig()) -> Starlette:
+    async def respond(request: Request, render) -> Response:
+        latency = config.latency_ms
+        if random.random() < config.slow_rate:
+            latency = config.slow_ms
+        elif config.latency_sigma:
+            latency *= math.exp(random.gauss(0, config.latency_sigma))
+        await asyncio.sleep(latency / 1000)
+
+        draw = random.random()
+        if draw < config.throttle_rate:
+            return Response(status_code=503)
+        draw -= config.throttle_rate
+        if draw < config.error_rate:
+            return Response(status_code=random.choice((500, 502)))
+        draw -= config.error_rate
+        if draw < config.captcha_rate:
+            return HTMLResponse(amazon_captcha_page())
+        return HTMLResponse(render(random.random() < config.price_change_rate))
+
+    async def amazon(request: Request) -> Response:
+        asin = request.path_params["asin"]
+        return await respond(request, lambda moved: amazon_page(asin, _price(config, asin, moved), config.page_kb))
+
+    async def ebay(request: Request) -> Response:
+        item_id = request.path_params["item_id"]
+        status = ebay_status(config, item_id)
+        return await respond(request, lambda moved: ebay_page(item_id, _price(config, item_id, moved), status,
+                                                               config.page_kb))
+
+    async def health(request: Request) -> Response:
+        return Response("ok")
+
+    return Starlette(routes=[
+        Route("/dp/{asin}", amazon),
+        Route("/itm/{item_id}", ebay),
+        Route("/health", health),
+    ])
+
+
+def serve(config: SimulatorConfig, host: str = "127.0.0.1", port: int = 8900) -> None:
+    """Runs the simulator until the process is stopped. Kept at module level so it can be a spawned process's target."""
+    import uvicorn
+
+    random.seed(config.seed)
+    uvicorn.run(create_app(config), host=host, port=port, log_level="warning", backlog=4096)
+
+
+def wait_until_listening(host: str, port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Simulator didn't start listening on {host}:{port}")
+            time.sleep(0.05)
+
+
+def free_port(host: str = "127.0.0.1") -> int:
+    with socket.socket() as sock:
+        sock.bind((host, 0))
+        return sock.getsockname()[1]
+
+
+def add_config_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = SimulatorConfig()
+    for name, value in asdict(defaults).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=type(value), default=value)
+
+
+def config_from_args(args: argparse.Namespace) -> SimulatorConfig:
+    return SimulatorConfig(**{name: getattr(args, name) for name in asdict(SimulatorConfig())})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    serve(config_from_args(args), args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,79 @@
+import argparse
 import asyncio
+import signal
+from typing import Optional
 from app.scheduler.products import update_product_prices_job
+from app.scheduler.rolling import RollingScheduler
+from app.scheduler.jobs import JobWorker
+from app.scheduler.budget import RunBudget
+from app.scheduler.queue import enqueue_due_products
+from app.database import get_session_local
+from datetime import datetime, timezone
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+async def run_rolling(rate: Optional[float]) -> None:
+    scheduler = RollingScheduler() if rate is None else RollingScheduler(rate=rate)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, scheduler.stop)
+    await scheduler.run()
+
+async def run_jobs() -> None:
+    worker = JobWorker()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
 if __name__ == "__main__":
-    logger.info("Starting the standalone scheduler job...")
+    parser = argparse.ArgumentParser(description="Run the product price scheduler. Several copies can run at once"
+                                                 " against the same database; each product is claimed by one of them.")
+    parser.add_argument("--rolling", action="store_true",
+                        help="Run continuously, checking due products at a steady rate, until interrupted.")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Checks per second in rolling mode (default: SCHEDULER_ROLLING_RATE, 0 = from catalog size).")
+    parser.add_argument("--jobs", action="store_true",
+                        help="Work through the scrape job queue (refreshes and retries) until interrupted.")
+    parser.add_argument("--enqueue", action="store_true",
+                        help="Queue the due products as background scrape jobs for the --jobs workers, which check"
+                             " them after refreshes and retries, instead of checking them here.")
+    parser.add_argument("--all", action="store_true",
+                        help="One-shot mode: check every product, not only the due ones.")
+    parser.add_argument("--resume", action="store_true",
+                        help="One-shot mode: continue the last run that didn't complete from its last committed"
+                             " batch, unless it is still running (starts a new run otherwise).")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="One-shot mode: seconds the run may take, e.g. the cron job's time limit"
+                             " (default: SCHEDULER_RUN_DEADLINE_SECONDS).")
+    parser.add_argument("--max-requests", type=int, default=None,
+                        help="One-shot mode: scrape requests the run may send (default: SCHEDULER_RUN_MAX_REQUESTS).")
+    parser.add_argument("--max-bytes", type=int, default=None,
+                        help="One-shot mode: proxy bytes the run may receive (default: SCHEDULER_RUN_MAX_PROXY_BYTES).")
+    args = parser.parse_args()
+
     try:
-        asyncio.run(update_product_prices_job())
-        logger.info("Standalone scheduler job finished successfully.")
+        if args.jobs:
+            logger.info("Starting the scrape job worker...")
+            asyncio.run(run_jobs())
+        elif args.enqueue:
+            count = enqueue_due_products(get_session_local(), datetime.now(timezone.utc))
+            logger.info(f"Queued scrape jobs for {count} due products.")
+        elif args.rolling:
+            logger.info("Starting the rolling scheduler...")
+            asyncio.run(run_rolling(args.rate))
+        else:
+            logger.info("Starting the standalone scheduler job...")
+            configured = RunBudget.from_config()
+            budget = RunBudget(
+                deadline_seconds=args.deadline if args.deadline is not None else configured.deadline_seconds,
+                max_requests=args.max_requests if args.max_requests is not None else configured.max_requests,
+                max_bytes=args.max_bytes if args.max_bytes is not None else configured.max_bytes,
+            )
+            asyncio.run(update_product_prices_job(due_only=not args.all, resume=args.resume, budget=budget))
+            logger.info("Standalone scheduler job finished successfully.")
     except Exception as e:
         logger.error(f"An error occurred during the scheduler job: {e}")
-
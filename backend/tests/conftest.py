@@ -116,4 +116,14 @@ def authenticated_client(test_client):
     yield test_client
 
     # Clean up - remove auth header
-    test_client.headers.pop("Authorization", None)
\ No newline at end of file
+    test_client.headers.pop("Authorization", None)
+
+@pytest.fixture(autouse=True)
+def clear_scrape_cache():
+    """
+    Scrape results are cached per URL for a short time. Clear the cache so tests scraping the same URL stay independent.
+    """
+    from app.scraper.product_scraper import _scrape_flight
+    _scrape_flight.clear()
+    yield
+    _scrape_flight.clear()
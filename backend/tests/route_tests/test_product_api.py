@@ -1,6 +1,8 @@
 import pytest
 import uuid
 from app.schemas.product import ProductOut
+from app.models import Alert, AlertType, Notification, Product
+from app.scraper.circuit_breaker import CircuitOpenError
 from unittest.mock import AsyncMock
 from fastapi.testclient import TestClient
 
@@ -20,7 +22,7 @@ def mock_scraper(mocker):
         side_effect=mock_scrape_func
     )
 
-def test_create_product(authenticated_client, mock_scraper):
+def test_create_product(authenticated_client, mock_scraper, test_db):
     """
     Test the create_product endpoint with an authenticated user.
     """
@@ -52,6 +54,11 @@ def test_create_product(authenticated_client, mock_scraper):
     assert validated_product.source == product_data["product"]["source"]
     assert str(validated_product.image_url) == "https://mocked.com/image.png"
 
+    # Its first scheduled check is spread over the base interval instead of being due at once
+    created = test_db.get(Product, validated_product.id)
+    assert created.next_check_at is not None
+    assert created.next_check_at.replace(tzinfo=None) > created.created_at.replace(tzinfo=None)
+
 def test_get_user_products(authenticated_client, mock_scraper):
     """
     Test the get_user_products endpoint.
@@ -159,6 +166,26 @@ def test_update_product(authenticated_client, mocker):
     assert validated_product.current_price == 42.42
     assert validated_product.source == "UpdatedSource"
 
+def test_update_product_alerts_on_threshold_crossing(authenticated_client, mocker, test_db):
+    """
+    Test that a manual update whose new price crosses a threshold alerts the user, like a scheduler check.
+    """
+    url_to_create = f"https://example.com/product_{uuid.uuid4()}"
+    mocker.patch("app.routes.product.scrape_product_data", side_effect=[
+        {"name": "Lamp", "url": url_to_create, "current_price": 120.0, "image_url": None},
+        {"name": "Lamp", "url": url_to_create, "current_price": 90.0, "image_url": None},
+    ])
+
+    product_data = {"product": {"url": url_to_create, "source": "Test"}, "lower_threshold": 100.0, "notify": True}
+    product_id = authenticated_client.post('/products/create-product', json=product_data).json()['id']
+    update_response = authenticated_client.put(f'/products/{product_id}', json={"url": url_to_create, "source": "Test"})
+    assert update_response.status_code == 200, update_response.text
+
+    alerts = test_db.query(Alert).filter(Alert.product_id == product_id).all()
+    assert [(alert.alert_type, alert.target_price) for alert in alerts] == [(AlertType.DROP, 100.0)]
+    notification = test_db.query(Notification).filter(Notification.user_id == alerts[0].user_id).one()
+    assert notification.message == "Price drop: 'Lamp' is now $90.00, at or below your alert price."
+
 def test_delete_product(authenticated_client, mock_scraper):
     """
     Test the delete_product endpoint.
@@ -173,3 +200,90 @@ def test_delete_product(authenticated_client, mock_scraper):
 
     get_response = authenticated_client.get(f'/products/{product_id}')
     assert get_response.status_code == 404
+
+def test_create_product_created_during_scrape(authenticated_client, test_db, mocker):
+    """
+    Test that a product created by another request while this one was scraping is reused instead of failing on the unique URL.
+    """
+    url_to_create = f"https://example.com/product_{uuid.uuid4()}"
+
+    async def scrape_while_another_request_inserts(url, source):
+        test_db.add(Product(name="Created Elsewhere", url=url, current_price=10.0, source="Test"))
+        test_db.flush()
+        return {"name": "Mocked Product Name", "url": url, "current_price": 123.45, "image_url": None}
+
+    mocker.patch("app.routes.product.scrape_product_data", side_effect=scrape_while_another_request_inserts)
+
+    response = authenticated_client.post('/products/create-product', json={"product": {"url": url_to_create, "source": "Test"}})
+    assert response.status_code == 201, response.text
+    assert response.json()['name'] == "Created Elsewhere"
+    assert test_db.query(Product).filter(Product.url == url_to_create).count() == 1
+
+def test_create_product_tracking_url_reuses_product(authenticated_client, mock_scraper, test_db):
+    """
+    Test that URLs of the same listing that only differ in tracking parameters map to one product.
+    """
+    item_id = str(uuid.uuid4().int)[:12]
+    first_url = f"https://www.ebay.com/itm/{item_id}?_trkparms=amclksrc%3DITM&_trksid=p4375194"
+    second_url = f"https://www.ebay.com/itm/{item_id}?_trksid=p2047675.m570"
+
+    response1 = authenticated_client.post('/products/create-product', json={"product": {"url": first_url, "source": "eBay"}})
+    assert response1.status_code == 201, response1.text
+    response2 = authenticated_client.post('/products/create-product', json={"product": {"url": second_url, "source": "eBay"}})
+    assert response2.status_code == 201, response2.text
+
+    assert response1.json()['id'] == response2.json()['id']
+    assert mock_scraper.call_count == 1
+    assert test_db.query(Product).filter(Product.canonical_key == f"ebay:ebay.com:{item_id}").count() == 1
+
+def test_create_product_source_circuit_open(authenticated_client, mocker):
+    """
+    Test that a product whose source is being skipped by the circuit breaker gets a 503 with Retry-After.
+    """
+    mocker.patch("app.routes.product.scrape_product_data", side_effect=CircuitOpenError("Amazon", 42))
+
+    product_data = {"product": {"url": f"https://www.amazon.com/dp/B0{uuid.uuid4().hex[:8].upper()}", "source": "Amazon"}}
+    response = authenticated_client.post('/products/create-product', json=product_data)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "42"
+
+def test_price_history_expands_unchanged_runs(authenticated_client, mocker):
+    """
+    Test that repeated checks at the same price are stored as one row and returned as its first and last check.
+    """
+    url_to_create = f"https://example.com/product_{uuid.uuid4()}"
+    scraped_data = {"name": "Steady", "url": url_to_create, "current_price": 50.0, "image_url": None}
+    mocker.patch("app.routes.product.scrape_product_data", return_value=scraped_data)
+
+    create_response = authenticated_client.post('/products/create-product', json={"product": {"url": url_to_create, "source": "Test"}})
+    product_id = create_response.json()['id']
+    for _ in range(2):
+        update_response = authenticated_client.put(f'/products/{product_id}', json={"url": url_to_create, "source": "Test"})
+        assert update_response.status_code == 200, update_response.text
+
+    collapsed = authenticated_client.get('/price-history/search-price-history',
+                                         params={"product_id": product_id, "expand": False}).json()
+    assert len(collapsed) == 1
+    assert collapsed[0]["lastSeenAt"] is not None
+
+    points = authenticated_client.get('/price-history/search-price-history', params={"product_id": product_id}).json()
+    assert [point["price"] for point in points] == [50.0, 50.0]
+    assert points[0]["timestamp"] > points[1]["timestamp"]
+
+def test_refresh_product_queues_one_user_job(authenticated_client, mock_scraper):
+    """
+    Test that refreshing a product queues a high priority scrape job, and that refreshing again reuses it.
+    """
+    product_data = {"product": {"url": f"https://example.com/product_{uuid.uuid4()}", "source": "Test"}}
+    product_id = authenticated_client.post('/products/create-product', json=product_data).json()['id']
+
+    first = authenticated_client.post(f'/products/{product_id}/refresh')
+    assert first.status_code == 202, first.text
+    assert first.json()["status"] == "pending"
+    assert first.json()["priority"] == 0
+
+    second = authenticated_client.post(f'/products/{product_id}/refresh')
+    assert second.json()["id"] == first.json()["id"]
+    assert authenticated_client.get(f'/products/{product_id}/refresh').json()["id"] == first.json()["id"]
+
+    assert authenticated_client.post('/products/999999/refresh').status_code == 404
@@ -0,0 +1,29 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Product
+
+@pytest.fixture
+def session_factory():
+    """A private in-memory database, so the job's own sessions and commits don't touch the shared test database."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with factory() as db:
+        db.add_all(
+            Product(name=f"Lamp {i}", url=f"https://www.amazon.com/dp/B0SCHED{i:03d}", current_price=1.0, source="Amazon")
+            for i in range(25)
+        )
+        db.commit()
+    yield factory
+    engine.dispose()
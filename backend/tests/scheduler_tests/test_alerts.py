@@ -0,0 +1,44 @@
+import uuid
+
+from sqlalchemy import select
+
+from app.models import Alert, AlertType, Notification, Product, User, UserProduct
+from app.scheduler.products import ProductSnapshot, ScrapeOutcome, write_batch
+
+def _user(test_db) -> User:
+    user = User(email=f"alerts_{uuid.uuid4()}@example.com", password="hashed")
+    test_db.add(user)
+    test_db.flush()
+    return user
+
+def _scrape(test_db, product: Product, price: float):
+    snapshot = ProductSnapshot(product.id, product.name, product.url, product.source, None, None, None)
+    write_batch(test_db, [ScrapeOutcome(snapshot, {"name": product.name, "current_price": price})])
+    test_db.expire_all()
+
+def test_threshold_crossings_create_one_alert_each(test_db):
+    product = Product(name="Kettle", url=f"https://example.com/kettle-{uuid.uuid4()}", current_price=50.0, source="Test")
+    drop_user, rise_user, muted_user = _user(test_db), _user(test_db), _user(test_db)
+    test_db.add(product)
+    test_db.flush()
+    test_db.add_all([
+        UserProduct(product_id=product.id, user_id=drop_user.id, notify=True, lower_threshold=40.0),
+        UserProduct(product_id=product.id, user_id=rise_user.id, notify=True, upper_threshold=60.0),
+        UserProduct(product_id=product.id, user_id=muted_user.id, notify=False, lower_threshold=40.0),
+    ])
+    test_db.flush()
+
+    # Falls through the lower threshold, then stays below it
+    _scrape(test_db, product, 39.0)
+    _scrape(test_db, product, 35.0)
+    # Climbs through the upper threshold
+    _scrape(test_db, product, 65.0)
+
+    alerts = test_db.execute(
+        select(Alert.user_id, Alert.alert_type, Alert.target_price).where(Alert.product_id == product.id).order_by(Alert.id)
+    ).all()
+    assert alerts == [(drop_user.id, AlertType.DROP, 40.0), (rise_user.id, AlertType.INCREASE, 60.0)]
+
+    messages = test_db.scalars(select(Notification.message).where(Notification.user_id == drop_user.id)).all()
+    assert messages == ["Price drop: 'Kettle' is now $39.00, at or below your alert price."]
+    assert test_db.scalars(select(Notification).where(Notification.user_id == muted_user.id)).all() == []
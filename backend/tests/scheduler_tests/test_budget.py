@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import func, select, update
+
+from app.models import Product, SchedulerRun, User, UserProduct
+from app.scheduler import products as scheduler
+from app.scheduler.budget import RunBudget
+from app.scheduler.cadence import prioritize_products
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from tests.scheduler_tests.test_products_job import _amazon_page
+
+def _make_urgent(session_factory):
+    """Product 20 has a watcher whose threshold is close to its price, product 10 is a day overdue."""
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        user = User(email=f"budget_{uuid.uuid4()}@example.com", password="hashed")
+        db.add(user)
+        db.flush()
+        db.add(UserProduct(product_id=20, user_id=user.id, notify=True, lower_threshold=0.98))
+        db.execute(update(Product).where(Product.id == 10).values(next_check_at=now - timedelta(days=1)))
+        db.commit()
+
+def _run_job(session_factory, budget, delay=0.0, **kwargs):
+    async def handler(request):
+        await asyncio.sleep(delay)
+        return httpx.Response(200, text=_amazon_page(100 + int(request.url.path[-3:])))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await scheduler.update_product_prices_job(session_factory=session_factory, client=client,
+                                                             budget=budget, **kwargs)
+
+    return asyncio.run(run())
+
+def test_urgent_products_come_first(session_factory):
+    _make_urgent(session_factory)
+    with session_factory() as db:
+        ranked = prioritize_products(db, datetime.now(timezone.utc))
+
+    assert ranked[:2] == [20, 10]
+    assert len(ranked) == 25
+
+def test_request_budget_checks_urgent_products_and_carries_the_rest_over(session_factory):
+    _make_urgent(session_factory)
+    stats = _run_job(session_factory, RunBudget(max_requests=10, reserve=0.1), workers=1, batch_size=5)
+
+    # 10% of the budget is kept in reserve
+    assert stats["processed"] == 9
+    assert stats["carried_over"] == 16
+    with session_factory() as db:
+        run = db.get(SchedulerRun, stats["run_id"])
+        assert (run.stop_reason, run.carried_over, run.succeeded) == ("max_requests", 16, 9)
+        checked = set(db.scalars(select(Product.id).where(Product.next_check_at > datetime.now(timezone.utc))))
+        assert {10, 20} <= checked
+        assert db.scalar(select(func.count()).where(Product.lease_owner.isnot(None))) == 0
+
+    # The next run picks up what was carried over
+    stats = _run_job(session_factory, RunBudget(), workers=4, batch_size=10)
+    assert stats["processed"] == 16
+
+def test_deadline_stops_the_run_and_commits_what_finished(session_factory):
+    stats = _run_job(session_factory, RunBudget(deadline_seconds=0.5, reserve=0.2), delay=0.1, workers=2, batch_size=5)
+
+    assert 0 < stats["updated"] < 25
+    assert stats["carried_over"] == 25 - stats["updated"]
+    with session_factory() as db:
+        run = db.get(SchedulerRun, stats["run_id"])
+        assert run.stop_reason == "deadline"
+        assert db.scalar(select(func.count()).where(Product.lease_owner.isnot(None))) == 0
+
+def test_products_released_for_retry_are_carried_over(session_factory, monkeypatch):
+    """
+    Test that the products of a batch that failed to commit count as carried over: they were released
+    with their next check pushed back, so they are no longer due but the run still didn't check them.
+    """
+    write_batch = scheduler.write_batch
+    calls = []
+
+    def fail_first_batch(db, batch, worker_id=None):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("deadlock detected")
+        return write_batch(db, batch, worker_id)
+
+    monkeypatch.setattr(scheduler, "write_batch", fail_first_batch)
+    stats = _run_job(session_factory, RunBudget(max_requests=10, reserve=0.1), workers=1, batch_size=5)
+
+    # 16 never dispatched, 5 released when their batch failed
+    assert (stats["processed"], stats["updated"]) == (9, 4)
+    assert stats["carried_over"] == 21
+
+    # A run the budget didn't stop carries over only what it released
+    calls.clear()
+    stats = _run_job(session_factory, RunBudget(), workers=1, batch_size=5)
+    assert stats["processed"] == 16
+    assert stats["carried_over"] == 5
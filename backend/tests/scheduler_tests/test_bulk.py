@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.models import Product, PriceHistory
+from app.scheduler.bulk import (
+    greatest, least, insert_price_histories, record_price_histories, extend_price_histories,
+    price_update_row, update_prices,
+)
+from app.scheduler.products import ProductSnapshot, ScrapeOutcome, write_batch
+
+def test_least_greatest_compile_per_dialect():
+    expression = least(Product.lowest_price, 5.0)
+    assert str(expression.compile(dialect=postgresql.dialect())).startswith("LEAST(")
+    assert str(expression.compile(dialect=sqlite.dialect())).startswith("MIN(")
+    assert str(greatest(Product.highest_price, 5.0).compile(dialect=sqlite.dialect())).startswith("MAX(")
+
+def test_bulk_update_keeps_price_range(test_db):
+    now = datetime.now(timezone.utc)
+    low = Product(name="Low", url="https://example.com/bulk-low", current_price=10.0, lowest_price=10.0,
+                  highest_price=20.0, source="Test")
+    new = Product(name="New", url="https://example.com/bulk-new", current_price=10.0, source="Test")
+    test_db.add_all([low, new])
+    test_db.flush()
+
+    update_prices(test_db, [
+        price_update_row(low.id, {"name": "Low", "current_price": 5.0}, now),
+        price_update_row(new.id, {"name": "New name", "current_price": 30.0, "etag": '"v2"'}, now),
+    ])
+    insert_price_histories(test_db, [
+        {"product_id": low.id, "price": 5.0, "timestamp": now},
+        {"product_id": new.id, "price": 30.0, "timestamp": now},
+    ])
+    test_db.expire_all()
+
+    assert (low.current_price, low.lowest_price, low.highest_price) == (5.0, 5.0, 20.0)
+    assert (new.name, new.lowest_price, new.highest_price, new.etag) == ("New name", 30.0, 30.0, '"v2"')
+    prices = test_db.scalars(select(PriceHistory.price).where(PriceHistory.product_id.in_([low.id, new.id])))
+    assert sorted(prices) == [5.0, 30.0]
+
+def test_change_only_recording_extends_runs(test_db):
+    product = Product(name="Runs", url="https://example.com/bulk-runs", current_price=10.0, source="Test")
+    test_db.add(product)
+    test_db.flush()
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for day, price in enumerate([10.0, 10.0, 12.0, 12.0, 10.0]):
+        record_price_histories(test_db, [{"product_id": product.id, "price": price, "timestamp": start + timedelta(days=day)}])
+    extend_price_histories(test_db, [product.id], start + timedelta(days=5))
+    test_db.expire_all()
+
+    histories = test_db.scalars(
+        select(PriceHistory).where(PriceHistory.product_id == product.id).order_by(PriceHistory.id)
+    ).all()
+    assert [(h.price, h.timestamp.day, h.last_seen_at and h.last_seen_at.day) for h in histories] == [
+        (10.0, 1, 2), (12.0, 3, 4), (10.0, 5, 6),
+    ]
+
+def test_every_check_recording_inserts_each_price(test_db):
+    product = Product(name="Checks", url="https://example.com/bulk-checks", current_price=10.0, source="Test")
+    test_db.add(product)
+    test_db.flush()
+    now = datetime.now(timezone.utc)
+
+    for _ in range(3):
+        record_price_histories(test_db, [{"product_id": product.id, "price": 10.0, "timestamp": now}], mode="every_check")
+
+    assert test_db.scalar(select(func.count()).where(PriceHistory.product_id == product.id)) == 3
+
+def test_results_are_only_written_under_the_writers_lease(test_db):
+    """
+    Test that a worker whose lease was taken over by another worker neither writes its result nor
+    releases the new holder's claim, and counts the product as lost.
+    """
+    now = datetime.now(timezone.utc)
+    kept = Product(name="Kept", url="https://example.com/bulk-kept", current_price=10.0, source="Test",
+                   lease_owner="worker-a", lease_expires_at=now + timedelta(minutes=5))
+    taken = Product(name="Taken", url="https://example.com/bulk-taken", current_price=10.0, source="Test",
+                    lease_owner="worker-b", lease_expires_at=now + timedelta(minutes=5))
+    test_db.add_all([kept, taken])
+    test_db.flush()
+
+    results = write_batch(test_db, [
+        ScrapeOutcome(ProductSnapshot(product.id, product.name, product.url, product.source, None, None, None),
+                      {"name": product.name, "current_price": 12.0})
+        for product in (kept, taken)
+    ], worker_id="worker-a")
+    test_db.expire_all()
+
+    assert (results["updated"], results["lost"]) == (1, 1)
+    assert (kept.current_price, kept.lease_owner) == (12.0, None)
+    assert (taken.current_price, taken.lease_owner) == (10.0, "worker-b")
+    assert test_db.scalar(select(func.count()).select_from(PriceHistory).where(PriceHistory.product_id == taken.id)) == 0
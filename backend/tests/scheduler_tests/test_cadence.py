@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app.models import Product, PriceHistory, User, UserProduct
+from app.scheduler.cadence import CadencePolicy, schedule_next_checks
+
+POLICY = CadencePolicy(base_minutes=360, min_minutes=30, max_minutes=2880, volatility_window_days=7,
+                       near_threshold=0.05, jitter=0)
+
+def test_interval_follows_volatility_and_demand():
+    base = POLICY.interval(changes=0, watchers=1, near_threshold=False)
+    assert base == timedelta(hours=6)
+    # Nobody watching: checked half as often
+    assert POLICY.interval(changes=0, watchers=0, near_threshold=False) == timedelta(hours=12)
+    # One change a day halves the interval, as do two watchers
+    assert POLICY.interval(changes=7, watchers=1, near_threshold=False) == timedelta(hours=3)
+    assert POLICY.interval(changes=0, watchers=2, near_threshold=False) == timedelta(hours=3)
+    # Clamped to the minimum
+    assert POLICY.interval(changes=70, watchers=8, near_threshold=True) == timedelta(minutes=30)
+
+def test_first_checks_are_spread_over_the_base_interval():
+    intervals = [POLICY.first_interval() for _ in range(200)]
+    assert all(timedelta(0) <= interval <= timedelta(hours=6) for interval in intervals)
+    # Not bunched at one time: both halves of the interval are used
+    assert any(interval < timedelta(hours=3) for interval in intervals)
+    assert any(interval > timedelta(hours=3) for interval in intervals)
+
+def test_near_threshold_products_are_checked_sooner(test_db):
+    now = datetime.now(timezone.utc)
+    user = User(email=f"cadence_{uuid.uuid4()}@example.com", password="hashed")
+    near = Product(name="Near", url=f"https://example.com/near-{uuid.uuid4()}", current_price=100.0, source="Test")
+    stable = Product(name="Stable", url=f"https://example.com/stable-{uuid.uuid4()}", current_price=100.0, source="Test")
+    test_db.add_all([user, near, stable])
+    test_db.flush()
+    test_db.add_all([
+        UserProduct(product_id=near.id, user_id=user.id, notify=True, lower_threshold=97.0),
+        UserProduct(product_id=stable.id, user_id=user.id, notify=True, lower_threshold=50.0),
+        PriceHistory(product_id=near.id, price=100.0, timestamp=now),
+        PriceHistory(product_id=stable.id, price=100.0, timestamp=now),
+    ])
+    test_db.flush()
+
+    schedule_next_checks(test_db, [near.id, stable.id], now, POLICY)
+    test_db.expire_all()
+
+    # One recent change each, one watcher each; only Near is within 5% of its threshold
+    assert near.next_check_at.replace(tzinfo=timezone.utc) - now.replace(tzinfo=timezone.utc) < timedelta(hours=2)
+    assert stable.next_check_at.replace(tzinfo=timezone.utc) - now.replace(tzinfo=timezone.utc) > timedelta(hours=5)
+
+def test_repeated_prices_are_not_changes_when_every_check_is_recorded(test_db):
+    now = datetime.now(timezone.utc)
+    steady = Product(name="Steady", url=f"https://example.com/steady-{uuid.uuid4()}", current_price=100.0, source="Test")
+    moving = Product(name="Moving", url=f"https://example.com/moving-{uuid.uuid4()}", current_price=100.0, source="Test")
+    test_db.add_all([steady, moving])
+    test_db.flush()
+    for hours, price in enumerate([100.0, 100.0, 100.0, 100.0]):
+        test_db.add(PriceHistory(product_id=steady.id, price=price, timestamp=now - timedelta(hours=10 - hours)))
+    for hours, price in enumerate([100.0, 90.0, 100.0, 90.0]):
+        test_db.add(PriceHistory(product_id=moving.id, price=price, timestamp=now - timedelta(hours=10 - hours)))
+    test_db.flush()
+
+    schedule_next_checks(test_db, [steady.id, moving.id], now, POLICY, mode="every_check")
+    test_db.expire_all()
+
+    # Nobody watches either: 12h, divided by 1 + 3/7 for Moving's three changes
+    assert steady.next_check_at.replace(tzinfo=timezone.utc) - now.replace(tzinfo=timezone.utc) == timedelta(hours=12)
+    assert moving.next_check_at.replace(tzinfo=timezone.utc) - now.replace(tzinfo=timezone.utc) == timedelta(hours=12) / (1 + 3 / 7)
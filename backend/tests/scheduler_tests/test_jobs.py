@@ -0,0 +1,184 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import select, update
+
+from app.database import Base
+from app.models import Product, ScrapeJob, ScrapeJobStatus
+from app.scheduler.jobs import JobWorker
+from app.scheduler.leases import claim_products
+from app.scheduler.queue import (
+    PRIORITY_BACKGROUND, PRIORITY_RETRY, PRIORITY_USER, claim_jobs, enqueue_due_products, enqueue_job, enqueue_jobs,
+    fail_job,
+)
+from app.scraper import product_scraper
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from tests.scheduler_tests.test_leases import _session_factory
+from tests.scheduler_tests.test_products_job import _amazon_page
+
+LEASE = timedelta(minutes=5)
+
+def test_enqueue_deduplicates_and_promotes_pending_jobs(session_factory):
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        background = enqueue_job(db, 1, now, PRIORITY_BACKGROUND)
+        enqueue_jobs(db, [1, 2, 2, 3], now, PRIORITY_RETRY)
+        user = enqueue_job(db, 1, now, PRIORITY_USER)
+        db.commit()
+
+        assert user.id == background.id
+        jobs = db.execute(select(ScrapeJob.product_id, ScrapeJob.priority).order_by(ScrapeJob.product_id)).all()
+        assert jobs == [(1, PRIORITY_USER), (2, PRIORITY_RETRY), (3, PRIORITY_RETRY)]
+
+def test_due_products_are_queued_in_the_background_lane(session_factory):
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        # Products 21-25 aren't due yet, product 2 already has a user refresh queued
+        db.execute(update(Product).where(Product.id > 20).values(next_check_at=now + timedelta(hours=1)))
+        enqueue_job(db, 2, now, PRIORITY_USER)
+        db.commit()
+
+    assert enqueue_due_products(session_factory, now, page_size=7) == 20
+    with session_factory() as db:
+        jobs = dict(db.execute(select(ScrapeJob.product_id, ScrapeJob.priority)).all())
+    assert sorted(jobs) == list(range(1, 21))
+    assert jobs[2] == PRIORITY_USER
+    assert {priority for product_id, priority in jobs.items() if product_id != 2} == {PRIORITY_BACKGROUND}
+
+    # The user's refresh is claimed before the background checks
+    assert [job.product_id for job in claim_jobs(session_factory, "worker-a", 2, now, LEASE)] == [2, 1]
+
+def test_claim_order_backoff_and_dead_letter(session_factory):
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        enqueue_jobs(db, [5, 6], now, PRIORITY_BACKGROUND)
+        enqueue_job(db, 7, now, PRIORITY_USER, max_attempts=2)
+        db.commit()
+
+    assert [job.product_id for job in claim_jobs(session_factory, "worker-a", 2, now, LEASE)] == [7, 5]
+    assert [job.product_id for job in claim_jobs(session_factory, "worker-b", 5, now, LEASE)] == [6]
+
+    # Product 7's first attempt fails: back in the queue after the backoff
+    with session_factory() as db:
+        job = db.scalar(select(ScrapeJob).where(ScrapeJob.product_id == 7))
+        assert fail_job(db, job, "worker-a", "Failed to scrape", now) == ScrapeJobStatus.PENDING.value
+        db.commit()
+    assert claim_jobs(session_factory, "worker-a", 5, now, LEASE) == []
+    retry_at = now + timedelta(minutes=2)
+    [job] = claim_jobs(session_factory, "worker-a", 5, retry_at, LEASE)
+    assert (job.product_id, job.attempts) == (7, 2)
+
+    # Its second and last attempt is lost with its worker: dead-lettered once the lease expires
+    later = retry_at + LEASE + timedelta(seconds=1)
+    assert [job.product_id for job in claim_jobs(session_factory, "worker-c", 5, later, LEASE)] == [5, 6]
+    with session_factory() as db:
+        job = db.scalar(select(ScrapeJob).where(ScrapeJob.product_id == 7))
+        assert (job.status, job.last_error) == (ScrapeJobStatus.DEAD.value, "Worker lease expired")
+
+def test_job_worker_refreshes_products_and_retries_failures(session_factory, monkeypatch):
+    async def no_backoff(breaker, seconds):
+        pass
+
+    # Skip the scraper's own waits between attempts at the failing page
+    monkeypatch.setattr(product_scraper, "_backoff", no_backoff)
+
+    def handler(request):
+        number = int(request.url.path[-3:])
+        if number == 4:
+            return httpx.Response(404)
+        return httpx.Response(200, text=_amazon_page(100 + number))
+
+    with session_factory() as db:
+        enqueue_jobs(db, [3, 5], datetime.now(timezone.utc), PRIORITY_USER)
+        db.commit()
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await JobWorker(session_factory=session_factory, client=client, concurrency=2).run(drain=True)
+
+    stats = asyncio.run(run())
+    assert stats["done"] == 1
+    assert stats["pending"] == 1
+    with session_factory() as db:
+        assert db.scalar(select(Product.current_price).where(Product.id == 3)) == 102.0
+        failed = db.scalar(select(ScrapeJob).where(ScrapeJob.product_id == 5))
+        assert (failed.status, failed.attempts, failed.last_error) == (ScrapeJobStatus.PENDING.value, 1, "Failed to scrape")
+
+def test_job_worker_leaves_claimed_products_alone(session_factory):
+    """
+    Test that a job whose product a scheduler is checking is put back without scraping the product
+    or using up an attempt.
+    """
+    now = datetime.now(timezone.utc)
+    claim_products(session_factory, "scheduler-a", 1, now, LEASE, product_ids=[3])
+    with session_factory() as db:
+        enqueue_job(db, 3, now, PRIORITY_USER)
+        db.commit()
+
+    requests = []
+
+    def handler(request):
+        requests.append(request.url)
+        return httpx.Response(200, text=_amazon_page(100))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await JobWorker(session_factory=session_factory, client=client).run_once()
+
+    assert asyncio.run(run()) == 1
+    assert requests == []
+    with session_factory() as db:
+        job = db.scalar(select(ScrapeJob).where(ScrapeJob.product_id == 3))
+        assert (job.status, job.attempts) == (ScrapeJobStatus.PENDING.value, 0)
+        assert db.scalar(select(Product.lease_owner).where(Product.id == 3)) == "scheduler-a"
+
+def test_job_and_product_leases_are_renewed_during_slow_scrapes(tmp_path):
+    """
+    Test that a scrape outlasting the lease keeps its job and product: another worker trying to claim
+    them throughout never gets either, and the product is scraped once.
+    """
+    # A database file, so the competitor below and the worker's database thread each get their own connection
+    session_factory = _session_factory(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(session_factory.kw["bind"])
+    with session_factory() as db:
+        db.add(Product(name="Lamp", url="https://www.amazon.com/dp/B0SLOW0003", current_price=1.0, source="Amazon"))
+        db.flush()
+        enqueue_job(db, 1, datetime.now(timezone.utc), PRIORITY_USER)
+        db.commit()
+
+    requests = []
+
+    async def handler(request):
+        requests.append(request.url)
+        await asyncio.sleep(1)
+        return httpx.Response(200, text=_amazon_page(103))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+    taken = []
+
+    async def compete(task):
+        while not task.done():
+            await asyncio.sleep(0.05)
+            now = datetime.now(timezone.utc)
+            taken.extend(job.id for job in claim_jobs(session_factory, "worker-b", 5, now, LEASE))
+            taken.extend(row.id for row in claim_products(session_factory, "worker-b", 5, now, LEASE,
+                                                          due_before=now))
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            worker = JobWorker(session_factory=session_factory, client=client, lease_seconds=0.3)
+            task = asyncio.ensure_future(worker.run(drain=True))
+            await compete(task)
+            return await task
+
+    stats = asyncio.run(run())
+    assert taken == []
+    assert len(requests) == 1
+    assert stats["done"] == 1
+    with session_factory() as db:
+        assert db.scalar(select(Product.current_price)) == 103.0
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import httpx
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, enable_sqlite_wal
+from app.models import Product, PriceHistory
+from app.scheduler.leases import claim_products
+from tests.scheduler_tests.test_products_job import _amazon_page
+
+PRODUCTS = 60
+
+def _session_factory(database_url: str) -> sessionmaker:
+    engine = create_engine(database_url)
+    enable_sqlite_wal(engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def _run_worker(database_url: str) -> dict:
+    """One scheduler process. Imported by the spawned interpreter, so it must stay at module level."""
+    from app.scheduler.products import update_product_prices_job
+    from app.scraper.client import ScraperClient
+    from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+    def handler(request):
+        time.sleep(0.005)
+        return httpx.Response(200, text=_amazon_page(100 + int(request.url.path[-3:])))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await update_product_prices_job(session_factory=_session_factory(database_url), client=client,
+                                                   workers=4, batch_size=5, read_batch_size=5)
+
+    return asyncio.run(run())
+
+def test_parallel_processes_check_each_product_once(tmp_path):
+    """
+    Test that several scheduler processes sharing one SQLite (WAL) database split the catalog between
+    them through their leases instead of each checking every product.
+    """
+    database_url = f"sqlite:///{tmp_path / 'scheduler.db'}"
+    factory = _session_factory(database_url)
+    Base.metadata.create_all(factory.kw["bind"])
+    with factory() as db:
+        db.add_all(
+            Product(name=f"Lamp {i}", url=f"https://www.amazon.com/dp/B0LEASE{i:03d}", current_price=1.0, source="Amazon")
+            for i in range(PRODUCTS)
+        )
+        db.commit()
+
+    with ProcessPoolExecutor(3, mp_context=multiprocessing.get_context("spawn")) as pool:
+        runs = list(pool.map(_run_worker, [database_url] * 3))
+
+    assert sum(run.get("processed", 0) for run in runs) == PRODUCTS
+    assert sum(run.get("updated", 0) for run in runs) == PRODUCTS
+    with factory() as db:
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == PRODUCTS
+        assert db.scalar(select(func.count()).where(Product.lease_owner.isnot(None))) == 0
+
+def test_leases_are_renewed_while_products_wait(tmp_path):
+    """
+    Test that a run whose products take longer to get through than its lease keeps them: another
+    worker trying to claim them throughout the run never gets one, and each is checked once.
+    """
+    from app.scheduler.products import update_product_prices_job
+    from app.scraper.client import ScraperClient
+    from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+    # A database file, so the competitor below and the job's database thread each get their own connection
+    session_factory = _session_factory(f"sqlite:///{tmp_path / 'scheduler.db'}")
+    Base.metadata.create_all(session_factory.kw["bind"])
+    with session_factory() as db:
+        db.add_all(
+            Product(name=f"Lamp {i}", url=f"https://www.amazon.com/dp/B0LEASE{i:03d}", current_price=1.0, source="Amazon")
+            for i in range(25)
+        )
+        db.commit()
+
+    async def handler(request):
+        await asyncio.sleep(0.04)
+        return httpx.Response(200, text=_amazon_page(100 + int(request.url.path[-3:])))
+
+    # One product at a time, about a second for all 25: well past the 0.3s lease
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=1)})
+    taken = []
+
+    async def compete(job):
+        while not job.done():
+            await asyncio.sleep(0.05)
+            now = datetime.now(timezone.utc)
+            taken.extend(row.id for row in claim_products(session_factory, "worker-b", 25, now, timedelta(minutes=5),
+                                                          due_before=now))
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            job = asyncio.ensure_future(update_product_prices_job(session_factory=session_factory, client=client,
+                                                                  workers=1, batch_size=5, lease_seconds=0.3))
+            await compete(job)
+            return await job
+
+    stats = asyncio.run(run())
+    assert taken == []
+    assert stats["updated"] == 25
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 25
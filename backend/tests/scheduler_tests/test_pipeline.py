@@ -0,0 +1,132 @@
+import asyncio
+from collections import Counter
+
+import httpx
+
+from app.scheduler.outcomes import ProductSnapshot
+from app.scheduler.pipeline import LatencyHistogram, ScrapePipeline
+from app.scraper import product_scraper
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from tests.scheduler_tests.test_products_job import _amazon_page
+
+CAPTCHA = "<html><body><h4>Enter the characters you see below</h4><p>Type the CAPTCHA</p></body></html>"
+
+def _snapshot(number: int) -> ProductSnapshot:
+    return ProductSnapshot(number, f"Lamp {number}", f"https://www.amazon.com/dp/B0PIPE{number:04d}", "Amazon",
+                           None, None, None)
+
+def _run_pipeline(products, handler, **kwargs):
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            pipeline = ScrapePipeline(client, delay=0, report_seconds=0, **kwargs)
+            queue, results = asyncio.Queue(), asyncio.Queue()
+            for product in products:
+                queue.put_nowait(product)
+            queue.put_nowait(None)
+            await pipeline.run(queue, results)
+            return [results.get_nowait() for _ in range(results.qsize())], pipeline.stats()
+
+    return asyncio.run(run())
+
+def test_pipeline_retries_through_the_stages_and_reports_them():
+    """
+    Test that every product leaves the pipeline exactly once: a CAPTCHA found by the parse and
+    validate stages sends the product back to the fetch stage, a page that keeps failing gives up
+    after its retries, and a removed page isn't retried at all.
+    """
+    requests = Counter()
+
+    def handler(request):
+        number = int(request.url.path[-4:])
+        requests[number] += 1
+        if number == 3 and requests[number] == 1:
+            return httpx.Response(200, text=CAPTCHA)
+        if number == 7:
+            return httpx.Response(500)
+        if number == 9:
+            return httpx.Response(404)
+        return httpx.Response(200, text=_amazon_page(100 + number))
+
+    outcomes, stats = _run_pipeline([_snapshot(number) for number in range(1, 21)], handler,
+                                    fetch_workers=4, queue_size=2, retries=3)
+
+    by_id = {outcome.product.id: outcome for outcome in outcomes}
+    assert len(outcomes) == len(by_id) == 20
+    assert by_id[3].scraped_data["current_price"] == 103.0
+    assert by_id[7].scraped_data is None and by_id[9].scraped_data is None
+    assert (requests[3], requests[7], requests[9]) == (2, 3, 1)
+
+    # 18 pages fetched once, product 3 twice and product 7 three times
+    assert stats["fetch"]["processed"] == 23
+    assert stats["parse"]["processed"] == stats["validate"]["processed"] == 19
+    assert stats["retried"] == 3
+    assert stats["in_flight"] == 0
+    assert stats["fetch"]["max_queue_depth"] <= 2
+    assert stats["fetch"]["width"] == 4 and stats["parse"]["width"] == 1
+
+def test_latency_histogram_percentiles():
+    histogram = LatencyHistogram()
+    for milliseconds in range(1, 1001):
+        histogram.record(milliseconds / 1000)
+
+    # Buckets are 5% wide
+    assert 0.5 <= histogram.percentile(0.5) <= 0.5 * 1.05
+    assert 0.99 <= histogram.percentile(0.99) <= 1.0
+    assert histogram.percentile(1.0) == histogram.max_seconds == 1.0
+
+def test_pipeline_shares_scrapes_with_routes():
+    """
+    Test that the pipeline and scrape_product_data share one scrape of the same URL whichever
+    starts first, and that the pipeline reuses a result that is still cached.
+    """
+    requests = Counter()
+
+    async def handler(request):
+        number = int(request.url.path[-4:])
+        requests[number] += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, text=_amazon_page(100 + number))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            pipeline = ScrapePipeline(client, delay=0, report_seconds=0)
+            queue, results = asyncio.Queue(), asyncio.Queue()
+            # Product 2's route scrape starts first
+            route_first = asyncio.ensure_future(product_scraper.scrape_product_data(_snapshot(2).url, "Amazon", client=client))
+            await asyncio.sleep(0.01)
+            for number in (1, 2):
+                queue.put_nowait(_snapshot(number))
+            running = asyncio.ensure_future(pipeline.run(queue, results))
+            await asyncio.sleep(0.01)
+            # Product 1's pipeline scrape is in flight by now
+            pipeline_first = await product_scraper.scrape_product_data(_snapshot(1).url, "Amazon", client=client)
+            # Product 1 again, once its result is cached
+            queue.put_nowait(_snapshot(1))
+            queue.put_nowait(None)
+            await running
+            outcomes = [results.get_nowait() for _ in range(results.qsize())]
+            return outcomes, await route_first, pipeline_first, pipeline.stats()
+
+    outcomes, route_first, pipeline_first, stats = asyncio.run(run())
+
+    assert requests == {1: 1, 2: 1}
+    assert route_first["current_price"] == 102.0 and pipeline_first["current_price"] == 101.0
+    assert sorted(outcome.scraped_data["current_price"] for outcome in outcomes) == [101.0, 101.0, 102.0]
+    assert stats["coalesced"] == 2
+    assert stats["fetch"]["processed"] == 1
+
+def test_pipeline_parses_pages_while_they_stream(monkeypatch):
+    def parse_whole_page(source, body, encoding=None):
+        raise AssertionError("the page should have been parsed while it streamed")
+
+    monkeypatch.setattr(product_scraper, "parse_page", parse_whole_page)
+    outcomes, stats = _run_pipeline([_snapshot(number) for number in range(1, 4)],
+                                    lambda request: httpx.Response(200, text=_amazon_page(100)), streaming=True)
+
+    assert [outcome.scraped_data["current_price"] for outcome in outcomes] == [100.0] * 3
+    assert stats["parse"]["processed"] == 3
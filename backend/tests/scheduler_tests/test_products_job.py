@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import httpx
+from sqlalchemy import func, select
+
+from app.models import Product, PriceHistory, ScrapeJob, ScrapeJobStatus
+from app.scheduler import products as scheduler
+from app.scheduler.queue import PRIORITY_RETRY
+from app.scraper import product_scraper
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+def _amazon_page(price: int) -> str:
+    return (f'<html><body><span id="productTitle">Lamp {price}</span><span class="a-price-whole">{price}.</span>'
+            f'<span class="a-price-fraction">00</span></body></html>')
+
+def _run_job(session_factory, **kwargs):
+    def handler(request):
+        # Each product's price is its number in the ASIN + 100
+        return httpx.Response(200, text=_amazon_page(100 + int(request.url.path[-3:])))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await scheduler.update_product_prices_job(session_factory=session_factory, client=client, **kwargs)
+
+    return asyncio.run(run())
+
+def test_job_updates_every_product_in_batches(session_factory):
+    stats = _run_job(session_factory, workers=4, batch_size=10, read_batch_size=7)
+
+    assert stats["processed"] == 25
+    assert stats["updated"] == 25
+    assert stats["batches_committed"] == 3
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 25
+        product = db.scalar(select(Product).where(Product.url.endswith("B0SCHED007")))
+        assert product.current_price == 107.0
+        assert product.highest_price == 107.0
+        assert product.lowest_price == 107.0
+
+def test_checked_products_are_not_due_again(session_factory):
+    _run_job(session_factory, workers=4, batch_size=10)
+    stats = _run_job(session_factory, workers=4, batch_size=10)
+
+    assert stats.get("processed", 0) == 0
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).where(Product.next_check_at.is_(None))) == 0
+
+def test_unchanged_prices_extend_their_history_row(session_factory):
+    _run_job(session_factory, workers=4, batch_size=10)
+    _run_job(session_factory, workers=4, batch_size=10, due_only=False)
+
+    with session_factory() as db:
+        histories = db.scalars(select(PriceHistory)).all()
+        assert len(histories) == 25
+        assert all(history.last_seen_at is not None for history in histories)
+
+def test_failed_batch_only_loses_itself(session_factory, monkeypatch):
+    """
+    Test that a batch whose write fails is rolled back alone while the other batches stay committed.
+    """
+    record_price_histories = scheduler.record_price_histories
+
+    def insert_failing_for_one_product(db, rows):
+        # B0SCHED013 is the 14th product
+        if any(row["product_id"] == 14 for row in rows):
+            raise RuntimeError("database went away")
+        record_price_histories(db, rows)
+
+    monkeypatch.setattr(scheduler, "record_price_histories", insert_failing_for_one_product)
+    stats = _run_job(session_factory, workers=1, batch_size=5)
+
+    assert stats["batches_failed"] == 1
+    assert stats["lost"] == 5
+    assert stats["updated"] == 20
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 20
+
+def test_failed_scrapes_are_retried_by_jobs_only(session_factory, monkeypatch):
+    """
+    Test that a product whose scrape failed gets a retry job and keeps its regular cadence, instead of
+    also being pushed back for the scheduler to retry.
+    """
+    async def no_backoff(breaker, seconds):
+        pass
+
+    monkeypatch.setattr(product_scraper, "_backoff", no_backoff)
+
+    def handler(request):
+        number = int(request.url.path[-3:])
+        if number == 4:
+            return httpx.Response(503)
+        return httpx.Response(200, text=_amazon_page(100 + number))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await scheduler.update_product_prices_job(session_factory=session_factory, client=client,
+                                                             workers=4, batch_size=10)
+
+    stats = asyncio.run(run())
+    assert (stats["failed"], stats["updated"]) == (1, 24)
+    with session_factory() as db:
+        job = db.scalar(select(ScrapeJob))
+        assert (job.product_id, job.priority, job.status) == (5, PRIORITY_RETRY, ScrapeJobStatus.PENDING.value)
+        product = db.get(Product, 5)
+        assert product.lease_owner is None
+        # Scheduled like a checked product (hours away), not in SCHEDULER_RETRY_MINUTES
+        checked_at = product.last_checked.replace(tzinfo=None)
+        assert product.next_check_at.replace(tzinfo=None) - checked_at > timedelta(hours=1)
+
+def test_batch_writes_do_not_block_the_event_loop(session_factory, monkeypatch):
+    """
+    Test that the event loop keeps running while a batch is being written, as writes happen on the
+    job's database thread.
+    """
+    write_batch = scheduler.write_batch
+
+    def slow_write_batch(db, batch, worker_id=None):
+        time.sleep(0.2)
+        return write_batch(db, batch, worker_id)
+
+    monkeypatch.setattr(scheduler, "write_batch", slow_write_batch)
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+    gaps = []
+
+    async def tick(job):
+        last = time.monotonic()
+        while not job.done():
+            await asyncio.sleep(0.01)
+            gaps.append(time.monotonic() - last)
+            last = time.monotonic()
+
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, text=_amazon_page(100)))
+        async with ScraperClient(proxy_url=None, transport=transport, rate_limiter=limiter) as client:
+            job = asyncio.ensure_future(scheduler.update_product_prices_job(session_factory=session_factory,
+                                                                            client=client, workers=4, batch_size=5))
+            await tick(job)
+            return await job
+
+    stats = asyncio.run(run())
+    assert stats["batches_committed"] == 5
+    # Five 0.2s writes, and the loop never stalled for one of them
+    assert max(gaps) < 0.15
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from sqlalchemy import func, select, update
+
+from app.models import Product, PriceHistory
+from app.scheduler.leases import claim_products
+from app.scheduler.rolling import RollingScheduler
+from app.scraper.client import ScraperClient
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from tests.scheduler_tests.test_products_job import _amazon_page
+
+def test_claim_takes_most_overdue_unleased_products(session_factory):
+    now = datetime.now(timezone.utc)
+    with session_factory() as db:
+        db.execute(update(Product).values(next_check_at=now + timedelta(hours=1)))
+        db.execute(update(Product).where(Product.id.in_([3, 5])).values(next_check_at=now - timedelta(minutes=5)))
+        db.execute(update(Product).where(Product.id == 9).values(next_check_at=now - timedelta(hours=1)))
+        db.commit()
+
+    def claim(limit, worker="worker-a", at=now):
+        rows = claim_products(session_factory, worker, limit, at, timedelta(minutes=15), due_before=at, by_due=True)
+        return [row.id for row in rows]
+
+    assert claim(2) == [9, 3]
+    assert claim(10, worker="worker-b") == [5]
+    assert claim(10, worker="worker-b") == []
+    # Claims of a worker that never reported back expire
+    assert claim(10, worker="worker-b", at=now + timedelta(minutes=16)) == [9, 3, 5]
+
+def test_rolling_scheduler_checks_due_products_at_its_rate(session_factory):
+    def handler(request):
+        return httpx.Response(200, text=_amazon_page(100 + int(request.url.path[-3:])))
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10000, max_in_flight=50)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            scheduler = RollingScheduler(session_factory=session_factory, client=client, workers=4, batch_size=10,
+                                         rate=200, slice_size=8, jitter=0, flush_seconds=0.05, report_seconds=60)
+            task = asyncio.ensure_future(scheduler.run())
+            # 25 products at 200 checks/s take about an eighth of a second
+            await asyncio.sleep(0.6)
+            scheduler.stop()
+            return await task
+
+    status = asyncio.run(run())
+    assert status["dispatched"] == 25
+    assert status["updated"] == 25
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 25
+        assert db.scalar(select(func.count()).where(Product.next_check_at.is_(None))) == 0
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+
+from app.models import Product, PriceHistory, SchedulerRun, SchedulerRunStatus
+from app.scheduler import products as scheduler
+from app.scheduler.runs import RunLedger, resume_run, start_run
+from tests.scheduler_tests.test_products_job import _run_job
+
+class Killed(BaseException):
+    """Stands in for the process dying: not an Exception, so the job can't catch it and close the run."""
+
+def test_ledger_cursor_waits_for_earlier_products():
+    ledger = RunLedger(1, "worker-a")
+    for product_id in (3, 5, 8, 9):
+        ledger.dispatched(product_id)
+
+    ledger.handled([5, 9])
+    assert ledger.cursor == 0
+    ledger.handled([3])
+    assert ledger.cursor == 5
+    ledger.handled([8])
+    assert ledger.cursor == 9
+
+def test_completed_run_is_recorded(session_factory):
+    stats = _run_job(session_factory, workers=4, batch_size=10)
+
+    with session_factory() as db:
+        run = db.get(SchedulerRun, stats["run_id"])
+        assert run.status == SchedulerRunStatus.COMPLETED.value
+        assert (run.cursor, run.succeeded, run.failed, run.skipped, run.deleted) == (25, 25, 0, 0, 0)
+        assert run.finished_at is not None
+
+def test_resume_continues_from_the_last_committed_batch(session_factory, monkeypatch):
+    """
+    Test that a run killed in the middle of its third batch is resumed after the two batches it
+    committed, taking back the products it still held, and only checks each product once.
+    """
+    write_batch = scheduler.write_batch
+    calls = []
+
+    def crash_on_third_batch(db, batch, worker_id=None):
+        calls.append(len(batch))
+        if len(calls) == 3:
+            raise Killed
+        return write_batch(db, batch, worker_id)
+
+    monkeypatch.setattr(scheduler, "write_batch", crash_on_third_batch)
+    with pytest.raises(Killed):
+        _run_job(session_factory, workers=1, batch_size=5, read_batch_size=5)
+
+    with session_factory() as db:
+        run = db.scalar(select(SchedulerRun))
+        assert (run.status, run.cursor, run.succeeded) == (SchedulerRunStatus.RUNNING.value, 10, 10)
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 10
+        # The dead process stopped recording its heartbeat a while ago
+        run.heartbeat_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+        db.refresh(run)
+
+    monkeypatch.setattr(scheduler, "write_batch", write_batch)
+    stats = _run_job(session_factory, workers=1, batch_size=5, read_batch_size=5, resume=True)
+
+    assert stats["run_id"] == run.id
+    assert stats["processed"] == 15
+    with session_factory() as db:
+        run = db.get(SchedulerRun, run.id)
+        assert (run.status, run.cursor, run.succeeded, run.resumed) == (SchedulerRunStatus.COMPLETED.value, 25, 25, 1)
+        assert db.scalar(select(func.count()).select_from(PriceHistory)) == 25
+        assert db.scalar(select(func.count()).where(Product.lease_owner.isnot(None))) == 0
+
+def test_failed_batch_holds_the_cursor_back_for_resume(session_factory, monkeypatch):
+    """
+    Test that a batch that fails to commit doesn't move the cursor, even when later batches commit,
+    so resuming the run after a crash checks its products again instead of skipping them.
+    """
+    write_batch = scheduler.write_batch
+    calls = []
+
+    def fail_second_then_crash(db, batch, worker_id=None):
+        calls.append(len(batch))
+        if len(calls) == 2:
+            raise RuntimeError("deadlock detected")
+        if len(calls) == 4:
+            raise Killed
+        return write_batch(db, batch, worker_id)
+
+    monkeypatch.setattr(scheduler, "write_batch", fail_second_then_crash)
+    with pytest.raises(Killed):
+        _run_job(session_factory, workers=1, batch_size=5, read_batch_size=5, due_only=False)
+
+    with session_factory() as db:
+        run = db.scalar(select(SchedulerRun))
+        # The third batch committed, but the cursor stays before the second one
+        assert (run.cursor, run.succeeded, run.failed) == (5, 10, 5)
+        assert db.scalar(select(func.count(func.distinct(PriceHistory.product_id)))) == 10
+        run.heartbeat_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+
+    monkeypatch.setattr(scheduler, "write_batch", write_batch)
+    stats = _run_job(session_factory, workers=1, batch_size=5, read_batch_size=5, due_only=False, resume=True)
+
+    assert stats["processed"] == 20
+    with session_factory() as db:
+        assert db.scalar(select(SchedulerRun.cursor)) == 25
+        # Every product was checked, the second batch's included
+        assert db.scalar(select(func.count(func.distinct(PriceHistory.product_id)))) == 25
+
+def test_resume_without_unfinished_run_starts_a_new_one(session_factory):
+    first = _run_job(session_factory, workers=4, batch_size=10)
+    second = _run_job(session_factory, workers=4, batch_size=10, resume=True, due_only=False)
+
+    assert second["run_id"] != first["run_id"]
+    assert second["processed"] == 25
+
+def test_resume_leaves_a_live_run_alone(session_factory):
+    """
+    Test that --resume only takes over a run nobody is running: not one whose heartbeat is fresh,
+    but one that was interrupted or whose heartbeat went stale.
+    """
+    live = start_run(session_factory, "worker-a", None)
+    assert resume_run(session_factory) is None
+
+    with session_factory() as db:
+        db.get(SchedulerRun, live.run_id).heartbeat_at = datetime.now(timezone.utc) - timedelta(hours=1)
+        db.commit()
+    resumed = resume_run(session_factory)
+    assert (resumed.run_id, resumed.worker_id) == (live.run_id, "worker-a")
+    assert resumed.owner != live.owner
+    # The new owner's heartbeat is fresh, so nobody else takes it over in turn
+    assert resume_run(session_factory) is None
+
+    with session_factory() as db:
+        run = db.get(SchedulerRun, live.run_id)
+        assert (run.owner, run.resumed) == (resumed.owner, 1)
+        run.status = SchedulerRunStatus.INTERRUPTED.value
+        db.commit()
+    assert resume_run(session_factory).run_id == live.run_id
+
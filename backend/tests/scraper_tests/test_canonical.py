@@ -0,0 +1,32 @@
+from app.scraper.canonical import canonical_key, canonical_url, strip_tracking
+
+EBAY_TRACKING_URL = (
+    "https://www.ebay.com/itm/116650489031?_trkparms=amclksrc%3DITM%26aid%3D777008"
+    "&_trksid=p4375194.c102175.m166538&_trkparms=parentrq%3Ac07cab051980a671559126cdfff83a9a"
+)
+
+
+def test_ebay_urls_share_item_key_per_site():
+    assert canonical_key(EBAY_TRACKING_URL, "eBay") == "ebay:ebay.com:116650489031"
+    assert canonical_key("https://ebay.com/itm/Nike-Air-Max/116650489031?hash=item1", "eBay") == "ebay:ebay.com:116650489031"
+    # The same item on another eBay site is priced in another currency
+    assert canonical_key("https://www.ebay.co.uk/itm/116650489031") == "ebay:ebay.co.uk:116650489031"
+    assert canonical_url(EBAY_TRACKING_URL, "eBay") == "https://www.ebay.com/itm/116650489031"
+
+
+def test_amazon_urls_share_asin_key_per_marketplace():
+    key = canonical_key("https://www.amazon.com/Some-Lamp/dp/B0LAMP1234/ref=sr_1_1?keywords=lamp&qid=1", "Amazon")
+    assert key == "amazon:amazon.com:B0LAMP1234"
+    assert canonical_key("https://amazon.com/gp/product/b0lamp1234?psc=1") == key
+    assert canonical_key("https://www.amazon.de/dp/B0LAMP1234") != key
+    assert canonical_url("https://www.amazon.com/Some-Lamp/dp/B0LAMP1234/ref=sr_1_1", "Amazon") == "https://www.amazon.com/dp/B0LAMP1234"
+
+
+def test_other_urls_drop_tracking_parameters():
+    assert strip_tracking("HTTPS://Shop.Example.com/item/?b=2&utm_source=mail&a=1#reviews") == "https://shop.example.com/item?a=1&b=2"
+    assert canonical_key("https://example.com/p?id=1&gclid=abc") == canonical_key("https://example.com/p?id=1")
+    assert canonical_key("https://example.com/p?id=1") != canonical_key("https://example.com/p?id=2")
+
+
+def test_listing_without_item_id_falls_back_to_url_key():
+    assert canonical_key("https://www.ebay.com/sch/i.html?_nkw=lamp", "eBay").startswith("url:")
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.scraper.circuit_breaker import CircuitBreaker, CircuitBreakerConfig, CircuitBreakers, CircuitOpenError, CircuitState
+from app.scraper.client import ScraperClient
+from app.scraper.product_scraper import scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+CONFIG = CircuitBreakerConfig(failure_rate=0.5, window=10, min_calls=4, open_seconds=0.05,
+                              max_open_seconds=1, half_open_calls=2)
+
+def test_circuit_opens_at_failure_rate():
+    breaker = CircuitBreaker("Amazon", CONFIG)
+    for _ in range(2):
+        breaker.check()
+        breaker.record_success()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.stats()["rejected"] == 1
+
+def test_half_open_probes_close_or_reopen_the_circuit():
+    breaker = CircuitBreaker("Amazon", CONFIG)
+    for _ in range(4):
+        breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+    time.sleep(0.06)
+    breaker.check()
+    assert breaker.state is CircuitState.HALF_OPEN
+    breaker.record_failure()
+    # A failed probe reopens the circuit for twice as long
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.retry_after > 0.05
+
+    time.sleep(0.11)
+    breaker.check()
+    breaker.check()
+    # Only half_open_calls probes are let through at once
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+
+def test_late_successes_of_older_attempts_are_not_probes():
+    breaker = CircuitBreaker("Amazon", CONFIG)
+    # Two attempts are still in flight when failures open the circuit
+    breaker.check()
+    breaker.check()
+    for _ in range(4):
+        breaker.check()
+        breaker.record_failure()
+    assert breaker.state is CircuitState.OPEN
+
+    time.sleep(0.06)
+    breaker.check()
+    assert breaker.state is CircuitState.HALF_OPEN
+    # The older attempts succeed, but only the probe's own outcome can close the circuit
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state is CircuitState.HALF_OPEN
+    breaker.check()
+    breaker.record_success()
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+
+def test_open_circuit_stops_retries_without_requests():
+    """
+    Test that once CAPTCHAs open the circuit, scrapes fail fast instead of sleeping through their retries.
+    """
+    requests = 0
+
+    def handler(request):
+        nonlocal requests
+        requests += 1
+        return httpx.Response(200, text="<html><body>Enter the characters you see below (captcha)</body></html>")
+
+    breakers = CircuitBreakers(CircuitBreakerConfig(failure_rate=0.5, window=10, min_calls=3, open_seconds=60,
+                                                    max_open_seconds=60, half_open_calls=1))
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=1000, max_in_flight=10)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler),
+                                 rate_limiter=limiter, circuit_breakers=breakers) as client:
+            with pytest.raises(CircuitOpenError):
+                await scrape_product_data("https://www.amazon.com/dp/B0CAPTCHA1", "Amazon", retries=5, delay=0,
+                                          client=client)
+            start = time.monotonic()
+            with pytest.raises(CircuitOpenError):
+                await scrape_product_data("https://www.amazon.com/dp/B0CAPTCHA2", "Amazon", delay=10, client=client)
+            return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    assert requests == 3
+    assert elapsed < 0.5
+    assert breakers.stats()["Amazon"]["state"] == "open"
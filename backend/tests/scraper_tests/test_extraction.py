@@ -0,0 +1,76 @@
+from app.scraper.extraction import SourceSpec, FieldSpec, compile_spec, has_class, is_captcha_page, parse_html
+from app.scraper.product_scraper import _parse_amazon, _parse_ebay
+
+def test_parse_amazon():
+    """
+    Test that the compiled Amazon spec reads title, price and the high resolution image.
+    """
+    tree = parse_html(b"""
+        <html><body>
+            <span id="productTitle">  Coffee <b>Grinder</b>  </span>
+            <span class="a-price aok-align-center"><span class="a-price-whole">1,024<span class="a-price-decimal">.</span></span><span class="a-price-fraction">05</span></span>
+            <span class="a-price-whole">5.</span><span class="a-price-fraction">00</span>
+            <img id="landingImage" data-old-hires="https://images.example.com/hires.jpg" src="https://images.example.com/lores.jpg">
+        </body></html>
+    """)
+    assert _parse_amazon(tree) == {
+        "name": "CoffeeGrinder",
+        "current_price": 1024.05,
+        "image_url": "https://images.example.com/hires.jpg",
+    }
+
+def test_parse_amazon_missing_price():
+    tree = parse_html(b'<html><body><span id="productTitle">Only a title</span></body></html>')
+    assert _parse_amazon(tree) == {"name": "Only a title", "current_price": None, "image_url": None}
+
+def test_parse_ebay_fallback_selectors():
+    """
+    Test that the eBay spec falls back to the older layout selectors.
+    """
+    tree = parse_html(b"""
+        <html><body>
+            <h1 class="d-item-title">Vintage Camera</h1>
+            <div class="x-price-primary"><span class="ux-textspans">US $2,345.67/ea</span></div>
+            <img id="vi-img-main-img" src="https://i.ebayimg.com/camera.jpg">
+        </body></html>
+    """)
+    assert _parse_ebay(tree) == {
+        "name": "Vintage Camera",
+        "current_price": 2345.67,
+        "image_url": "https://i.ebayimg.com/camera.jpg",
+    }
+
+def test_parse_ebay_statuses():
+    sold_out = parse_html(b'<div class="d-quantity__availability-text">Last one <span>SOLD</span></div>')
+    ended = parse_html(b'<div id="ended_msg">This listing has ended.</div><h1 class="d-item-title">Old</h1>')
+    assert _parse_ebay(sold_out)["name"] == "ITEM SOLD OUT"
+    assert _parse_ebay(ended)["name"] == "LISTING ENDED"
+
+def test_parse_ebay_unparseable_price():
+    tree = parse_html(b'<h1 class="d-item-title">Thing</h1><div class="x-price-primary"><span class="ux-textspans">Best offer</span></div>')
+    assert _parse_ebay(tree) is None
+
+def test_captcha_detection():
+    assert is_captcha_page(parse_html(b"<html><body><h4>Enter the characters you see below</h4><form action='/errors/validateCaptcha'></form><p>Type the CAPTCHA</p></body></html>"))
+    assert not is_captcha_page(parse_html(b"<html><body><span id='productTitle'>Mug</span></body></html>"))
+    # The CAPTCHA form alone is enough, the word only appearing in scripts or styles is not
+    assert is_captcha_page(parse_html(b"<html><body><form action='/errors/validateCaptcha'><input id='captchacharacters'></form></body></html>"))
+    assert not is_captcha_page(parse_html(b"<html><head><script>var captcha = false;</script><style>.captcha{}</style></head><body>Mug</body></html>"))
+    assert not is_captcha_page(None)
+
+def test_new_source_as_data():
+    """
+    Test that a new source can be described as a spec without writing a parser function.
+    """
+    spec = SourceSpec(
+        name="Shop",
+        fields={
+            "name": FieldSpec(xpaths=[f"//h1[{has_class('title')}]"]),
+            "current_price": FieldSpec(xpaths=["//*[@itemprop='price']"], attrs=("content",), post=float),
+            "image_url": FieldSpec(xpaths=["//img[@id='main']"], attrs=("src",)),
+        },
+        build=lambda values: values,
+    )
+    parser = compile_spec(spec)
+    tree = parse_html(b'<h1 class="title big">Lamp</h1><meta itemprop="price" content="12.50"><img id="main" src="/lamp.png">')
+    assert parser(tree) == {"name": "Lamp", "current_price": 12.5, "image_url": "/lamp.png"}
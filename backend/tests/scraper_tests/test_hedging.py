@@ -0,0 +1,73 @@
+import asyncio
+import time
+
+import httpx
+
+from app.scraper.client import ScraperClient
+from app.scraper.hedging import HedgePolicy, LatencyTracker
+
+def _slow_first_request_transport(slow_seconds: float):
+    """The first request stalls before sending headers, later ones answer right away."""
+    calls = []
+
+    async def handler(request):
+        calls.append(request.headers["User-Agent"])
+        if len(calls) == 1:
+            await asyncio.sleep(slow_seconds)
+        return httpx.Response(200, text=f"answer {len(calls)}")
+
+    return httpx.MockTransport(handler), calls
+
+def _policy(budget: float) -> HedgePolicy:
+    policy = HedgePolicy(percentile=95, budget=budget, min_samples=5, min_delay=0.05, max_burst=budget)
+    for _ in range(10):
+        policy.record_latency("www.amazon.com", 0.01)
+    return policy
+
+def test_latency_percentile():
+    tracker = LatencyTracker()
+    for value in range(1, 101):
+        tracker.record(value / 100)
+    assert tracker.percentile(95) == 0.95
+    assert tracker.percentile(50) == 0.5
+
+def test_slow_request_is_hedged():
+    """
+    Test that a request stalled past the host's hedge delay is raced against a second one with other headers.
+    """
+    transport, calls = _slow_first_request_transport(slow_seconds=5)
+    policy = _policy(budget=1)
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=transport, hedge_policy=policy) as client:
+            start = time.monotonic()
+            response = await client.get("https://www.amazon.com/dp/B0HEDGE001",
+                                        headers={"User-Agent": "first"}, hedge_headers={"User-Agent": "second"})
+            return response, time.monotonic() - start
+
+    response, elapsed = asyncio.run(run())
+    assert response.text == "answer 2"
+    assert elapsed < 1
+    assert calls == ["first", "second"]
+    assert policy.stats()["hedges"] == 1
+    assert policy.stats()["hedge_wins"] == 1
+
+def test_hedges_are_limited_by_budget():
+    """
+    Test that no hedge is sent once the hedge budget is spent, so the slow request is simply awaited.
+    """
+    transport, calls = _slow_first_request_transport(slow_seconds=0.3)
+    policy = _policy(budget=0.5)
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=transport, hedge_policy=policy) as client:
+            return await client.get("https://www.amazon.com/dp/B0HEDGE002")
+
+    response = asyncio.run(run())
+    assert response.text == "answer 1"
+    assert len(calls) == 1
+    assert policy.stats()["denied"] == 1
+
+def test_unknown_hosts_are_not_hedged():
+    policy = HedgePolicy(min_samples=5)
+    assert policy.delay_for("www.ebay.com") is None
@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.scraper.client import ScraperClient
+from app.scraper.parse_executor import ParseExecutor
+from app.scraper.product_scraper import parse_page, scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+AMAZON_PAGE = b"""
+<html><body>
+    <span id="productTitle">Desk Lamp</span>
+    <span class="a-price-whole">24.</span><span class="a-price-fraction">99</span>
+    <img id="landingImage" src="https://images.example.com/lamp.jpg">
+</body></html>
+"""
+
+def _slow_square(value):
+    time.sleep(0.02)
+    return value * value
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_parse_page_in_executor(kind):
+    """
+    Test that pages parse the same way inside thread and process pools.
+    """
+    async def run():
+        async with ParseExecutor(kind=kind, max_workers=2) as executor:
+            return await asyncio.gather(
+                executor.run(parse_page, "Amazon", AMAZON_PAGE, "utf-8"),
+                executor.run(parse_page, "Amazon", b"<html><body>Type the characters (captcha)</body></html>", None),
+            )
+
+    page_result, captcha_result = asyncio.run(run())
+    assert page_result == (False, {"name": "Desk Lamp", "current_price": 24.99, "image_url": "https://images.example.com/lamp.jpg",
+                                     "extraction_path": "selectors"})
+    assert captcha_result == (True, None)
+
+def test_executor_backpressure():
+    """
+    Test that no more than max_pending jobs are handed to the pool at once.
+    """
+    peak = 0
+
+    async def run():
+        async with ParseExecutor(kind="thread", max_workers=2, max_pending=3) as executor:
+            async def one(value):
+                result = await executor.run(_slow_square, value)
+                return result
+
+            async def watch():
+                nonlocal peak
+                while executor.completed < 10:
+                    peak = max(peak, executor.pending)
+                    await asyncio.sleep(0.001)
+
+            results, _ = await asyncio.gather(asyncio.gather(*(one(i) for i in range(10))), watch())
+            return results
+
+    assert asyncio.run(run()) == [i * i for i in range(10)]
+    assert peak == 3
+
+def test_scrape_with_parse_executor():
+    """
+    Test that scrape_product_data hands the body to the executor and returns the parsed data.
+    """
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=AMAZON_PAGE))
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=100, max_in_flight=5)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=transport, rate_limiter=limiter) as client, \
+                ParseExecutor(kind="thread", max_workers=1) as executor:
+            data = await scrape_product_data("https://www.amazon.com/dp/B0LAMP", "Amazon", client=client,
+                                             parse_executor=executor, streaming=True)
+            return data, executor.completed
+
+    data, completed = asyncio.run(run())
+    assert data["current_price"] == 24.99
+    assert completed == 1
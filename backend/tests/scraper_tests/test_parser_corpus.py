@@ -0,0 +1,10 @@
+from benchmarks.bench_parsers import check_corpus, load_corpus
+
+
+def test_parsers_match_corpus():
+    """
+    Test that every page in the benchmark corpus still parses to the result recorded in its manifest.
+    """
+    pages = load_corpus()
+    assert {page["kind"] for page in pages} >= {"normal", "captcha", "sold-out", "ended", "layout-variant"}
+    assert check_corpus(pages) == []
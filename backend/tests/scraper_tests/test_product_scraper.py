@@ -0,0 +1,167 @@
+import asyncio
+
+import httpx
+
+from app.scraper.client import ScraperClient
+from app.scraper.product_scraper import _fetch_page, scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+EBAY_PAGE = """
+<html><body>
+    <h1 class="x-item-title__mainTitle"><span>Running Shoe</span></h1>
+    <div class="x-price-primary" data-testid="x-price-primary"><span class="ux-textspans">US $1,059.99</span></div>
+    <div class="ux-image-carousel-item active"><img data-zoom-src="https://i.ebayimg.com/zoom.jpg" src="https://i.ebayimg.com/small.jpg"></div>
+</body></html>
+"""
+
+def _scrape(handler, url="https://www.ebay.com/itm/1", source="eBay", **kwargs):
+    """Runs scrape_product_data against a mock transport with a limiter that never waits."""
+    limiter = RateLimiter({source: SourceLimitConfig(requests_per_second=1000, max_in_flight=10)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await scrape_product_data(url, source, delay=0, client=client, **kwargs)
+
+    return asyncio.run(run())
+
+def test_scrape_returns_validators():
+    """
+    Test that a successful scrape returns the ETag, Last-Modified and body digest.
+    """
+    headers = {"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2025 10:00:00 GMT"}
+    data = _scrape(lambda request: httpx.Response(200, text=EBAY_PAGE, headers=headers))
+
+    assert data["name"] == "Running Shoe"
+    assert data["current_price"] == 1059.99
+    assert data["image_url"] == "https://i.ebayimg.com/zoom.jpg"
+    assert data["etag"] == '"v1"'
+    assert data["last_modified"] == "Wed, 01 Oct 2025 10:00:00 GMT"
+    assert len(data["content_digest"]) == 64
+    assert "not_modified" not in data
+
+def test_conditional_request_not_modified():
+    """
+    Test that stored validators are sent and a 304 short-circuits parsing.
+    """
+    sent_headers = {}
+
+    def handler(request):
+        sent_headers.update(request.headers)
+        return httpx.Response(304)
+
+    data = _scrape(handler, etag='"v1"', last_modified="Wed, 01 Oct 2025 10:00:00 GMT", content_digest="abc")
+
+    assert sent_headers["if-none-match"] == '"v1"'
+    assert sent_headers["if-modified-since"] == "Wed, 01 Oct 2025 10:00:00 GMT"
+    assert data == {
+        "url": "https://www.ebay.com/itm/1",
+        "not_modified": True,
+        "etag": '"v1"',
+        "last_modified": "Wed, 01 Oct 2025 10:00:00 GMT",
+        "content_digest": "abc",
+    }
+
+def test_identical_body_digest_skips_parsing(mocker):
+    """
+    Test that a page whose body hash matches the stored digest is not parsed again.
+    """
+    first = _scrape(lambda request: httpx.Response(200, text=EBAY_PAGE))
+    parser = mocker.patch.dict("app.scraper.product_scraper.PARSERS", {"eBay": mocker.Mock()})
+
+    second = _scrape(lambda request: httpx.Response(200, text=EBAY_PAGE), content_digest=first["content_digest"])
+
+    assert second["not_modified"] is True
+    assert second["content_digest"] == first["content_digest"]
+    parser["eBay"].assert_not_called()
+
+AMAZON_PAGE = """
+<html><body>
+    <span id="productTitle">Streaming Headphones</span>
+    <span class="a-price-whole">89.</span><span class="a-price-fraction">50</span>
+    <img id="landingImage" src="https://images.example.com/headphones.jpg">
+"""
+
+FILLER = b"<div>" + b"x" * 16_000 + b"</div>"
+
+def _chunked_response(*chunks: bytes):
+    """A streamed response that records how many of its chunks were actually sent."""
+    sent = []
+
+    async def body():
+        for chunk in chunks:
+            sent.append(len(chunk))
+            yield chunk
+
+    return sent, lambda request: httpx.Response(200, content=body())
+
+def test_streaming_stops_after_needed_elements():
+    """
+    Test that streaming mode stops downloading once title, price and image are parsed.
+    """
+    sent, handler = _chunked_response(AMAZON_PAGE.encode(), *[FILLER] * 50, b"</body></html>")
+    data = _scrape(handler, url="https://www.amazon.com/dp/B0STREAM", source="Amazon", streaming=True)
+
+    assert data["name"] == "Streaming Headphones"
+    assert data["current_price"] == 89.50
+    assert data["image_url"] == "https://images.example.com/headphones.jpg"
+    assert len(sent) < 5
+
+def test_streaming_reads_until_ebay_availability():
+    """
+    Test that eBay pages keep streaming until the availability text is seen, so sold out listings are still detected.
+    """
+    head = EBAY_PAGE.replace("</body></html>", "").encode()
+    availability = b'<div class="d-quantity__availability-text">Out of Stock</div>'
+    sent, handler = _chunked_response(head, *[FILLER] * 5, availability, *[FILLER] * 50)
+    data = _scrape(handler, streaming=True)
+
+    assert data["name"] == "ITEM SOLD OUT"
+    assert len(sent) in (7, 8)
+
+def test_body_size_is_capped():
+    """
+    Test that at most max_body_bytes of the page are read.
+    """
+    page = AMAZON_PAGE.replace('id="landingImage"', 'id="otherImage"').encode()
+    sent, handler = _chunked_response(page, *[FILLER] * 50)
+    data = _scrape(handler, url="https://www.amazon.com/dp/B0STREAM", source="Amazon",
+                   streaming=True, max_body_bytes=40_000)
+
+    # The image is missing but the price was already read before the cap
+    assert data["current_price"] == 89.50
+    assert data["image_url"] is None
+    assert len(sent) <= 4
+
+def test_removed_listing_is_not_retried():
+    """
+    Test that a 404 or 410 ends the scrape at once, while a 408 is retried like a server error.
+    """
+    for status, expected_requests in ((404, 1), (410, 1), (408, 3)):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(status)
+
+        assert _scrape(handler) is None
+        assert len(requests) == expected_requests
+
+def test_streaming_stops_after_ebay_buy_box_and_keeps_no_body():
+    """
+    Test that an in-stock eBay page stops streaming once the availability block has been read,
+    and that the streamed bytes aren't kept next to the parsed document.
+    """
+    head = EBAY_PAGE.replace("</body></html>", "").encode()
+    availability = b'<div class="d-quantity__availability"><span class="ux-textspans">3 available</span></div>'
+    sent, handler = _chunked_response(head, availability, *[FILLER] * 50)
+    limiter = RateLimiter({"eBay": SourceLimitConfig(requests_per_second=1000, max_in_flight=10)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await _fetch_page(client, "https://www.ebay.com/itm/1", "eBay", {}, streaming=True,
+                                     max_body_bytes=10_000_000)
+
+    page = asyncio.run(run())
+    assert page.body == b""
+    assert page.tree is not None
+    assert len(sent) <= 3
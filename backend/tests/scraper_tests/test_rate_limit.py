@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import httpx
+
+from app.scraper.client import ScraperClient
+from app.scraper.product_scraper import scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+def test_token_bucket_paces_requests():
+    """
+    Test that requests beyond the burst are spread out at the configured rate.
+    """
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=20, max_in_flight=100)})
+
+    async def run():
+        async def one():
+            async with limiter.slot("Amazon"):
+                pass
+        start = time.monotonic()
+        await asyncio.gather(*(one() for _ in range(30)))
+        return time.monotonic() - start
+
+    # 20 tokens are available immediately, the remaining 10 need about half a second
+    elapsed = asyncio.run(run())
+    assert 0.4 < elapsed < 1.5
+
+def test_max_in_flight_is_enforced():
+    """
+    Test that no more than max_in_flight requests run at once for a source.
+    """
+    limiter = RateLimiter({"eBay": SourceLimitConfig(requests_per_second=1000, max_in_flight=3)})
+    peak = 0
+
+    async def run():
+        async def one():
+            nonlocal peak
+            async with limiter.slot("eBay"):
+                peak = max(peak, limiter.for_source("eBay").in_flight)
+                await asyncio.sleep(0.01)
+        await asyncio.gather(*(one() for _ in range(20)))
+
+    asyncio.run(run())
+    assert peak == 3
+
+def test_rate_adapts_to_blocking():
+    """
+    Test that blocked responses lower the rate and successes recover it up to the configured limit.
+    """
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=10, max_in_flight=5)})
+    source_limiter = limiter.for_source("Amazon")
+
+    limiter.record("Amazon", blocked=True)
+    assert source_limiter.rate == 5
+    # A second report arriving immediately does not halve the rate again
+    limiter.record("Amazon", blocked=True)
+    assert source_limiter.rate == 5
+
+    for _ in range(100):
+        limiter.record("Amazon", blocked=False)
+    assert source_limiter.rate == 10
+    assert source_limiter.stats()["blocked"] == 2
+
+def test_unconfigured_source_uses_default_limits():
+    limiter = RateLimiter({}, default=SourceLimitConfig(requests_per_second=3, max_in_flight=2))
+    assert limiter.for_source("Walmart").max_rate == 3
+
+def test_throttled_responses_are_retried_and_recorded():
+    """
+    Test that a 429 response is retried instead of raising, and lowers the source's rate.
+    """
+    responses = iter([
+        httpx.Response(429),
+        httpx.Response(200, text='<span class="x-item-title__mainTitle">Shoe</span>'
+                                 '<div class="x-price-primary"><span class="ux-textspans">US $59.99</span></div>'),
+    ])
+    transport = httpx.MockTransport(lambda request: next(responses))
+    limiter = RateLimiter({"eBay": SourceLimitConfig(requests_per_second=100, max_in_flight=5)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=transport, rate_limiter=limiter) as client:
+            return await scrape_product_data("https://www.ebay.com/itm/1", "eBay", delay=0, client=client)
+
+    data = asyncio.run(run())
+    assert data["current_price"] == 59.99
+    assert limiter.for_source("eBay").stats()["blocked"] == 1
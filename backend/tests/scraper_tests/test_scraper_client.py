@@ -0,0 +1,100 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from app.scraper.client import ScraperClient
+from app.scraper.product_scraper import scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+
+AMAZON_PAGE = """
+<html><body>
+    <span id="productTitle"> Test Amazon Product </span>
+    <span class="a-price-whole">1,299.</span><span class="a-price-fraction">99</span>
+    <img id="landingImage" data-old-hires="https://images.example.com/large.jpg" src="https://images.example.com/small.jpg">
+</body></html>
+"""
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = AMAZON_PAGE.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def local_server():
+    """Runs a small keep-alive HTTP server on a free local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_client_reuses_connections(local_server):
+    """
+    Sequential scrapes through one ScraperClient should share a single pooled connection.
+    """
+    async def run():
+        limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=100, max_in_flight=5)})
+        async with ScraperClient(proxy_url=None, rate_limiter=limiter) as client:
+            for i in range(5):
+                data = await scrape_product_data(f"{local_server}/dp/{i}", "Amazon", client=client)
+                assert data is not None
+            return client.pool_stats()
+
+    stats = asyncio.run(run())
+    assert stats["requests"] == 5
+    assert stats["connections_opened"] == 1
+    assert stats["open_connections"] == 1
+
+def test_scrape_product_data_with_client():
+    """
+    Test that scrape_product_data parses the page returned by the client's transport.
+    """
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, text=AMAZON_PAGE))
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=transport) as client:
+            return await scrape_product_data("https://www.amazon.com/dp/B000TEST", "Amazon", client=client)
+
+    data = asyncio.run(run())
+    assert data["name"] == "Test Amazon Product"
+    assert data["current_price"] == 1299.99
+    assert data["image_url"] == "https://images.example.com/large.jpg"
+    assert data["url"] == "https://www.amazon.com/dp/B000TEST"
+
+def test_per_host_connection_limit():
+    """
+    Test that no more than max_connections_per_host requests are in flight for one host.
+    """
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), max_connections_per_host=2) as client:
+            await asyncio.gather(*(client.get(f"https://www.ebay.com/itm/{i}") for i in range(10)))
+            return client.pool_stats()
+
+    stats = asyncio.run(run())
+    assert peak == 2
+    assert stats["requests"] == 10
+    assert stats["in_flight_by_host"] == {}
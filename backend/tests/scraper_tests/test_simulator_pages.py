@@ -0,0 +1,32 @@
+from app.scraper.product_scraper import parse_page
+from benchmarks.simulator import SimulatorConfig, amazon_captcha_page, amazon_page, ebay_page, ebay_status
+
+
+def test_simulator_pages_parse_like_the_real_sites():
+    """
+    Test that the load benchmark's simulated pages take the same parse paths as real ones,
+    so its numbers reflect real work.
+    """
+    is_captcha, data = parse_page("Amazon", amazon_page("B000000001", 1299.99, page_kb=1).encode())
+    assert not is_captcha
+    assert data["current_price"] == 1299.99
+    assert data["extraction_path"] == "selectors"
+
+    is_captcha, data = parse_page("eBay", ebay_page("123456789012", 45.5, page_kb=1).encode())
+    assert data["current_price"] == 45.5
+    assert data["extraction_path"] == "json-ld"
+
+    assert parse_page("eBay", ebay_page("123456789012", 45.5, "sold_out", page_kb=1).encode())[1]["name"] == "ITEM SOLD OUT"
+    assert parse_page("eBay", ebay_page("123456789012", 45.5, "ended", page_kb=1).encode())[1]["name"] == "LISTING ENDED"
+    assert parse_page("Amazon", amazon_captcha_page().encode())[0]
+
+
+def test_simulator_listing_status_is_stable():
+    """
+    Test that whether a listing is sold out or ended depends only on the seed and item id.
+    """
+    config = SimulatorConfig(sold_out_rate=0.3, ended_rate=0.3)
+    statuses = [ebay_status(config, str(item_id)) for item_id in range(1000)]
+    assert statuses == [ebay_status(config, str(item_id)) for item_id in range(1000)]
+    assert 200 < statuses.count("sold_out") < 400
+    assert 200 < statuses.count("ended") < 400
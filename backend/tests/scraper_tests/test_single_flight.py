@@ -0,0 +1,87 @@
+import asyncio
+
+import httpx
+
+from app.scraper.client import ScraperClient
+from app.scraper.product_scraper import scrape_product_data
+from app.scraper.rate_limit import RateLimiter, SourceLimitConfig
+from app.scraper.single_flight import SingleFlight
+
+def test_concurrent_calls_share_one_call():
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"name": "Shared"}
+
+    async def run():
+        flight = SingleFlight(ttl=0)
+        results = await asyncio.gather(*(flight.do("url", fetch) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(run())
+    assert calls == 1
+    assert results == [{"name": "Shared"}] * 5
+    # Every caller gets its own copy of the result
+    assert len({id(result) for result in results}) == 5
+    assert flight.stats()["coalesced"] == 4
+
+def test_results_are_cached_for_ttl_but_failures_are_not():
+    calls = []
+
+    async def fetch(value):
+        calls.append(value)
+        return value
+
+    async def run():
+        flight = SingleFlight(ttl=60)
+        first = await flight.do("ok", lambda: fetch({"name": "Cached"}))
+        second = await flight.do("ok", lambda: fetch({"name": "Fresh"}))
+        await flight.do("failed", lambda: fetch(None))
+        await flight.do("failed", lambda: fetch(None))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second == {"name": "Cached"}
+    assert calls == [{"name": "Cached"}, None, None]
+
+def test_cancelled_caller_does_not_cancel_shared_scrape():
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return {"name": "Survivor"}
+
+    async def run():
+        flight = SingleFlight(ttl=0)
+        leader = asyncio.ensure_future(flight.do("url", fetch))
+        follower = asyncio.ensure_future(flight.do("url", fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()) == {"name": "Survivor"}
+
+def test_scrape_product_data_coalesces_requests():
+    """
+    Test that concurrent scrapes of the same URL send a single request.
+    """
+    requests = 0
+
+    async def handler(request):
+        nonlocal requests
+        requests += 1
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, text='<meta property="og:title" content="Lamp"><meta property="og:price:amount" content="9.99">')
+
+    limiter = RateLimiter({"Amazon": SourceLimitConfig(requests_per_second=100, max_in_flight=10)})
+
+    async def run():
+        async with ScraperClient(proxy_url=None, transport=httpx.MockTransport(handler), rate_limiter=limiter) as client:
+            return await asyncio.gather(*(
+                scrape_product_data("https://www.amazon.com/dp/B0LAMP", "Amazon", client=client) for _ in range(10)
+            ))
+
+    results = asyncio.run(run())
+    assert requests == 1
+    assert all(result["current_price"] == 9.99 for result in results)
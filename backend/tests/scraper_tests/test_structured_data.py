@@ -0,0 +1,95 @@
+import json
+
+from app.scraper.product_scraper import parse_page
+from app.scraper.streaming import StreamExtractor
+from app.scraper.structured_data import extract_structured_data
+
+JSON_LD_PAGE = """
+<html><head>
+<script type="application/ld+json">{json}</script>
+</head><body><h1 class="x-item-title__mainTitle">Selector Title</h1></body></html>
+"""
+
+def _json_ld_page(data) -> bytes:
+    return JSON_LD_PAGE.replace("{json}", json.dumps(data)).encode()
+
+def test_json_ld_product():
+    body = _json_ld_page({
+        "@context": "https://schema.org",
+        "@graph": [
+            {"@type": "BreadcrumbList"},
+            {
+                "@type": "Product",
+                "name": "Trail Runner &amp; Co",
+                "image": ["https://i.example.com/1.jpg", "https://i.example.com/2.jpg"],
+                "offers": {"@type": "Offer", "price": "1,249.50", "availability": "https://schema.org/InStock"},
+            },
+        ],
+    })
+    assert extract_structured_data(body) == {
+        "name": "Trail Runner & Co",
+        "current_price": 1249.50,
+        "image_url": "https://i.example.com/1.jpg",
+        "extraction_path": "json-ld",
+    }
+
+def test_opengraph_and_microdata():
+    og_page = b"""<head>
+        <meta property="og:title" content="Desk Chair">
+        <meta property='og:image' content='https://i.example.com/chair.jpg'>
+        <meta property="og:price:amount" content="89.00">
+    </head>"""
+    microdata_page = b'<meta property="og:title" content="Desk Chair"><span itemprop="price" content="75.5">$75.50</span>'
+
+    assert extract_structured_data(og_page) == {
+        "name": "Desk Chair", "current_price": 89.0, "image_url": "https://i.example.com/chair.jpg", "extraction_path": "opengraph",
+    }
+    assert extract_structured_data(microdata_page)["extraction_path"] == "microdata"
+    assert extract_structured_data(microdata_page)["current_price"] == 75.5
+
+def test_out_of_stock_or_captcha_falls_back():
+    """
+    Test that unavailable offers are left to the full parser, and that structured data on a
+    CAPTCHA page doesn't hide the CAPTCHA.
+    """
+    sold_out = _json_ld_page({"@type": "Product", "name": "Gone", "offers": {"price": "5.00", "availability": "https://schema.org/OutOfStock"}})
+    captcha = b'<meta property="og:title" content="Robot Check"><meta property="og:price:amount" content="1.00"><p>captcha</p>'
+    assert extract_structured_data(sold_out) is None
+    assert extract_structured_data(b"<html><body>nothing here</body></html>") is None
+    assert parse_page("eBay", captcha) == (True, None)
+
+def test_captcha_in_inline_js_is_not_a_block_page():
+    """
+    Test that a product page whose own scripts mention captcha still parses, through structured
+    data and through selectors alike.
+    """
+    script = b"<script>window.P.when('A').execute(function(){ var captchaWidget = null; });</script>"
+    selectors_page = (b"<html><head>" + script + b"</head><body><span id='productTitle'>Mug</span>"
+                      b"<span class='a-price-whole'>10.</span><span class='a-price-fraction'>99</span></body></html>")
+    assert parse_page("Amazon", selectors_page) == (False, {"name": "Mug", "current_price": 10.99, "image_url": None, "extraction_path": "selectors"})
+
+    json_ld_page = _json_ld_page({"@type": "Product", "name": "Kettle", "offers": {"price": "30.00"}}).replace(b"</head>", script + b"</head>")
+    assert parse_page("eBay", json_ld_page) == (False, {"name": "Kettle", "current_price": 30.0, "image_url": None, "extraction_path": "json-ld"})
+
+def test_parse_page_prefers_structured_data():
+    body = _json_ld_page({"@type": "Product", "name": "JSON Title", "offers": {"price": 10}})
+    body = body.replace(b"</body>", b'<div class="x-price-primary"><span class="ux-textspans">US $12.00</span></div></body>')
+    assert parse_page("eBay", body) == (False, {"name": "JSON Title", "current_price": 10.0, "image_url": None, "extraction_path": "json-ld"})
+
+    # An ended eBay listing skips the fast path so it is still detected
+    ended = body.replace(b"<body>", b'<body><div id="ended_msg">This listing has ended.</div>')
+    assert parse_page("eBay", ended)[1]["name"] == "LISTING ENDED"
+
+    # So is a sold out one whose JSON-LD offer doesn't say so
+    sold_out = body.replace(b"</body>", b'<span class="d-quantity__availability-text">Out of Stock</span></body>')
+    assert parse_page("eBay", sold_out)[1]["name"] == "ITEM SOLD OUT"
+
+def test_parse_page_falls_back_to_selectors():
+    body = b'<h1 class="x-item-title__mainTitle">Selector Title</h1><div class="x-price-primary"><span class="ux-textspans">US $12.00</span></div>'
+    assert parse_page("eBay", body)[1]["extraction_path"] == "selectors"
+
+def test_stream_stops_on_structured_data():
+    extractor = StreamExtractor("Amazon", structured_data_stop=True)
+    head = _json_ld_page({"@type": "Product", "name": "Kettle", "offers": {"price": "30.00"}}).split(b"<body>")[0]
+    assert extractor.feed(head + b"<body>")
+    assert extractor.structured_data.result()["name"] == "Kettle"